@@ -4,7 +4,7 @@ from pathlib import Path
 from rich.console import Console
 
 from src.text_to_sql.config import PipelineConfig
-from src.text_to_sql.pipeline import NL2SQLPipeline
+from src.text_to_sql.startup import StagedStartup
 
 console = Console()
 
@@ -13,7 +13,7 @@ def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Run NL -> SQL inference.")
     parser.add_argument(
         "--question",
-        required=True,
+        default=None,
         help="Natural language question to translate.",
     )
     parser.add_argument(
@@ -36,7 +36,36 @@ def parse_args() -> argparse.Namespace:
         default=None,
         help="Force device placement (cpu/cuda).",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--cache-path",
+        default=None,
+        help="SQLite file for the shared generation cache (in-memory only when omitted).",
+    )
+    parser.add_argument(
+        "--warmup-runs",
+        type=int,
+        default=0,
+        help="Dummy generations for the target schema before answering (default: none for the CLI).",
+    )
+    parser.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="Decode greedily first and widen to the full beam only when execution fails.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Write cProfile/tracemalloc/query-plan traces for this request under profiles/<profile id>/.",
+    )
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="Print an import / weight-load / warm-up time breakdown.",
+    )
+    args = parser.parse_args()
+    if not args.question and not args.profile_startup:
+        parser.error("--question is required unless --profile-startup is given.")
+    return args
 
 
 def main() -> None:
@@ -48,9 +77,20 @@ def main() -> None:
         config.model.model_name = args.model_name
     if args.device:
         config.device = args.device
-    pipeline = NL2SQLPipeline(config)
-    output = pipeline.run(question=args.question, schema_name=args.schema)
-    pipeline.render(output)
+    if args.cache_path:
+        config.cache.disk_path = Path(args.cache_path)
+    config.serving.warmup_runs = args.warmup_runs
+    config.adaptive_decoding = args.adaptive
+    startup = StagedStartup(config)
+    # Only the schema being asked about is compiled (and warmed up); the rest of the catalog stays lazy.
+    pipeline = startup.run(schema_names=[args.schema])
+    if args.profile_startup:
+        console.print(startup.report.render())
+    if args.question:
+        output = pipeline.run(question=args.question, schema_name=args.schema, profile=args.profile or None)
+        pipeline.render(output)
+        if output.profile_path:
+            console.print(f"[dim]Profile written to {output.profile_path}[/dim]")
 
 
 if __name__ == "__main__":
@@ -1,40 +1,190 @@
 from __future__ import annotations
 
-from typing import List, Optional
+import asyncio
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
-from fastapi import FastAPI, Form, Request
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, Form, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from pydantic import BaseModel
 
 from src.text_to_sql.config import PipelineConfig
-from src.text_to_sql.pipeline import NL2SQLPipeline
+from src.text_to_sql.executor import ExecutionResult
+from src.text_to_sql.metrics import PipelineMetrics, collect_gauges
+from src.text_to_sql.replicas import ReplicaPool, calibrate
+from src.text_to_sql.scheduler import MicroBatchScheduler
+from src.text_to_sql.startup import StagedStartup
 
-app = FastAPI(title="Text-to-SQL Dashboard")
+# One shared pipeline with quiet logging; it loads in the background so the port binds immediately.
+web_config = PipelineConfig()
+web_config.verbose = False
+web_config.serving.max_batch_size = int(os.getenv("NL2SQL_MAX_BATCH", web_config.serving.max_batch_size))
+web_config.serving.max_wait_ms = float(os.getenv("NL2SQL_MAX_WAIT_MS", web_config.serving.max_wait_ms))
+if os.getenv("NL2SQL_CACHE_PATH"):
+    web_config.cache.disk_path = Path(os.environ["NL2SQL_CACHE_PATH"])
+web_config.serving.warmup_runs = int(os.getenv("NL2SQL_WARMUP_RUNS", web_config.serving.warmup_runs))
+web_config.serving.warmup_max_schemas = int(os.getenv("NL2SQL_WARMUP_SCHEMAS", web_config.serving.warmup_max_schemas))
+# The server compiles every schema up front so the first request per schema is not slow.
+web_config.serving.preload_schemas = os.getenv("NL2SQL_PRELOAD_SCHEMAS", "1") not in {"0", "false"}
+web_config.adaptive_decoding = os.getenv("NL2SQL_ADAPTIVE_DECODING", "") not in {"", "0", "false"}
+web_config.profiling.sample_rate = float(os.getenv("NL2SQL_PROFILE_SAMPLE_RATE", web_config.profiling.sample_rate))
+if os.getenv("NL2SQL_PROFILE_DIR"):
+    web_config.profiling.output_dir = Path(os.environ["NL2SQL_PROFILE_DIR"])
+web_config.profiling.allow_header = os.getenv("NL2SQL_PROFILE_HEADER", "") not in {"", "0", "false"}
+web_config.metrics.enabled = os.getenv("NL2SQL_METRICS", "1") not in {"0", "false"}
+if os.getenv("NL2SQL_QUERY_LOG"):
+    web_config.executor.query_log_path = Path(os.environ["NL2SQL_QUERY_LOG"])
+web_config.templates.enabled = os.getenv("NL2SQL_TEMPLATES", "") not in {"", "0", "false"}
+# NL2SQL_REPLICAS=N serves from N pinned model processes; "auto" calibrates the split at startup.
+_replicas_env = os.getenv("NL2SQL_REPLICAS", "0").lower()
+web_config.replicas.calibrate = _replicas_env == "auto"
+web_config.replicas.count = 0 if web_config.replicas.calibrate else int(_replicas_env or 0)
+if os.getenv("NL2SQL_THREADS_PER_REPLICA"):
+    web_config.replicas.threads_per_replica = int(os.environ["NL2SQL_THREADS_PER_REPLICA"])
+REPLICA_MODE = web_config.replicas.calibrate or web_config.replicas.count > 0
+scheduler = MicroBatchScheduler(None, web_config.serving, workers=max(1, web_config.replicas.count))
+metrics = PipelineMetrics(web_config.metrics)
+replica_pool: Optional[ReplicaPool] = None
+
+
+def _on_ready(pipeline) -> None:
+    scheduler.attach(pipeline)
+    if os.getenv("NL2SQL_PROFILE_STARTUP"):
+        print(startup.report.render(), flush=True)
+
+
+def _start_replicas() -> None:
+    global replica_pool
+    count, threads = web_config.replicas.count, web_config.replicas.threads_per_replica
+    if web_config.replicas.calibrate:
+        (count, threads), results = calibrate(web_config, catalog=startup.catalog)
+        for result in results:
+            print(
+                f"calibration: {result['replicas']} replica(s) x {result['threads']} thread(s) "
+                f"-> {result['throughput_rps']:.2f} req/s",
+                flush=True,
+            )
+        print(f"calibration: serving with {count} replica(s) x {threads} thread(s)", flush=True)
+    replica_pool = ReplicaPool(web_config, startup.catalog, count=count, threads=threads)
+    replica_pool.launch()
+    scheduler.attach(replica_pool, workers=replica_pool.size)
+
+
+startup = StagedStartup(web_config, on_ready=_on_ready)
+SCHEMA_CHOICES: List[str] = startup.catalog.names()
+NOT_READY_MESSAGE = "The model is still loading; please retry in a few seconds."
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    await scheduler.start()
+    if REPLICA_MODE:
+        threading.Thread(target=_start_replicas, name="nl2sql-replicas", daemon=True).start()
+    else:
+        startup.start()
+    yield
+    await scheduler.stop()
+    if replica_pool is not None:
+        replica_pool.close()
+
+
+class PagedResults:
+    """Recently answered results, keyed by an opaque token the page links carry.
+
+    Paging a result re-runs its resolved SQL and parameters through the executor that produced it;
+    the question never goes back through the scheduler. Tokens are minted server-side, so clients
+    cannot page arbitrary SQL. An evicted or unknown token falls back to answering the question again.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, ExecutionResult]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, sql_text: str, result: ExecutionResult) -> Optional[str]:
+        if self.max_entries <= 0 or not result.truncated or result.sql is None:
+            return None
+        token = uuid.uuid4().hex
+        with self._lock:
+            self._entries[token] = (sql_text, result)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return token
+
+    def get(self, token: Optional[str]) -> Optional[Tuple[str, ExecutionResult]]:
+        if not token:
+            return None
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None:
+                self._entries.move_to_end(token)
+            return entry
+
+
+paged_results = PagedResults(web_config.serving.paged_results)
+app = FastAPI(title="Text-to-SQL Dashboard", lifespan=lifespan)
 templates = Jinja2Templates(directory="templates")
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-# Instantiate pipeline once with quiet logging for the dashboard UI
-web_config = PipelineConfig()
-web_config.verbose = False
-pipeline = NL2SQLPipeline(web_config)
-SCHEMA_CHOICES: List[str] = [schema.name for schema in pipeline.schemas]
+
+def _pagination(result: ExecutionResult, page: int, token: Optional[str]) -> Dict[str, Any]:
+    return {
+        "page": page,
+        "first_row": result.offset + 1,
+        "last_row": result.offset + len(result.rows),
+        "has_prev": page > 1,
+        "has_next": result.truncated,
+        "token": token or "",
+    }
 
 
-def _run_pipeline(question: str, schema_name: Optional[str]):
-    output = pipeline.run(question=question, schema_name=schema_name or None)
-    result_rows = output.result.rows if output.result else []
-    result_columns = output.result.columns if output.result else []
+async def _run_pipeline(
+    question: str,
+    schema_name: Optional[str],
+    page: int = 1,
+    profile: Optional[bool] = None,
+    request_id: Optional[str] = None,
+):
+    output = await scheduler.submit(
+        question=question, schema_name=schema_name or None, profile=profile, request_id=request_id
+    )
+    metrics.observe(output)
+    result = output.result
+    pagination = {}
+    if result is not None:
+        token = paged_results.put(output.sql, result)
+        if page > 1:
+            result = await run_in_threadpool(result.page, page)
+        pagination = _pagination(result, page, token)
+    result_rows = result.rows if result else []
+    result_columns = result.columns if result else []
     error = output.validation_error
-    return output.sql, result_columns, result_rows, error
+    return output.sql, result_columns, result_rows, error, pagination, output.profile_path
+
+
+async def _page_result(token: str, sql_text: str, result: ExecutionResult, page: int):
+    try:
+        result = await run_in_threadpool(result.page, page)
+    except Exception as exc:
+        return sql_text, [], [], str(exc), {}, None
+    return sql_text, result.columns, result.rows, "", _pagination(result, page, token), None
 
 
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
     return templates.TemplateResponse(
+        request,
         "index.html",
         {
-            "request": request,
             "schemas": SCHEMA_CHOICES,
             "selected_schema": "",
             "question_value": "",
@@ -42,33 +192,127 @@ async def index(request: Request):
             "columns": [],
             "rows": [],
             "error": "",
+            "pagination": {},
         },
     )
 
 
+@app.get("/healthz")
+async def healthz():
+    return JSONResponse({"status": "ok"})
+
+
+@app.get("/ready")
+async def ready():
+    if REPLICA_MODE:
+        body = replica_pool.stats() if replica_pool is not None else {"ready": False, "error": None}
+        return JSONResponse(body, status_code=200 if scheduler.ready else 503)
+    return JSONResponse(startup.report.as_dict(), status_code=200 if startup.ready else 503)
+
+
+@app.get("/scheduler")
+async def scheduler_stats():
+    stats = dict(scheduler.stats())
+    if startup.pipeline is not None:
+        stats["decode_tiers"] = startup.pipeline.tier_stats()
+    elif replica_pool is not None and replica_pool.ready:
+        stats["decode_tiers"] = await run_in_threadpool(replica_pool.tier_stats)
+        stats["replicas"] = replica_pool.stats()["replicas"]
+    return JSONResponse(stats)
+
+
+@app.get("/templates")
+async def template_report():
+    pipeline = startup.pipeline
+    if pipeline is None and replica_pool is not None and replica_pool.ready:
+        report = await run_in_threadpool(replica_pool.template_report)
+        if report is not None:
+            return JSONResponse({"enabled": True, **report[0], "templates": report[1]})
+    if pipeline is None or pipeline.templates is None:
+        return JSONResponse({"enabled": False, "templates": []})
+    return JSONResponse({"enabled": True, **pipeline.templates.stats(), "templates": pipeline.templates.report()})
+
+
+@app.delete("/templates/{template_id}")
+async def evict_template(template_id: str):
+    pipeline = startup.pipeline
+    if pipeline is None and replica_pool is not None and replica_pool.ready:
+        evicted = await run_in_threadpool(replica_pool.evict_template, template_id)
+    else:
+        evicted = pipeline is not None and pipeline.templates is not None and pipeline.templates.evict(template_id)
+    return JSONResponse({"evicted": evicted}, status_code=200 if evicted else 404)
+
+
+@app.get("/rules")
+async def rule_report():
+    pipeline = startup.pipeline
+    if pipeline is None and replica_pool is not None and replica_pool.ready:
+        report = await run_in_threadpool(replica_pool.rule_report)
+        if report is not None:
+            return JSONResponse({"enabled": web_config.rules.enabled, **report[0], "rules": report[1]})
+    if pipeline is None:
+        return JSONResponse({"enabled": web_config.rules.enabled, "rules": []})
+    return JSONResponse(
+        {"enabled": web_config.rules.enabled, **pipeline.heuristic.stats(), "rules": pipeline.heuristic.report()}
+    )
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    body = metrics.render(collect_gauges(startup.pipeline, scheduler, replica_pool))
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+
+def _profile_flag(request: Request) -> Optional[bool]:
+    # Header present (and allowed): force or skip profiling; otherwise the pipeline's sampling rate decides.
+    if not (web_config.profiling.enabled or web_config.profiling.allow_header):
+        return None
+    header = request.headers.get(web_config.profiling.header, "").lower()
+    return header in {"1", "true", "yes"} if header else None
+
+
+def _profile_id(profile_path: Optional[str]) -> Optional[str]:
+    # Only the generated directory name goes back to the client, never a server path.
+    return Path(profile_path).name if profile_path else None
+
+
 @app.post("/query", response_class=HTMLResponse)
 async def query(
     request: Request,
     question: str = Form(...),
     schema_name: Optional[str] = Form(None),
+    result_token: Optional[str] = Form(None),
+    page: int = Query(1, ge=1),
 ):
     question = question.strip()
     sql_text = ""
     columns: List[str] = []
     rows: List[List[str]] = []
     error = ""
+    pagination: Dict[str, Any] = {}
 
+    status_code = 200
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    profile = _profile_flag(request)
+    profile_path = None
     if not question:
         error = "Please enter a natural-language question."
+    elif page > 1 and (paged := paged_results.get(result_token)) is not None:
+        sql_text, columns, rows, error, pagination, profile_path = await _page_result(result_token, *paged, page)
+    elif not scheduler.ready:
+        error = NOT_READY_MESSAGE
+        status_code = 503
     else:
-        sql_text, columns, rows, err = _run_pipeline(question, schema_name)
+        sql_text, columns, rows, err, pagination, profile_path = await _run_pipeline(
+            question, schema_name, page, profile=profile, request_id=request_id
+        )
         if err:
             error = err
 
-    return templates.TemplateResponse(
+    response = templates.TemplateResponse(
+        request,
         "index.html",
         {
-            "request": request,
             "schemas": SCHEMA_CHOICES,
             "selected_schema": schema_name or "",
             "question_value": question,
@@ -76,6 +320,107 @@ async def query(
             "columns": columns,
             "rows": rows,
             "error": error,
+            "pagination": pagination,
         },
+        status_code=status_code,
     )
+    response.headers["X-Request-ID"] = request_id
+    if profile_path:
+        response.headers["X-Profile-Id"] = _profile_id(profile_path)
+    return response
+
 
+
+class QueryRequest(BaseModel):
+    question: str
+    schema_name: Optional[str] = None
+    chunk_rows: Optional[int] = None
+
+
+def _ndjson(payload: Dict[str, Any]) -> bytes:
+    # default=str keeps BLOB/Decimal values from aborting a half-sent stream.
+    return (json.dumps(payload, default=str) + "\n").encode("utf-8")
+
+
+async def _stream_result(
+    header: Dict[str, Any], result: ExecutionResult, chunk_rows: int
+) -> AsyncIterator[bytes]:
+    """Yield the header line, then row chunks read straight from the cursor, then a trailer.
+
+    Each ``fetchmany`` runs in the threadpool. If the client goes away, Starlette cancels this
+    generator; the cancel event then interrupts the SQLite statement at its next progress check,
+    and the stream's dedicated connection is closed.
+    """
+    yield _ndjson(header)
+    if not result.truncated:
+        # The preview already holds every row; no need to run the query again.
+        for start in range(0, len(result.rows), chunk_rows):
+            yield _ndjson({"type": "rows", "rows": [list(row) for row in result.rows[start : start + chunk_rows]]})
+        yield _ndjson({"type": "end", "row_count": len(result.rows)})
+        return
+    assert result._executor is not None and result.sql is not None
+    cancel = threading.Event()
+    chunks = result._executor.stream(
+        result.sql, result.params, chunk_rows, cancel=cancel, timeout=web_config.serving.stream_idle_timeout_s
+    )
+    # Serializes fetches with the final close(); a generator cannot be closed while another thread runs it.
+    cursor_lock = threading.Lock()
+
+    def next_chunk() -> Optional[List[Any]]:
+        with cursor_lock:
+            return next(chunks, None)
+
+    def close() -> None:
+        with cursor_lock:
+            chunks.close()
+
+    row_count = 0
+    try:
+        while True:
+            try:
+                chunk = await run_in_threadpool(next_chunk)
+            except Exception as exc:
+                yield _ndjson({"type": "error", "error": f"{type(exc).__name__}: {exc}", "row_count": row_count})
+                return
+            if chunk is None:
+                break
+            row_count += len(chunk)
+            yield _ndjson({"type": "rows", "rows": [list(row) for row in chunk]})
+        yield _ndjson({"type": "end", "row_count": row_count})
+    finally:
+        cancel.set()
+        # Not awaited: on disconnect this generator is being cancelled and must not block.
+        asyncio.get_running_loop().run_in_executor(None, close)
+
+
+@app.post("/api/query")
+async def api_query(request: Request, body: QueryRequest):
+    """JSON API: the first NDJSON line carries the SQL, then rows stream back chunk by chunk."""
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    headers = {"X-Request-ID": request_id}
+    question = body.question.strip()
+    if not question:
+        return JSONResponse({"error": "question must not be empty."}, status_code=400, headers=headers)
+    if not scheduler.ready:
+        return JSONResponse({"error": NOT_READY_MESSAGE}, status_code=503, headers=headers)
+    output = await scheduler.submit(
+        question=question, schema_name=body.schema_name or None, profile=_profile_flag(request), request_id=request_id
+    )
+    metrics.observe(output)
+    if output.profile_path:
+        headers["X-Profile-Id"] = _profile_id(output.profile_path)
+    header = {
+        "type": "sql",
+        "request_id": request_id,
+        "sql": output.sql,
+        "answer_path": output.answer_path,
+        "timings": output.timings,
+    }
+    if output.result is None:
+        header.update(type="error", error=output.validation_error, failure_reason=output.failure_reason)
+        return JSONResponse(header, status_code=422, headers=headers)
+    header["columns"] = list(output.result.columns)
+    chunk_rows = max(1, body.chunk_rows or web_config.serving.stream_chunk_rows or web_config.executor.fetch_chunk_rows)
+    return StreamingResponse(
+        _stream_result(header, output.result, chunk_rows), media_type="application/x-ndjson", headers=headers
+    )
@@ -0,0 +1,212 @@
+import argparse
+import json
+import platform
+import resource
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from tabulate import tabulate  # noqa: E402
+
+from src.text_to_sql.config import PipelineConfig  # noqa: E402
+from src.text_to_sql.model import TextToSQLModel  # noqa: E402
+from src.text_to_sql.pipeline import NL2SQLPipeline  # noqa: E402
+from src.text_to_sql.stub import StubBackend, StubTokenizer  # noqa: E402
+from src.text_to_sql.timing import STAGES, percentiles  # noqa: E402
+from src.text_to_sql.workload import WORKLOAD  # noqa: E402
+
+
+# Latency/RSS metrics regress when they grow; throughput regresses when it shrinks.
+NOISE_FLOOR_MS = 0.5
+
+
+def build_pipeline(args: argparse.Namespace) -> NL2SQLPipeline:
+    config = PipelineConfig()
+    config.verbose = False
+    config.metrics.enabled = True
+    config.cache.enabled = args.cache
+    if not args.cache:
+        config.executor.result_cache_bytes = 0
+    config.schema.schema_path = Path(args.schema_path)
+    if args.device:
+        config.device = args.device
+    if args.model == "stub":
+        tokenizer = StubTokenizer()
+        answers = {question: sqls for _, question, sqls in WORKLOAD}
+        backend = StubBackend(config, tokenizer, answers, prefill_ms=args.prefill_ms, step_ms=args.step_ms)
+        model = TextToSQLModel(config, tokenizer=tokenizer, backend=backend)
+        return NL2SQLPipeline(config, model=model)
+    if args.model_name:
+        config.model.model_name = args.model_name
+    return NL2SQLPipeline(config)
+
+
+def timed_request(pipeline: NL2SQLPipeline, schema: str, question: str) -> Tuple[float, Dict[str, float], bool]:
+    start = time.perf_counter()
+    output = pipeline.run(question, schema)
+    elapsed_ms = (time.perf_counter() - start) * 1000.0
+    return elapsed_ms, {stage: seconds * 1000.0 for stage, seconds in output.timings.items()}, output.result is not None
+
+
+def run_requests(pipeline: NL2SQLPipeline, iterations: int, concurrency: int) -> Dict[str, Any]:
+    jobs = [(schema, question) for _ in range(iterations) for schema, question, _ in WORKLOAD]
+    start = time.perf_counter()
+    if concurrency <= 1:
+        results = [timed_request(pipeline, schema, question) for schema, question in jobs]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(lambda job: timed_request(pipeline, *job), jobs))
+    wall = time.perf_counter() - start
+    stages: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+    for _, timings, _ in results:
+        for stage in STAGES:
+            stages[stage].append(timings.get(stage, 0.0))
+    return {
+        "requests": len(results),
+        "throughput_rps": len(results) / wall if wall else 0.0,
+        "success_rate": sum(ok for _, _, ok in results) / len(results) if results else 0.0,
+        "latency_ms": percentiles([elapsed for elapsed, _, _ in results]),
+        "stages_ms": {stage: percentiles(values) for stage, values in stages.items()},
+    }
+
+
+def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    load_start = time.perf_counter()
+    pipeline = build_pipeline(args)
+    pipeline.preload_schemas()
+    load_s = time.perf_counter() - load_start
+    run_requests(pipeline, 1, 1)  # warm-up: compile prompts, open pools, fill validation caches
+
+    sequential = run_requests(pipeline, args.iterations, 1)
+    levels = {}
+    for level in args.concurrency:
+        result = run_requests(pipeline, args.iterations, level)
+        levels[str(level)] = {
+            "throughput_rps": result["throughput_rps"],
+            "latency_ms": result["latency_ms"],
+            "success_rate": result["success_rate"],
+        }
+    # ru_maxrss is KiB on Linux and bytes on macOS.
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+    return {
+        "meta": {
+            "model": args.model if args.model == "stub" else (args.model_name or pipeline.config.model.model_name),
+            "iterations": args.iterations,
+            "workload": len(WORKLOAD),
+            "cache": args.cache,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "load_s": load_s,
+        },
+        "end_to_end_ms": sequential["latency_ms"],
+        "stages_ms": sequential["stages_ms"],
+        "success_rate": sequential["success_rate"],
+        "concurrency": levels,
+        "peak_rss_mb": peak_rss_mb,
+    }
+
+
+def _metrics(report: Dict[str, Any]) -> Dict[str, Tuple[float, bool]]:
+    """Flatten a report into name -> (value, higher_is_worse)."""
+    flat: Dict[str, Tuple[float, bool]] = {}
+    for key in ("p50", "p95", "p99"):
+        flat[f"end_to_end.{key}"] = (report["end_to_end_ms"][key], True)
+    for stage, stats in report["stages_ms"].items():
+        for key in ("p50", "p95"):
+            flat[f"stage.{stage}.{key}"] = (stats[key], True)
+    for level, stats in report["concurrency"].items():
+        flat[f"concurrency.{level}.throughput_rps"] = (stats["throughput_rps"], False)
+        flat[f"concurrency.{level}.p95"] = (stats["latency_ms"]["p95"], True)
+    flat["success_rate"] = (report["success_rate"], False)
+    flat["peak_rss_mb"] = (report["peak_rss_mb"], True)
+    return flat
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[List[Any]]:
+    before, after = _metrics(baseline), _metrics(current)
+    rows = []
+    for name, (old, higher_is_worse) in before.items():
+        if name not in after:
+            continue
+        new = after[name][0]
+        change = (new - old) / old if old else 0.0
+        worse = change > threshold if higher_is_worse else change < -threshold
+        if worse and name.endswith(("p50", "p95", "p99")) and abs(new - old) < NOISE_FLOOR_MS:
+            worse = False
+        rows.append([name, round(old, 3), round(new, 3), f"{change:+.1%}", "REGRESSION" if worse else ""])
+    return rows
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    rows = [["end_to_end", *(round(report["end_to_end_ms"][key], 3) for key in ("p50", "p95", "p99", "mean"))]]
+    for stage, stats in report["stages_ms"].items():
+        rows.append([stage, *(round(stats[key], 3) for key in ("p50", "p95", "p99", "mean"))])
+    print(tabulate(rows, headers=["stage", "p50 ms", "p95 ms", "p99 ms", "mean ms"], tablefmt="github"))
+    print()
+    levels = [
+        [level, round(stats["throughput_rps"], 2), round(stats["latency_ms"]["p50"], 3), round(stats["latency_ms"]["p95"], 3)]
+        for level, stats in report["concurrency"].items()
+    ]
+    print(tabulate(levels, headers=["concurrency", "req/s", "p50 ms", "p95 ms"], tablefmt="github"))
+    print(f"\nsuccess rate {report['success_rate']:.1%}, peak RSS {report['peak_rss_mb']:.1f} MiB")
+
+
+def report_regressions(baseline_path: Path, current: Dict[str, Any], threshold: float) -> None:
+    baseline = json.loads(baseline_path.read_text())
+    rows = compare(baseline, current, threshold)
+    print(tabulate(rows, headers=["metric", "baseline", "current", "change", ""], tablefmt="github"))
+    regressions = [row for row in rows if row[-1]]
+    if regressions:
+        print(f"\n{len(regressions)} metric(s) regressed by more than {threshold:.0%}.")
+        sys.exit(1)
+    print(f"\nNo regressions beyond {threshold:.0%}.")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Per-stage latency/throughput benchmark for the NL -> SQL pipeline.")
+    parser.add_argument("command", choices=["run", "compare"], help="run the benchmark or compare two result files.")
+    parser.add_argument("--model", choices=["stub", "hf"], default="stub", help="stub model (no download) or the real checkpoint.")
+    parser.add_argument("--model-name", default=None, help="Checkpoint to use with --model hf.")
+    parser.add_argument("--device", default=None, help="Force device placement (cpu/cuda).")
+    parser.add_argument("--schema-path", default="data/sample_schema.json", help="Schema JSON with company/university/retail.")
+    parser.add_argument("--iterations", type=int, default=5, help="Passes over the workload per measurement.")
+    parser.add_argument(
+        "--concurrency",
+        default="1,4,8",
+        type=lambda value: [int(level) for level in value.split(",") if level],
+        help="Comma-separated thread counts for the throughput runs.",
+    )
+    parser.add_argument(
+        "--cache", action="store_true", help="Keep the generation and result caches on (off by default)."
+    )
+    parser.add_argument("--prefill-ms", type=float, default=2.0, help="Stub model: simulated cost per prompt.")
+    parser.add_argument("--step-ms", type=float, default=0.5, help="Stub model: simulated cost per output token.")
+    parser.add_argument("--output", default=Path("benchmarks/latest.json"), type=Path, help="Where to write results.")
+    parser.add_argument("--baseline", default=None, type=Path, help="Stored baseline to check for regressions.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative change that counts as a regression.")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        if args.baseline is None:
+            parser.error("compare needs --baseline (and reads --output as the current run).")
+        report_regressions(args.baseline, json.loads(args.output.read_text()), args.threshold)
+        return
+
+    report = run_benchmark(args)
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(report, indent=2))
+    print_report(report)
+    print(f"Results written to {args.output}")
+    if args.baseline is not None:
+        print()
+        report_regressions(args.baseline, report, args.threshold)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,114 @@
 import argparse
+import json
+import os
+import random
 import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from itertools import islice
 from pathlib import Path
-from typing import Callable, Dict
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
 
 DATA_DIR = Path("data")
 
+COMPANY_DDL = """
+DROP TABLE IF EXISTS sales;
+DROP TABLE IF EXISTS employee_projects;
+DROP TABLE IF EXISTS employees;
+DROP TABLE IF EXISTS projects;
+DROP TABLE IF EXISTS departments;
+CREATE TABLE departments (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    division TEXT NOT NULL
+);
+CREATE TABLE projects (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    department_id INTEGER NOT NULL,
+    budget INTEGER NOT NULL,
+    FOREIGN KEY (department_id) REFERENCES departments(id)
+);
+CREATE TABLE employees (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    age INTEGER NOT NULL,
+    department TEXT NOT NULL,
+    department_id INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    salary INTEGER NOT NULL,
+    FOREIGN KEY (department_id) REFERENCES departments(id)
+);
+CREATE TABLE employee_projects (
+    project_id INTEGER NOT NULL,
+    employee_id INTEGER NOT NULL,
+    PRIMARY KEY (project_id, employee_id),
+    FOREIGN KEY (project_id) REFERENCES projects(id),
+    FOREIGN KEY (employee_id) REFERENCES employees(id)
+);
+CREATE TABLE sales (
+    id INTEGER PRIMARY KEY,
+    employee_id INTEGER NOT NULL,
+    client TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    quarter TEXT NOT NULL,
+    FOREIGN KEY (employee_id) REFERENCES employees(id)
+);
+"""
+
+UNIVERSITY_DDL = """
+DROP TABLE IF EXISTS enrollments;
+DROP TABLE IF EXISTS students;
+DROP TABLE IF EXISTS courses;
+CREATE TABLE students (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    major TEXT NOT NULL,
+    year TEXT NOT NULL
+);
+CREATE TABLE courses (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    department TEXT NOT NULL,
+    credits INTEGER NOT NULL
+);
+CREATE TABLE enrollments (
+    student_id INTEGER NOT NULL,
+    course_id INTEGER NOT NULL,
+    grade TEXT NOT NULL,
+    PRIMARY KEY (student_id, course_id),
+    FOREIGN KEY (student_id) REFERENCES students(id),
+    FOREIGN KEY (course_id) REFERENCES courses(id)
+);
+"""
+
+RETAIL_DDL = """
+DROP TABLE IF EXISTS order_items;
+DROP TABLE IF EXISTS orders;
+DROP TABLE IF EXISTS products;
+CREATE TABLE products (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    category TEXT NOT NULL,
+    price INTEGER NOT NULL
+);
+CREATE TABLE orders (
+    id INTEGER PRIMARY KEY,
+    customer TEXT NOT NULL,
+    order_date TEXT NOT NULL,
+    status TEXT NOT NULL
+);
+CREATE TABLE order_items (
+    order_id INTEGER NOT NULL,
+    product_id INTEGER NOT NULL,
+    quantity INTEGER NOT NULL,
+    unit_price INTEGER NOT NULL,
+    FOREIGN KEY (order_id) REFERENCES orders(id),
+    FOREIGN KEY (product_id) REFERENCES products(id)
+);
+"""
+
 
 def ensure_db(path: Path) -> sqlite3.Connection:
     path.parent.mkdir(parents=True, exist_ok=True)
@@ -55,52 +159,7 @@ def bootstrap_company(db_path: Path) -> None:
 
     with ensure_db(db_path) as conn:
         cur = conn.cursor()
-        cur.executescript(
-            """
-            DROP TABLE IF EXISTS sales;
-            DROP TABLE IF EXISTS employee_projects;
-            DROP TABLE IF EXISTS employees;
-            DROP TABLE IF EXISTS projects;
-            DROP TABLE IF EXISTS departments;
-            CREATE TABLE departments (
-                id INTEGER PRIMARY KEY,
-                name TEXT NOT NULL,
-                division TEXT NOT NULL
-            );
-            CREATE TABLE projects (
-                id INTEGER PRIMARY KEY,
-                name TEXT NOT NULL,
-                department_id INTEGER NOT NULL,
-                budget INTEGER NOT NULL,
-                FOREIGN KEY (department_id) REFERENCES departments(id)
-            );
-            CREATE TABLE employees (
-                id INTEGER PRIMARY KEY,
-                name TEXT NOT NULL,
-                age INTEGER NOT NULL,
-                department TEXT NOT NULL,
-                department_id INTEGER NOT NULL,
-                role TEXT NOT NULL,
-                salary INTEGER NOT NULL,
-                FOREIGN KEY (department_id) REFERENCES departments(id)
-            );
-            CREATE TABLE employee_projects (
-                project_id INTEGER NOT NULL,
-                employee_id INTEGER NOT NULL,
-                PRIMARY KEY (project_id, employee_id),
-                FOREIGN KEY (project_id) REFERENCES projects(id),
-                FOREIGN KEY (employee_id) REFERENCES employees(id)
-            );
-            CREATE TABLE sales (
-                id INTEGER PRIMARY KEY,
-                employee_id INTEGER NOT NULL,
-                client TEXT NOT NULL,
-                amount INTEGER NOT NULL,
-                quarter TEXT NOT NULL,
-                FOREIGN KEY (employee_id) REFERENCES employees(id)
-            );
-            """
-        )
+        cur.executescript(COMPANY_DDL)
         cur.executemany(
             "INSERT INTO departments (id, name, division) VALUES (?, ?, ?)", departments
         )
@@ -152,33 +211,7 @@ def bootstrap_university(db_path: Path) -> None:
 
     with ensure_db(db_path) as conn:
         cur = conn.cursor()
-        cur.executescript(
-            """
-            DROP TABLE IF EXISTS enrollments;
-            DROP TABLE IF EXISTS students;
-            DROP TABLE IF EXISTS courses;
-            CREATE TABLE students (
-                id INTEGER PRIMARY KEY,
-                name TEXT NOT NULL,
-                major TEXT NOT NULL,
-                year TEXT NOT NULL
-            );
-            CREATE TABLE courses (
-                id INTEGER PRIMARY KEY,
-                title TEXT NOT NULL,
-                department TEXT NOT NULL,
-                credits INTEGER NOT NULL
-            );
-            CREATE TABLE enrollments (
-                student_id INTEGER NOT NULL,
-                course_id INTEGER NOT NULL,
-                grade TEXT NOT NULL,
-                PRIMARY KEY (student_id, course_id),
-                FOREIGN KEY (student_id) REFERENCES students(id),
-                FOREIGN KEY (course_id) REFERENCES courses(id)
-            );
-            """
-        )
+        cur.executescript(UNIVERSITY_DDL)
         cur.executemany(
             "INSERT INTO students (id, name, major, year) VALUES (?, ?, ?, ?)", students
         )
@@ -216,33 +249,7 @@ def bootstrap_retail(db_path: Path) -> None:
 
     with ensure_db(db_path) as conn:
         cur = conn.cursor()
-        cur.executescript(
-            """
-            DROP TABLE IF EXISTS order_items;
-            DROP TABLE IF EXISTS orders;
-            DROP TABLE IF EXISTS products;
-            CREATE TABLE products (
-                id INTEGER PRIMARY KEY,
-                name TEXT NOT NULL,
-                category TEXT NOT NULL,
-                price INTEGER NOT NULL
-            );
-            CREATE TABLE orders (
-                id INTEGER PRIMARY KEY,
-                customer TEXT NOT NULL,
-                order_date TEXT NOT NULL,
-                status TEXT NOT NULL
-            );
-            CREATE TABLE order_items (
-                order_id INTEGER NOT NULL,
-                product_id INTEGER NOT NULL,
-                quantity INTEGER NOT NULL,
-                unit_price INTEGER NOT NULL,
-                FOREIGN KEY (order_id) REFERENCES orders(id),
-                FOREIGN KEY (product_id) REFERENCES products(id)
-            );
-            """
-        )
+        cur.executescript(RETAIL_DDL)
         cur.executemany(
             "INSERT INTO products (id, name, category, price) VALUES (?, ?, ?, ?)",
             products,
@@ -261,10 +268,291 @@ def bootstrap_retail(db_path: Path) -> None:
         conn.commit()
 
 
+# --- Synthetic data for load testing (--scale) --------------------------------------------------
+# Rows are generated in fixed blocks from one RNG per (seed, dataset, table), so a given seed and
+# scale always produce the same database whatever --chunk-rows or --workers is.
+_BLOCK = 10_000
+BULK_PRAGMAS = (
+    "PRAGMA journal_mode = OFF",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA locking_mode = EXCLUSIVE",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -262144",
+    # Every key is generated in range, so per-row FK checks would only cost time.
+    "PRAGMA foreign_keys = OFF",
+)
+
+FIRST_NAMES = (
+    "Ava", "Liam", "Sophia", "Ethan", "Mia", "Noah", "Olivia", "Lucas", "Emma", "Mason", "Isla", "Leo",
+    "Chloe", "Omar", "Priya", "Kenji", "Elena", "Mateo", "Zara", "Hugo", "Nora", "Ravi", "Ines", "Theo",
+)
+LAST_NAMES = (
+    "Thompson", "Carter", "Nguyen", "Patel", "Rodriguez", "Brooks", "Green", "Kim", "Lee", "Torres",
+    "Silva", "Novak", "Okafor", "Schmidt", "Rossi", "Tanaka", "Haddad", "Murphy", "Costa", "Walsh",
+)
+DEPARTMENTS = (
+    ("Sales", "Enterprise"),
+    ("Engineering", "Product"),
+    ("HR", "Corporate"),
+    ("Finance", "Corporate"),
+    ("Marketing", "Enterprise"),
+    ("Support", "Enterprise"),
+    ("Research", "Product"),
+    ("Design", "Product"),
+    ("Legal", "Corporate"),
+    ("Operations", "Corporate"),
+)
+ROLES = ("Associate", "Analyst", "Engineer", "Manager", "Specialist", "Lead", "Director", "Coordinator")
+CLIENTS = tuple(f"{prefix}{suffix}" for prefix in ("Acme", "Omni", "North", "Globe", "Blue", "Apex", "Nova", "Vertex")
+                for suffix in (" Retail", "Shop", "wind", "x", " Labs", " Foods", " Health", " Logistics"))
+QUARTERS = tuple(f"{year}-Q{quarter}" for year in range(2019, 2025) for quarter in range(1, 5))
+MAJORS = ("Computer Science", "Mathematics", "Economics", "History", "Physics", "Biology", "Philosophy", "Chemistry")
+YEARS = ("Freshman", "Sophomore", "Junior", "Senior")
+SUBJECTS = (
+    ("Database Systems", "CS"), ("Algorithms", "CS"), ("Linear Algebra", "MATH"), ("Statistics", "MATH"),
+    ("Microeconomics", "ECON"), ("Econometrics", "ECON"), ("Modern Europe", "HIST"), ("Mechanics", "PHYS"),
+    ("Genetics", "BIO"), ("Ethics", "PHIL"), ("Organic Chemistry", "CHEM"),
+)
+GRADES = ("A", "A-", "B+", "B", "B-", "C+", "C", "D", "F")
+CATEGORIES = ("Electronics", "Accessories", "Outdoors", "Footwear", "Home", "Toys", "Books", "Grocery")
+PRODUCT_WORDS = ("Aurora", "Nimbus", "Summit", "Glide", "Vista", "Pulse", "Ember", "Drift", "Halo", "Terra")
+STATUSES = ("Processing", "Shipped", "Delivered", "Cancelled", "Returned")
+ORDER_DATES = tuple((date(2020, 1, 1) + timedelta(days=day)).isoformat() for day in range(5 * 365))
+
+# (table, INSERT statement, rows) in load order; ``rows`` is a lazy iterable.
+TablePlan = List[Tuple[str, str, Iterable[Tuple[Any, ...]]]]
+
+
+def _blocks(count: int) -> Iterator[Tuple[int, int]]:
+    """(first id, rows) blocks covering ids 1..count."""
+    for start in range(1, count + 1, _BLOCK):
+        yield start, min(_BLOCK, count - start + 1)
+
+
+def _names(rng: random.Random, rows: int) -> List[str]:
+    return [f"{first} {last}" for first, last in zip(rng.choices(FIRST_NAMES, k=rows), rng.choices(LAST_NAMES, k=rows))]
+
+
+def synthetic_company(scale: int, seed: int) -> TablePlan:
+    """``scale`` sales rows, 1 employee per 10 sales (2 projects each) and 1 project per 100 sales."""
+    employees = max(7, scale // 10)
+    projects = max(4, scale // 100)
+    rngs = {table: random.Random(f"{seed}:company:{table}") for table in ("projects", "employees", "assign", "sales")}
+
+    def project_rows() -> Iterator[Tuple[Any, ...]]:
+        rng = rngs["projects"]
+        for start, rows in _blocks(projects):
+            yield from zip(
+                range(start, start + rows),
+                (f"{word} {number}" for word, number in zip(rng.choices(PRODUCT_WORDS, k=rows), range(start, start + rows))),
+                rng.choices(range(1, len(DEPARTMENTS) + 1), k=rows),
+                rng.choices(range(50_000, 1_000_001, 10_000), k=rows),
+            )
+
+    def employee_rows() -> Iterator[Tuple[Any, ...]]:
+        rng = rngs["employees"]
+        for start, rows in _blocks(employees):
+            departments = rng.choices(range(len(DEPARTMENTS)), k=rows)
+            yield from zip(
+                range(start, start + rows),
+                _names(rng, rows),
+                rng.choices(range(22, 66), k=rows),
+                (DEPARTMENTS[index][0] for index in departments),
+                (index + 1 for index in departments),
+                rng.choices(ROLES, k=rows),
+                rng.choices(range(45_000, 250_001, 1_000), k=rows),
+            )
+
+    def assignment_rows() -> Iterator[Tuple[Any, ...]]:
+        # Two distinct projects per employee keeps the (project_id, employee_id) key unique.
+        rng = rngs["assign"]
+        for start, rows in _blocks(employees):
+            for employee, first, offset in zip(
+                range(start, start + rows), rng.choices(range(projects), k=rows), rng.choices(range(1, projects), k=rows)
+            ):
+                yield first + 1, employee
+                yield (first + offset) % projects + 1, employee
+
+    def sale_rows() -> Iterator[Tuple[Any, ...]]:
+        rng = rngs["sales"]
+        for start, rows in _blocks(scale):
+            yield from zip(
+                range(start, start + rows),
+                rng.choices(range(1, employees + 1), k=rows),
+                rng.choices(CLIENTS, k=rows),
+                rng.choices(range(5_000, 600_001, 1_000), k=rows),
+                rng.choices(QUARTERS, k=rows),
+            )
+
+    return [
+        (
+            "departments",
+            "INSERT INTO departments (id, name, division) VALUES (?, ?, ?)",
+            [(index, name, division) for index, (name, division) in enumerate(DEPARTMENTS, start=1)],
+        ),
+        ("projects", "INSERT INTO projects (id, name, department_id, budget) VALUES (?, ?, ?, ?)", project_rows()),
+        (
+            "employees",
+            "INSERT INTO employees (id, name, age, department, department_id, role, salary) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            employee_rows(),
+        ),
+        ("employee_projects", "INSERT INTO employee_projects (project_id, employee_id) VALUES (?, ?)", assignment_rows()),
+        ("sales", "INSERT INTO sales (id, employee_id, client, amount, quarter) VALUES (?, ?, ?, ?, ?)", sale_rows()),
+    ]
+
+
+def synthetic_university(scale: int, seed: int) -> TablePlan:
+    """About ``scale`` enrollments: 4 distinct courses per student and 1 course per 1000 enrollments."""
+    students = max(4, scale // 4)
+    courses = max(4, scale // 1000)
+    rngs = {table: random.Random(f"{seed}:university:{table}") for table in ("students", "courses", "enrollments")}
+
+    def student_rows() -> Iterator[Tuple[Any, ...]]:
+        rng = rngs["students"]
+        for start, rows in _blocks(students):
+            yield from zip(range(start, start + rows), _names(rng, rows), rng.choices(MAJORS, k=rows), rng.choices(YEARS, k=rows))
+
+    def course_rows() -> Iterator[Tuple[Any, ...]]:
+        rng = rngs["courses"]
+        for start, rows in _blocks(courses):
+            for course, (title, department), credits in zip(
+                range(start, start + rows), rng.choices(SUBJECTS, k=rows), rng.choices((2, 3, 4), k=rows)
+            ):
+                yield course, f"{title} {100 + course % 900}", department, credits
+
+    def enrollment_rows() -> Iterator[Tuple[Any, ...]]:
+        rng = rngs["enrollments"]
+        for start, rows in _blocks(students):
+            grades = iter(rng.choices(GRADES, k=rows * 4))
+            for student in range(start, start + rows):
+                for course in rng.sample(range(1, courses + 1), 4):
+                    yield student, course, next(grades)
+
+    return [
+        ("students", "INSERT INTO students (id, name, major, year) VALUES (?, ?, ?, ?)", student_rows()),
+        ("courses", "INSERT INTO courses (id, title, department, credits) VALUES (?, ?, ?, ?)", course_rows()),
+        ("enrollments", "INSERT INTO enrollments (student_id, course_id, grade) VALUES (?, ?, ?)", enrollment_rows()),
+    ]
+
+
+def synthetic_retail(scale: int, seed: int) -> TablePlan:
+    """About ``scale`` order items: 3 per order, priced from a catalogue of 1 product per 1000 items."""
+    orders = max(3, scale // 3)
+    products = max(4, scale // 1000)
+    rngs = {table: random.Random(f"{seed}:retail:{table}") for table in ("products", "orders", "items")}
+    # Small enough to keep in memory, so every order line carries its product's price.
+    prices = rngs["products"].choices(range(5, 2_000), k=products)
+
+    def product_rows() -> Iterator[Tuple[Any, ...]]:
+        rng = rngs["products"]
+        for start, rows in _blocks(products):
+            for product, word, category in zip(
+                range(start, start + rows), rng.choices(PRODUCT_WORDS, k=rows), rng.choices(CATEGORIES, k=rows)
+            ):
+                yield product, f"{word} {category} {product}", category, prices[product - 1]
+
+    def order_rows() -> Iterator[Tuple[Any, ...]]:
+        rng = rngs["orders"]
+        for start, rows in _blocks(orders):
+            yield from zip(
+                range(start, start + rows), _names(rng, rows), rng.choices(ORDER_DATES, k=rows), rng.choices(STATUSES, k=rows)
+            )
+
+    def item_rows() -> Iterator[Tuple[Any, ...]]:
+        rng = rngs["items"]
+        for start, rows in _blocks(orders):
+            picks = iter(rng.choices(range(products), k=rows * 3))
+            quantities = iter(rng.choices((1, 1, 1, 2, 2, 3, 4), k=rows * 3))
+            for order in range(start, start + rows):
+                for _ in range(3):
+                    product = next(picks)
+                    yield order, product + 1, next(quantities), prices[product]
+
+    return [
+        ("products", "INSERT INTO products (id, name, category, price) VALUES (?, ?, ?, ?)", product_rows()),
+        ("orders", "INSERT INTO orders (id, customer, order_date, status) VALUES (?, ?, ?, ?)", order_rows()),
+        (
+            "order_items",
+            "INSERT INTO order_items (order_id, product_id, quantity, unit_price) VALUES (?, ?, ?, ?)",
+            item_rows(),
+        ),
+    ]
+
+
+SYNTHETIC: Dict[str, Tuple[str, Callable[[int, int], TablePlan]]] = {
+    "company": (COMPANY_DDL, synthetic_company),
+    "university": (UNIVERSITY_DDL, synthetic_university),
+    "retail": (RETAIL_DDL, synthetic_retail),
+}
+
+
+def _load(conn: sqlite3.Connection, sql: str, rows: Iterable[Tuple[Any, ...]], chunk_rows: int) -> int:
+    """Stream ``rows`` into ``executemany`` calls of ``chunk_rows``; returns the row count."""
+    iterator = iter(rows)
+    total = 0
+    while True:
+        chunk = list(islice(iterator, chunk_rows))
+        if not chunk:
+            return total
+        conn.executemany(sql, chunk)
+        total += len(chunk)
+
+
+def build_synthetic(dataset: str, db_path: Path, scale: int, seed: int, chunk_rows: int) -> Dict[str, Any]:
+    """Build ``dataset`` at ``scale`` next to ``db_path`` and swap it in once complete."""
+    ddl, plan = SYNTHETIC[dataset]
+    started = time.perf_counter()
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    staging = db_path.with_name(db_path.name + ".building")
+    staging.unlink(missing_ok=True)
+    conn = sqlite3.connect(staging, isolation_level=None)
+    tables: Dict[str, Dict[str, float]] = {}
+    try:
+        for pragma in BULK_PRAGMAS:
+            conn.execute(pragma)
+        conn.executescript(ddl)
+        for table, sql, rows in plan(scale, seed):
+            table_started = time.perf_counter()
+            # One transaction per table: no per-statement journal or fsync work.
+            conn.execute("BEGIN")
+            count = _load(conn, sql, rows, chunk_rows)
+            conn.execute("COMMIT")
+            tables[table] = {"rows": count, "seconds": time.perf_counter() - table_started}
+        conn.execute("PRAGMA journal_mode = DELETE")
+    finally:
+        conn.close()
+    # A reader never sees a half-built database, and a stale WAL must not be replayed onto the new file.
+    for suffix in ("-wal", "-shm"):
+        Path(str(db_path) + suffix).unlink(missing_ok=True)
+    os.replace(staging, db_path)
+    seconds = time.perf_counter() - started
+    rows = sum(int(stats["rows"]) for stats in tables.values())
+    return {
+        "dataset": dataset,
+        "path": str(db_path),
+        "scale": scale,
+        "seed": seed,
+        "rows": rows,
+        "bytes": db_path.stat().st_size,
+        "seconds": seconds,
+        "rows_per_s": rows / seconds if seconds else 0.0,
+        "tables": tables,
+    }
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    print(
+        f"{report['dataset']}: {report['rows']:,} rows, {report['bytes'] / 2**20:,.1f} MiB in {report['seconds']:.1f}s "
+        f"({report['rows_per_s']:,.0f} rows/s) -> {report['path']}"
+    )
+    for table, stats in report["tables"].items():
+        print(f"  {table:<18} {int(stats['rows']):>14,} rows  {stats['seconds']:8.2f}s")
+
+
 DATASETS: Dict[str, Callable[[Path], None]] = {
-    "company": lambda path=DATA_DIR / "company.db": bootstrap_company(path),
-    "university": lambda path=DATA_DIR / "university.db": bootstrap_university(path),
-    "retail": lambda path=DATA_DIR / "retail.db": bootstrap_retail(path),
+    "company": bootstrap_company,
+    "university": bootstrap_university,
+    "retail": bootstrap_retail,
 }
 
 
@@ -276,14 +564,50 @@ def main() -> None:
         default="all",
         help="Which dataset(s) to create.",
     )
+    parser.add_argument(
+        "--scale",
+        type=int,
+        default=None,
+        help="Generate synthetic data with about this many rows in each database's largest table "
+        "(sales / enrollments / order_items) instead of the demo rows.",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed for --scale; the same seed rebuilds the same data.")
+    parser.add_argument("--chunk-rows", type=int, default=50_000, help="Rows per executemany call with --scale.")
+    parser.add_argument(
+        "--workers", type=int, default=None, help="Databases built in parallel with --scale (default: one per dataset)."
+    )
+    parser.add_argument("--output-dir", type=Path, default=DATA_DIR, help="Where the .db files are written.")
+    parser.add_argument("--report", type=Path, default=None, help="Write the --scale size/time report as JSON.")
     args = parser.parse_args()
-    targets = DATASETS.keys() if args.dataset == "all" else [args.dataset]
+    targets = list(DATASETS.keys()) if args.dataset == "all" else [args.dataset]
+
+    if args.scale is None:
+        for dataset in targets:
+            DATASETS[dataset](args.output_dir / f"{dataset}.db")
+            print(f"SQLite demo database ready: {dataset}")
+        return
 
-    for dataset in targets:
-        DATASETS[dataset]()
-        print(f"SQLite demo database ready: {dataset}")
+    if args.scale < 1 or args.chunk_rows < 1:
+        parser.error("--scale and --chunk-rows must be positive.")
+    started = time.perf_counter()
+    workers = max(1, min(args.workers or len(targets), len(targets)))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(build_synthetic, dataset, args.output_dir / f"{dataset}.db", args.scale, args.seed, args.chunk_rows)
+            for dataset in targets
+        ]
+        reports = [future.result() for future in futures]
+    wall = time.perf_counter() - started
+    for report in reports:
+        _print_report(report)
+    rows = sum(report["rows"] for report in reports)
+    size = sum(report["bytes"] for report in reports)
+    print(f"total: {rows:,} rows, {size / 2**20:,.1f} MiB in {wall:.1f}s wall ({rows / wall:,.0f} rows/s, {workers} workers)")
+    if args.report is not None:
+        args.report.parent.mkdir(parents=True, exist_ok=True)
+        summary = {"wall_seconds": wall, "workers": workers, "rows": rows, "bytes": size, "databases": reports}
+        args.report.write_text(json.dumps(summary, indent=2), encoding="utf-8")
 
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,303 @@
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from tabulate import tabulate  # noqa: E402
+
+from src.text_to_sql.config import PipelineConfig  # noqa: E402
+from src.text_to_sql.model import TextToSQLModel  # noqa: E402
+from src.text_to_sql.pipeline import NL2SQLPipeline  # noqa: E402
+from src.text_to_sql.stub import StubBackend, StubTokenizer  # noqa: E402
+from src.text_to_sql.timing import percentiles  # noqa: E402
+
+# (index, db_id, question, gold SQL)
+Example = Tuple[int, str, str, str]
+
+_PIPELINE: Optional[NL2SQLPipeline] = None
+
+
+def load_examples(path: Path, limit: Optional[int] = None) -> List[Example]:
+    """Read a Spider split (``dev.json``/``train_spider.json``) into indexed examples."""
+    with path.open("r", encoding="utf-8") as handle:
+        entries = json.load(handle)
+    examples = [(idx, entry["db_id"], entry["question"], entry["query"]) for idx, entry in enumerate(entries)]
+    return examples[:limit] if limit else examples
+
+
+def load_checkpoint(path: Path) -> Dict[int, Dict[str, Any]]:
+    """Records already written by an earlier (possibly interrupted) run, keyed by example index."""
+    done: Dict[int, Dict[str, Any]] = {}
+    if not path.exists():
+        return done
+    with path.open("r", encoding="utf-8") as handle:
+        for line in handle:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A run killed mid-write leaves a partial last line; that example is simply redone.
+                continue
+            if "exact_match" in record:
+                # Checkpoints from before the rename: the field always held the normalized string match.
+                record["string_match"] = record.pop("exact_match")
+            done[record["index"]] = record
+    return done
+
+
+def build_config(args: argparse.Namespace) -> PipelineConfig:
+    config = PipelineConfig()
+    config.verbose = False
+    config.cache.enabled = False
+    config.executor.result_cache_bytes = 0
+    config.schema.schema_path = Path(args.schema_path)
+    config.profiling.enabled = False
+    config.serving.warmup_runs = 0
+    # One process per replica already saturates the cores; extra executor threads only contend.
+    config.execution_workers = 1
+    config.executor.pool_size = 2
+    if args.device:
+        config.device = args.device
+    if args.model_name:
+        config.model.model_name = args.model_name
+    if args.num_beams:
+        config.model.num_beams = args.num_beams
+    if args.backend:
+        config.model.backend = args.backend
+    if args.onnx_path:
+        config.model.onnx_path = Path(args.onnx_path)
+    config.adaptive_decoding = args.adaptive
+    config.constrained_decoding = args.constrained
+    return config
+
+
+def _init_worker(args: argparse.Namespace, gold: Dict[str, List[str]]) -> None:
+    global _PIPELINE
+    if args.threads_per_worker:
+        import torch
+
+        torch.set_num_threads(args.threads_per_worker)
+    config = build_config(args)
+    if args.model == "stub":
+        # The stub answers with the gold SQL: a harness/throughput check, not a quality number.
+        tokenizer = StubTokenizer()
+        backend = StubBackend(config, tokenizer, gold, prefill_ms=args.prefill_ms, step_ms=args.step_ms)
+        model = TextToSQLModel(config, tokenizer=tokenizer, backend=backend)
+        _PIPELINE = NL2SQLPipeline(config, model=model)
+    else:
+        _PIPELINE = NL2SQLPipeline(config)
+
+
+_WS_RE = re.compile(r"\s+")
+_SPACED_PUNCT_RE = re.compile(r"\s*([(),])\s*")
+
+
+def normalize_sql(sql: str) -> str:
+    """Case/whitespace/quote-insensitive form used for string match (not Spider's component exact match)."""
+    text = sql.strip().rstrip(";").replace('"', "'")
+    text = _SPACED_PUNCT_RE.sub(r"\1", _WS_RE.sub(" ", text))
+    return text.lower()
+
+
+def _all_rows(pipeline: NL2SQLPipeline, db_id: str, sql: str) -> List[Tuple[Any, ...]]:
+    executor = pipeline.executor_for(pipeline.catalog.get(db_id))
+    return [tuple(row) for chunk in executor.stream(sql) for row in chunk]
+
+
+def results_match(gold_sql: str, gold: Sequence[Tuple[Any, ...]], predicted: Sequence[Tuple[Any, ...]]) -> bool:
+    """Spider-style execution match: order matters only when the gold query sorts."""
+    if re.search(r"\border\s+by\b", gold_sql, re.IGNORECASE):
+        return list(gold) == list(predicted)
+    return Counter(gold) == Counter(predicted)
+
+
+def evaluate_chunk(chunk: Sequence[Example]) -> List[Dict[str, Any]]:
+    pipeline = _PIPELINE
+    assert pipeline is not None, "worker was not initialized"
+    records = []
+    for index, db_id, question, gold_sql in chunk:
+        record: Dict[str, Any] = {"index": index, "db_id": db_id, "question": question, "gold": gold_sql}
+        record["started_at"] = time.time()
+        start = time.perf_counter()
+        try:
+            output = pipeline.run(question, db_id, profile=False)
+        except Exception as exc:
+            record.update(predicted="", latency_ms=(time.perf_counter() - start) * 1000.0, error=str(exc))
+            record.update(exec_match=False, string_match=False)
+            records.append(record)
+            continue
+        record["latency_ms"] = (time.perf_counter() - start) * 1000.0
+        predicted = output.result.sql if output.result is not None and output.result.sql else output.sql
+        record.update(
+            predicted=predicted,
+            answer_path=output.answer_path,
+            failure_reason=output.failure_reason,
+            timings_ms={stage: seconds * 1000.0 for stage, seconds in output.timings.items()},
+            string_match=normalize_sql(predicted) == normalize_sql(gold_sql),
+        )
+        if output.result is None:
+            record["exec_match"] = False
+            records.append(record)
+            continue
+        try:
+            gold_rows = _all_rows(pipeline, db_id, gold_sql)
+            predicted_rows = [tuple(row) for row in output.result.iter_rows()]
+            record["exec_match"] = results_match(gold_sql, gold_rows, predicted_rows)
+        except Exception as exc:
+            record.update(exec_match=False, error=f"gold/prediction comparison failed: {exc}")
+        records.append(record)
+    return records
+
+
+def _chunks(examples: Sequence[Example], size: int) -> Iterator[List[Example]]:
+    for start in range(0, len(examples), size):
+        yield list(examples[start : start + size])
+
+
+def _take(iterator: Iterator[List[Example]], count: int) -> List[List[Example]]:
+    taken = []
+    for _ in range(count):
+        chunk = next(iterator, None)
+        if chunk is None:
+            break
+        taken.append(chunk)
+    return taken
+
+
+def run_evaluation(args: argparse.Namespace) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Evaluate the pending examples, appending each finished chunk to the checkpoint."""
+    examples = load_examples(args.questions, args.limit)
+    done = load_checkpoint(args.output) if args.resume else {}
+    if not args.resume and args.output.exists():
+        args.output.unlink()
+    pending = [example for example in examples if example[0] not in done]
+    print(f"{len(examples)} examples, {len(done)} already checkpointed, {len(pending)} to run.")
+    gold: Dict[str, List[str]] = {}
+    if args.model == "stub":
+        gold = {question: [sql] for _, _, question, sql in examples}
+
+    # Keep a database's questions together so each worker touches few connection pools.
+    pending.sort(key=lambda example: (example[1], example[0]))
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    fresh: List[Dict[str, Any]] = []
+    with args.output.open("a", encoding="utf-8") as sink, ProcessPoolExecutor(
+        max_workers=args.workers,
+        mp_context=get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(args, gold),
+    ) as pool:
+        chunks = iter(_chunks(pending, args.chunk_size))
+        # Bounded in-flight work: a crash loses at most a couple of chunks per worker.
+        in_flight = {pool.submit(evaluate_chunk, chunk) for chunk in _take(chunks, args.workers * 2)}
+        while in_flight:
+            completed, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in completed:
+                for record in future.result():
+                    sink.write(json.dumps(record) + "\n")
+                    done[record["index"]] = record
+                    fresh.append(record)
+                sink.flush()
+                os.fsync(sink.fileno())
+                in_flight |= {pool.submit(evaluate_chunk, chunk) for chunk in _take(chunks, 1)}
+            print(f"\r{len(done)}/{len(examples)} evaluated", end="", flush=True)
+    print()
+    indexes = {example[0] for example in examples}
+    return [done[idx] for idx in sorted(indexes & set(done))], fresh
+
+
+def throughput(records: Sequence[Dict[str, Any]]) -> float:
+    """Questions per second between the first question starting and the last finishing (model loads excluded)."""
+    if not records:
+        return 0.0
+    first = min(record["started_at"] for record in records)
+    last = max(record["started_at"] + record["latency_ms"] / 1000.0 for record in records)
+    return len(records) / (last - first) if last > first else 0.0
+
+
+def summarize(records: Sequence[Dict[str, Any]], fresh: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    total = len(records)
+    by_db: Dict[str, List[Dict[str, Any]]] = {}
+    for record in records:
+        by_db.setdefault(record["db_id"], []).append(record)
+    stages: Dict[str, List[float]] = {}
+    for record in records:
+        for stage, value in record.get("timings_ms", {}).items():
+            stages.setdefault(stage, []).append(value)
+    return {
+        "examples": total,
+        "execution_accuracy": sum(record["exec_match"] for record in records) / total if total else 0.0,
+        "string_match": sum(record["string_match"] for record in records) / total if total else 0.0,
+        "errors": sum(1 for record in records if record.get("error")),
+        "latency_ms": percentiles([record["latency_ms"] for record in records]),
+        "stages_ms": {stage: percentiles(values) for stage, values in sorted(stages.items())},
+        # Only examples run in this invocation count towards throughput.
+        "throughput_qps": throughput(fresh),
+        "per_database": {
+            db_id: {
+                "examples": len(group),
+                "execution_accuracy": sum(record["exec_match"] for record in group) / len(group),
+            }
+            for db_id, group in sorted(by_db.items())
+        },
+    }
+
+
+def print_summary(summary: Dict[str, Any], workers: int) -> None:
+    latency = summary["latency_ms"]
+    rows = [
+        ["examples", summary["examples"]],
+        ["execution accuracy", f"{summary['execution_accuracy']:.1%}"],
+        ["string match", f"{summary['string_match']:.1%}"],
+        ["errors", summary["errors"]],
+        ["latency p50 / p95 / p99 ms", f"{latency['p50']:.1f} / {latency['p95']:.1f} / {latency['p99']:.1f}"],
+        [f"throughput ({workers} workers)", f"{summary['throughput_qps']:.2f} q/s"],
+    ]
+    print(tabulate(rows, tablefmt="github"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Execution accuracy, string match and speed over a Spider split.")
+    parser.add_argument("--questions", required=True, type=Path, help="Spider dev.json (db_id/question/query).")
+    parser.add_argument(
+        "--schema-path",
+        default="data/spider_schema.json",
+        help="Schema JSON from import_spider_schema.py (points at the .sqlite files).",
+    )
+    parser.add_argument("--output", default=Path("eval/spider_dev.jsonl"), type=Path, help="Per-question JSONL checkpoint.")
+    parser.add_argument("--summary", default=None, type=Path, help="Also write the summary as JSON.")
+    parser.add_argument("--no-resume", dest="resume", action="store_false", help="Start over instead of resuming.")
+    parser.add_argument("--limit", type=int, default=None, help="Only the first N examples.")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2), help="Model replicas.")
+    parser.add_argument("--threads-per-worker", type=int, default=None, help="torch intra-op threads per replica.")
+    parser.add_argument("--chunk-size", type=int, default=16, help="Examples per task (and per checkpoint write).")
+    parser.add_argument("--model", choices=["stub", "hf"], default="hf", help="Real checkpoint or the gold-answering stub.")
+    parser.add_argument("--model-name", default=None, help="Override Hugging Face model checkpoint.")
+    parser.add_argument("--device", default=None, help="Force device placement (cpu/cuda).")
+    parser.add_argument("--backend", choices=["torch", "onnx"], default=None, help="Inference backend.")
+    parser.add_argument("--onnx-path", default=None, help="Exported ONNX model directory.")
+    parser.add_argument("--num-beams", type=int, default=None, help="Override the beam width.")
+    parser.add_argument("--adaptive", action="store_true", help="Adaptive decoding (greedy first).")
+    parser.add_argument("--constrained", action="store_true", help="Schema-constrained decoding.")
+    parser.add_argument("--prefill-ms", type=float, default=2.0, help="Stub model: simulated cost per prompt.")
+    parser.add_argument("--step-ms", type=float, default=0.5, help="Stub model: simulated cost per output token.")
+    args = parser.parse_args()
+
+    records, fresh = run_evaluation(args)
+    summary = summarize(records, fresh)
+    print_summary(summary, args.workers)
+    if args.summary is not None:
+        args.summary.parent.mkdir(parents=True, exist_ok=True)
+        args.summary.write_text(json.dumps(summary, indent=2))
+    print(f"Per-question results in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import argparse
+import sys
+from dataclasses import replace
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.text_to_sql.backends import export_onnx  # noqa: E402
+from src.text_to_sql.config import PipelineConfig  # noqa: E402
+from src.text_to_sql.model import TextToSQLModel  # noqa: E402
+from src.text_to_sql.schema import SchemaCatalog  # noqa: E402
+from src.text_to_sql.workload import WORKLOAD  # noqa: E402
+
+def _config(args: argparse.Namespace, backend: str) -> PipelineConfig:
+    config = PipelineConfig()
+    if args.model_name:
+        config.model.model_name = args.model_name
+    config.model = replace(config.model, backend=backend, onnx_path=args.output)
+    config.device = "cpu"
+    return config
+
+
+def run_export(args: argparse.Namespace) -> None:
+    config = _config(args, "torch")
+    model = TextToSQLModel(config, load_weights=False)
+    export_onnx(config.model.model_name, args.output, tokenizer=model.tokenizer)
+    print(f"ONNX encoder/decoder exported to {args.output}")
+
+
+def run_check(args: argparse.Namespace) -> None:
+    reference = TextToSQLModel(_config(args, "torch"))
+    candidate = TextToSQLModel(_config(args, "onnx"))
+    catalog = SchemaCatalog(Path(args.schema_path))
+    mismatches = 0
+    total = 0
+    for schema_name, question, _ in WORKLOAD:
+        if schema_name not in catalog:
+            continue
+        schema = catalog.get(schema_name)
+        expected = reference.generate(question, schema)
+        actual = candidate.generate(question, schema)
+        for rank, (left, right) in enumerate(zip(expected, actual)):
+            total += 1
+            same_sql = left.sql == right.sql
+            score_gap = abs(left.score - right.score)
+            if same_sql and score_gap <= args.tolerance:
+                continue
+            mismatches += 1
+            print(f"[{schema_name}] rank {rank} differs for: {question}")
+            print(f"  torch ({left.score:.4f}): {left.sql}")
+            print(f"  onnx  ({right.score:.4f}): {right.sql}")
+    print(f"{total - mismatches}/{total} candidates match (score tolerance {args.tolerance}).")
+    if mismatches:
+        sys.exit(1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export the seq2seq model to ONNX and verify the ONNX backend.")
+    parser.add_argument("command", choices=["export", "check"], help="export the model or compare backends.")
+    parser.add_argument("--model-name", default=None, help="Hugging Face checkpoint to export.")
+    parser.add_argument(
+        "--output",
+        default=Path("models/onnx"),
+        type=Path,
+        help="Directory for the exported ONNX graphs (also read by `check`).",
+    )
+    parser.add_argument(
+        "--schema-path",
+        default="data/sample_schema.json",
+        help="Schema JSON holding the company/university/retail databases.",
+    )
+    parser.add_argument("--tolerance", type=float, default=1e-3, help="Max allowed beam score difference.")
+    args = parser.parse_args()
+    if args.command == "export":
+        run_export(args)
+    else:
+        run_check(args)
+
+
+if __name__ == "__main__":
+    main()
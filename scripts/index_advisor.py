@@ -0,0 +1,118 @@
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from tabulate import tabulate  # noqa: E402
+
+from src.text_to_sql.advisor import IndexAdvisor, compare_replays, load_query_log  # noqa: E402
+from src.text_to_sql.config import ExecutorConfig  # noqa: E402
+
+
+def _shorten(sql: str, width: int = 70) -> str:
+    return sql if len(sql) <= width else sql[: width - 3] + "..."
+
+
+def print_candidates(candidates: List[Dict[str, Any]]) -> None:
+    if not candidates:
+        print("No index candidates: no logged query scans a table above --min-rows / --min-seconds.")
+        return
+    rows = [
+        [
+            candidate["index"],
+            Path(candidate["db"]).name,
+            f"{candidate['table_rows']:,}",
+            candidate["queries"],
+            candidate["executions"],
+            f"{candidate['seconds']:.3f}",
+        ]
+        for candidate in candidates
+    ]
+    print(tabulate(rows, headers=["index", "db", "table rows", "queries", "executions", "logged s"], tablefmt="github"))
+    print()
+    for candidate in candidates:
+        print(f"{candidate['ddl']};")
+
+
+def print_comparison(comparison: Dict[str, Any], top: int) -> None:
+    rows = [
+        [
+            _shorten(row["sql"]),
+            row["count"],
+            f"{row['before_s'] * 1000:.2f}",
+            f"{row['after_s'] * 1000:.2f}",
+            f"{row['speedup']:.1f}x" if row["speedup"] else "-",
+        ]
+        for row in comparison["queries"][:top]
+    ]
+    print(tabulate(rows, headers=["query", "count", "before ms", "after ms", "speed-up"], tablefmt="github"))
+    speedup = comparison["speedup"]
+    print(
+        f"\nweighted replay: {comparison['before_weighted_s']:.3f}s -> {comparison['after_weighted_s']:.3f}s"
+        + (f" ({speedup:.1f}x)" if speedup else "")
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Suggest (and optionally create) SQLite indexes from the executor's query log."
+    )
+    parser.add_argument("--log", type=Path, required=True, help="JSONL written via ExecutorConfig.query_log_path.")
+    parser.add_argument("--min-rows", type=int, default=1000, help="Ignore tables smaller than this.")
+    parser.add_argument(
+        "--min-seconds", type=float, default=0.0, help="Drop candidates whose queries logged less time than this."
+    )
+    parser.add_argument("--top", type=int, default=10, help="Apply/show at most this many candidates.")
+    parser.add_argument("--since", type=float, default=None, help="Only use log entries after this Unix time.")
+    parser.add_argument("--apply", action="store_true", help="Create the suggested indexes (then ANALYZE).")
+    parser.add_argument("--no-analyze", action="store_true", help="Skip ANALYZE after creating indexes.")
+    parser.add_argument(
+        "--replay", action="store_true", help="Time the logged queries before and after --apply (implied by --apply)."
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Replay runs per query (the median counts).")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-query time budget during replay, seconds.")
+    parser.add_argument("--output", type=Path, default=None, help="Write the report as JSON.")
+    args = parser.parse_args()
+
+    queries = load_query_log(args.log, since=args.since)
+    if not queries:
+        parser.error(f"{args.log} holds no successful or timed-out queries.")
+    advisor = IndexAdvisor(ExecutorConfig(query_timeout_s=args.timeout or None), min_rows=args.min_rows)
+    candidates = [candidate for candidate in advisor.advise(queries) if candidate.seconds >= args.min_seconds]
+    candidates = candidates[: args.top]
+    report: Dict[str, Any] = {
+        "log": str(args.log),
+        "distinct_queries": len(queries),
+        "executions": sum(query.count for query in queries),
+        "candidates": [candidate.as_dict() for candidate in candidates],
+    }
+    print(f"{report['executions']} logged executions, {len(queries)} distinct queries.\n")
+    print_candidates(report["candidates"])
+
+    replay = args.replay or args.apply
+    if replay and candidates:
+        print(f"\nReplaying {len(queries)} queries x{args.repeat} ...")
+        before = advisor.replay(queries, repeat=args.repeat)
+        if args.apply:
+            report["applied"] = advisor.apply(candidates, analyze=not args.no_analyze)
+            for applied in report["applied"]:
+                print(f"created {applied['index']} in {applied['seconds']:.2f}s")
+            after = advisor.replay(queries, repeat=args.repeat)
+            report["replay"] = compare_replays(before, after)
+            print()
+            print_comparison(report["replay"], args.top)
+        else:
+            report["replay"] = {"before_weighted_s": before["weighted_s"], "timings": before["timings"]}
+            print(f"weighted replay (current indexes): {before['weighted_s']:.3f}s; rerun with --apply to compare.")
+
+    if args.output is not None:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import abc
+from pathlib import Path
+from typing import Any, Dict, Optional, Type
+
+import torch
+from transformers import AutoModelForSeq2SeqLM
+
+from .config import PipelineConfig
+
+
+class InferenceBackend(abc.ABC):
+    """Runs ``generate`` for ``TextToSQLModel``; subclasses own how the seq2seq weights execute."""
+
+    name = "base"
+
+    def __init__(self, config: PipelineConfig, device: torch.device):
+        self.config = config
+        self.device = device
+        self.model: Any = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.model is not None
+
+    def _require_model(self) -> Any:
+        if self.model is None:
+            raise RuntimeError("Model weights are not loaded; call load_weights() first.")
+        return self.model
+
+    @abc.abstractmethod
+    def load(self) -> None:
+        """Load the weights into ``self.model`` (a no-op when already loaded)."""
+
+    @abc.abstractmethod
+    def generate(self, **kwargs: Any) -> Any:
+        """Run Hugging Face style ``generate`` and return its output."""
+
+    @abc.abstractmethod
+    def encode(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> Optional[torch.Tensor]:
+        """Return encoder hidden states for reuse across decoding passes, or None if unsupported."""
+
+    def describe(self) -> str:
+        return self.name
+
+
+class TorchBackend(InferenceBackend):
+    name = "torch"
+
+    def load(self) -> None:
+        if self.model is None:
+            model = AutoModelForSeq2SeqLM.from_pretrained(self.config.model.model_name)
+            model.to(self.device)
+            model.eval()
+            self.model = model
+
+    def generate(self, **kwargs: Any) -> Any:
+        model = self._require_model()
+        with torch.inference_mode():
+            return model.generate(**kwargs)
+
+    def encode(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> Optional[torch.Tensor]:
+        model = self._require_model()
+        with torch.inference_mode():
+            encoder = model.get_encoder()
+            return encoder(input_ids=input_ids, attention_mask=attention_mask, return_dict=True).last_hidden_state
+
+
+def _ort_model_class() -> Any:
+    try:
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    except ImportError as exc:  # pragma: no cover - optional dependency
+        raise ImportError(
+            "The onnx backend needs ONNX Runtime and Optimum: pip install 'optimum[onnxruntime]'"
+        ) from exc
+    return ORTModelForSeq2SeqLM
+
+
+class OnnxBackend(InferenceBackend):
+    """Encoder + decoder-with-past exported to ONNX; beam search runs on ONNX Runtime (CPU)."""
+
+    name = "onnx"
+
+    def _source(self) -> Path:
+        return Path(self.config.model.onnx_path or self.config.model.model_name)
+
+    def load(self) -> None:
+        if self.model is not None:
+            return
+        model_cls = _ort_model_class()
+        source = self._source()
+        exported = source.is_dir() and any(source.glob("encoder_model*.onnx"))
+        self.model = model_cls.from_pretrained(
+            str(source) if exported else self.config.model.model_name,
+            export=not exported,
+            use_cache=True,
+            provider=self.config.model.onnx_provider,
+        )
+
+    def generate(self, **kwargs: Any) -> Any:
+        return self._require_model().generate(**kwargs)
+
+    def encode(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> Optional[torch.Tensor]:
+        # The exported encoder runs inside ORT's generate; its states are not exposed for reuse.
+        return None
+
+    def describe(self) -> str:
+        return f"{self.name}:{self._source()}"
+
+
+BACKENDS: Dict[str, Type[InferenceBackend]] = {
+    TorchBackend.name: TorchBackend,
+    OnnxBackend.name: OnnxBackend,
+}
+
+
+def create_backend(config: PipelineConfig, device: torch.device) -> InferenceBackend:
+    try:
+        backend_cls = BACKENDS[config.model.backend]
+    except KeyError as exc:
+        raise ValueError(
+            f"Unknown backend {config.model.backend!r}; expected one of {sorted(BACKENDS)}."
+        ) from exc
+    return backend_cls(config, device)
+
+
+def export_onnx(model_name: str, output_dir: Path, tokenizer: Optional[Any] = None) -> Path:
+    """Export ``model_name`` to ``output_dir`` (encoder, decoder, decoder-with-past ONNX graphs)."""
+    model_cls = _ort_model_class()
+    model = model_cls.from_pretrained(model_name, export=True, use_cache=True)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    model.save_pretrained(output_dir)
+    if tokenizer is not None:
+        tokenizer.save_pretrained(output_dir)
+    return output_dir
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import CacheConfig
+
+CachedCandidates = List[Tuple[str, float]]
+
+
+def normalize_question(question: str) -> str:
+    lowered = re.sub(r"\s+", " ", question.strip().lower())
+    return lowered.rstrip("?.! ")
+
+
+class GenerationCache:
+    """Two-tier (in-memory LRU + optional SQLite file) cache of generated SQL candidates."""
+
+    def __init__(self, config: CacheConfig):
+        self.config = config
+        self._memory: "OrderedDict[str, Tuple[Optional[float], CachedCandidates]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk: Optional[sqlite3.Connection] = None
+        self._puts = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if config.disk_path:
+            self._open_disk(Path(config.disk_path))
+
+    def _open_disk(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        # WAL lets several uvicorn workers and CLI runs read and write the same file.
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS generations (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS generations_last_access ON generations(last_access)")
+        self._disk = conn
+
+    @staticmethod
+    def make_key(
+        question: str,
+        schema_name: str,
+        schema_fingerprint: str,
+        model_fingerprint: str,
+        decoding: Dict[str, Any],
+    ) -> str:
+        payload = json.dumps(
+            [normalize_question(question), schema_name.lower(), schema_fingerprint, model_fingerprint, decoding],
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _expiry(self, now: float) -> Optional[float]:
+        return now + self.config.ttl_seconds if self.config.ttl_seconds else None
+
+    def get(self, key: str) -> Optional[CachedCandidates]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._memory[key]
+            if self._disk is not None:
+                row = self._disk.execute(
+                    "SELECT value, expires_at FROM generations WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and (row[1] is None or row[1] > now):
+                    value = [(sql, score) for sql, score in json.loads(row[0])]
+                    self._disk.execute("UPDATE generations SET last_access = ? WHERE key = ?", (now, key))
+                    self._remember(key, row[1], value)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return value
+            self.misses += 1
+            return None
+
+    def _remember(self, key: str, expires_at: Optional[float], value: CachedCandidates) -> None:
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.config.max_entries:
+            self._memory.popitem(last=False)
+
+    def put(self, key: str, value: CachedCandidates) -> None:
+        now = time.time()
+        expires_at = self._expiry(now)
+        with self._lock:
+            self._remember(key, expires_at, value)
+            if self._disk is None:
+                return
+            self._disk.execute(
+                "INSERT OR REPLACE INTO generations (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires_at, now),
+            )
+            self._puts += 1
+            if self._puts % 256 == 0:
+                self._evict_disk(now)
+
+    def _evict_disk(self, now: float) -> None:
+        assert self._disk is not None
+        self._disk.execute("DELETE FROM generations WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+        (count,) = self._disk.execute("SELECT COUNT(*) FROM generations").fetchone()
+        overflow = count - self.config.disk_max_entries
+        if overflow > 0:
+            self._disk.execute(
+                "DELETE FROM generations WHERE key IN "
+                "(SELECT key FROM generations ORDER BY last_access ASC LIMIT ?)",
+                (overflow,),
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._disk is not None:
+                self._disk.execute("DELETE FROM generations")
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }
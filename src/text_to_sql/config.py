@@ -10,6 +10,12 @@ class ModelConfig:
     max_output_tokens: int = 196
     num_beams: int = 6
     temperature: float = 0.0
+    batch_size: int = 8
+    length_bucketing: bool = True
+    # "torch" (eager PyTorch) or "onnx" (ONNX Runtime via Optimum).
+    backend: str = "torch"
+    onnx_path: Optional[Path] = None
+    onnx_provider: str = "CPUExecutionProvider"
 
 
 @dataclass
@@ -19,16 +25,156 @@ class SchemaConfig:
     max_tables: int = 6
     max_columns_per_table: int = 16
     include_sample_values: bool = True
+    binary_cache: bool = True
+
+
+@dataclass
+class ExecutorConfig:
+    pool_size: int = 4
+    # Seconds to wait for a free pooled connection before raising PoolExhausted (None waits forever).
+    pool_timeout_s: Optional[float] = 30.0
+    # Streams read on their own connections outside the pool, so slow clients never starve
+    # queries; at most this many are open at once per database.
+    max_streams: int = 8
+    read_only: bool = True
+    mmap_size: int = 256 * 1024 * 1024
+    cache_size_kib: int = 16 * 1024
+    cached_statements: int = 256
+    # Databases up to this size are copied into :memory: (0 disables snapshots).
+    snapshot_max_bytes: int = 0
+    preview_rows: int = 50
+    fetch_chunk_rows: int = 500
+    query_timeout_s: Optional[float] = 5.0
+    max_rows: Optional[int] = 1_000_000
+    progress_interval: int = 1000
+    validation_cache_size: int = 4096
+    # Shared LRU of executed results, keyed on normalized SQL + database path and dropped whenever the
+    # database file (or its WAL) changes. 0 disables it; larger results are never cached.
+    result_cache_bytes: int = 64 * 1024 * 1024
+    result_cache_max_entry_bytes: int = 2 * 1024 * 1024
+    # Append every query that reaches SQLite (SQL, parameters, seconds) to this JSONL file for the
+    # index advisor (scripts/index_advisor.py). None disables logging.
+    query_log_path: Optional[Path] = None
+
+
+@dataclass
+class ServingConfig:
+    max_batch_size: int = 8
+    max_wait_ms: float = 10.0
+    warmup_runs: int = 1
+    warmup_question: str = "How many rows are there?"
+    # Materialize and compile every catalog schema at startup (servers); otherwise schemas load
+    # lazily on first use and startup only resolves the schemas it is asked for.
+    preload_schemas: bool = False
+    # Warm-up covers at most this many schemas in catalog order (0: all of them).
+    warmup_max_schemas: int = 3
+    # NDJSON streams from /api/query: rows per chunk (None: executor.fetch_chunk_rows) and how long
+    # SQLite may work on one chunk before the stream is cut (0: no limit; a client disconnect still
+    # cancels the query). Time the client spends reading does not count.
+    stream_chunk_rows: Optional[int] = None
+    stream_idle_timeout_s: float = 60.0
+    # Dashboard results kept so "Next"/"Previous" page through their SQL instead of re-answering.
+    paged_results: int = 256
+
+
+@dataclass
+class CacheConfig:
+    enabled: bool = True
+    max_entries: int = 1024
+    ttl_seconds: Optional[float] = 24 * 3600.0
+    disk_path: Optional[Path] = None
+    disk_max_entries: int = 100_000
+
+
+@dataclass
+class MetricsConfig:
+    # Off: no per-request stage timers, and /metrics only reports gauges.
+    enabled: bool = True
+    latency_buckets: List[float] = field(
+        default_factory=lambda: [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+    )
+
+
+@dataclass
+class ProfilingConfig:
+    # Profile every request, or a random ``sample_rate`` fraction.
+    enabled: bool = False
+    sample_rate: float = 0.0
+    # The dashboard only lets clients force or skip profiling through ``header`` when profiling is
+    # enabled or ``allow_header`` is set, so callers cannot switch on profiling on their own.
+    header: str = "X-Profile"
+    allow_header: bool = False
+    output_dir: Path = Path("profiles")
+    # "cprofile" or "torch" (torch.profiler chrome trace) around generation.
+    generation_profiler: str = "cprofile"
+    tracemalloc_frames: int = 5
+    top_allocations: int = 25
+
+
+@dataclass
+class TemplateConfig:
+    # Learn (question skeleton -> parameterized SQL) templates from model answers and answer
+    # questions that fit one without running the model.
+    enabled: bool = False
+    max_templates: int = 2048
+    # Failed executions before a template is evicted.
+    max_failures: int = 1
+    max_text_slot_words: int = 3
+
+
+@dataclass
+class RuleConfig:
+    # Hand-written (keywords + patterns -> parameterized SQL) rules, one file per schema:
+    # ``<rules_dir>/<schema>.json`` (or ``.yaml`` when PyYAML is installed).
+    enabled: bool = True
+    rules_dir: Path = Path("data/rules")
+    # Answer matching questions before the model runs; False only tries rules after every candidate failed.
+    fast_path: bool = True
+
+
+@dataclass
+class ReplicaConfig:
+    # 0 serves from one in-process pipeline; N > 0 runs N model processes behind a least-loaded dispatcher.
+    count: int = 0
+    # torch intra-op threads per replica (None: the usable cores split evenly).
+    threads_per_replica: Optional[int] = None
+    # Pin each replica to its own core subset (Linux sched_setaffinity).
+    pin_cores: bool = True
+    # Time a few replica/thread splits at startup and serve with the fastest.
+    calibrate: bool = False
+    calibration_requests: int = 32
+    calibration_max_replicas: int = 8
+    start_timeout_s: float = 600.0
+    # Start a fresh process for a replica whose process died; it rejoins the pool once warmed up.
+    respawn: bool = True
 
 
 @dataclass
 class PipelineConfig:
     model: ModelConfig = field(default_factory=ModelConfig)
     schema: SchemaConfig = field(default_factory=SchemaConfig)
+    executor: ExecutorConfig = field(default_factory=ExecutorConfig)
+    serving: ServingConfig = field(default_factory=ServingConfig)
+    cache: CacheConfig = field(default_factory=CacheConfig)
+    metrics: MetricsConfig = field(default_factory=MetricsConfig)
+    profiling: ProfilingConfig = field(default_factory=ProfilingConfig)
+    replicas: ReplicaConfig = field(default_factory=ReplicaConfig)
+    templates: TemplateConfig = field(default_factory=TemplateConfig)
+    rules: RuleConfig = field(default_factory=RuleConfig)
     device: Optional[str] = None
     enable_execution_guidance: bool = True
     top_k: int = 3
+    execution_workers: int = 3
+    # Adaptive decoding tries these beam widths first and widens to ``model.num_beams`` only on failure.
+    adaptive_decoding: bool = False
+    decoding_tiers: List[int] = field(default_factory=lambda: [1])
+    # "engine" compiles candidates with EXPLAIN on a read-only connection; "sqlparse" keeps the text checks.
+    validation_mode: str = "engine"
+    # Decoding ends at any of these tokens or at a statement-closing ";".
     stop_tokens: List[str] = field(default_factory=lambda: ["<pad>", "</s>"])
+    # Mask identifiers after FROM/JOIN (and, optionally, column clauses) to names in the target schema.
+    constrained_decoding: bool = False
+    constrain_columns: bool = False
     include_relations_in_prompt: bool = True
     max_relation_paths: int = 3
     verbose: bool = True
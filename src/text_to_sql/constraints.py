@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Set, Tuple
+
+import torch
+from transformers import LogitsProcessor, PreTrainedTokenizerBase, StoppingCriteria
+
+from .schema import DatabaseSchema
+
+# Clause keywords after which the next identifier must be a table (or column) of the target schema.
+_TABLE_SLOT_RE = re.compile(r"(?:^|[\s(])(?:from|join)$", re.IGNORECASE)
+_COLUMN_SLOT_RE = re.compile(r"(?:(?:^|[\s(])(?:select|distinct|where|by|and|or|on|having)|,)$", re.IGNORECASE)
+
+# Words that may legitimately open a column slot instead of a column name.
+COLUMN_ESCAPES = (
+    "DISTINCT", "COUNT", "SUM", "AVG", "MIN", "MAX", "NOT", "CASE", "CAST", "LOWER", "UPPER", "ROUND",
+    "LENGTH", "ABS", "EXISTS", "NULL", "T1", "T2", "T3", "T4",
+)
+_CONTEXT_TOKENS = 8
+
+
+class NameTrie:
+    """Prefix trie over the token ids of a set of identifiers."""
+
+    def __init__(self, sequences: Iterable[Sequence[int]]):
+        self.children: List[Dict[int, int]] = [{}]
+        self.terminal: List[bool] = [False]
+        for ids in sequences:
+            node = 0
+            for token_id in ids:
+                nxt = self.children[node].get(token_id)
+                if nxt is None:
+                    nxt = len(self.children)
+                    self.children[node][token_id] = nxt
+                    self.children.append({})
+                    self.terminal.append(False)
+                node = nxt
+            if node:
+                self.terminal[node] = True
+
+    def child(self, node: int, token_id: int) -> Optional[int]:
+        return self.children[node].get(token_id)
+
+
+@dataclass
+class SchemaConstraints:
+    """Tokenized table/column tries for one schema, built once and shared by every decode."""
+
+    tables: NameTrie
+    columns: NameTrie
+    table_escapes: FrozenSet[int]
+    column_escapes: FrozenSet[int]
+
+
+@dataclass(frozen=True)
+class _SlotState:
+    slot: Optional[str] = None
+    node: int = 0
+
+
+class ConstraintCompiler:
+    def __init__(self, tokenizer: PreTrainedTokenizerBase):
+        self.tokenizer = tokenizer
+        self._compiled: Dict[str, SchemaConstraints] = {}
+        self._open_paren: Optional[FrozenSet[int]] = None
+        self._symbol_starts: Optional[FrozenSet[int]] = None
+
+    def _ids(self, text: str) -> List[int]:
+        return self.tokenizer(text, add_special_tokens=False)["input_ids"]
+
+    def _variants(self, names: Iterable[str]) -> List[List[int]]:
+        sequences = []
+        for name in set(names):
+            for variant in {name, name.lower()}:
+                sequences.append(self._ids(variant))
+                sequences.append(self._ids(" " + variant))
+        return sequences
+
+    def _scan_vocab(self) -> None:
+        open_paren: Set[int] = set()
+        symbols: Set[int] = set()
+        special = set(self.tokenizer.all_special_ids)
+        for token, token_id in self.tokenizer.get_vocab().items():
+            if token_id in special:
+                continue
+            text = token.lstrip("▁Ġ")
+            if text.startswith("("):
+                open_paren.add(token_id)
+            if text and not (text[0].isalpha() or text[0] == "_"):
+                symbols.add(token_id)
+        self._open_paren = frozenset(open_paren)
+        self._symbol_starts = frozenset(symbols)
+
+    def for_schema(self, schema: DatabaseSchema) -> SchemaConstraints:
+        compiled = self._compiled.get(schema.name)
+        if compiled is not None:
+            return compiled
+        if self._open_paren is None:
+            self._scan_vocab()
+        keyword_ids = {ids[0] for ids in self._variants(COLUMN_ESCAPES) if ids}
+        compiled = SchemaConstraints(
+            tables=NameTrie(self._variants(table.name for table in schema.tables)),
+            columns=NameTrie(self._variants(col.name for table in schema.tables for col in table.columns)),
+            # Subqueries may follow FROM; numbers, quotes, "*" and functions may follow SELECT/WHERE.
+            table_escapes=self._open_paren,
+            column_escapes=frozenset(self._symbol_starts | keyword_ids),
+        )
+        self._compiled[schema.name] = compiled
+        return compiled
+
+
+class SchemaConstrainedLogits(LogitsProcessor):
+    """Masks identifier tokens after FROM/JOIN (and optionally column clauses) to names in the schema.
+
+    Only the previous step's slot states are kept, one per distinct row prefix; each step advances
+    them by the row's newest token, so reordered beams pick up their parent's state and memory stays
+    linear in the number of rows.
+    """
+
+    def __init__(
+        self,
+        tokenizer: PreTrainedTokenizerBase,
+        constraints: Sequence[SchemaConstraints],
+        num_beams: int,
+        constrain_columns: bool = False,
+    ):
+        self.tokenizer = tokenizer
+        self.constraints = constraints
+        self.num_beams = max(1, num_beams)
+        self.constrain_columns = constrain_columns
+        self._previous: Dict[Tuple[int, Tuple[int, ...]], _SlotState] = {}
+
+    def _trie(self, constraints: SchemaConstraints, slot: str) -> NameTrie:
+        return constraints.tables if slot == "table" else constraints.columns
+
+    def _open_slot(self, context: Sequence[int]) -> Optional[str]:
+        text = self.tokenizer.decode(context[-_CONTEXT_TOKENS:], skip_special_tokens=True).rstrip()
+        if _TABLE_SLOT_RE.search(text):
+            return "table"
+        if self.constrain_columns and _COLUMN_SLOT_RE.search(text):
+            return "column"
+        return None
+
+    def _advance(self, question: int, parent: _SlotState, prefix: Sequence[int], end: int) -> _SlotState:
+        """State after ``prefix[:end]``, given the state after ``prefix[:end - 1]``."""
+        if parent.slot is not None:
+            child = self._trie(self.constraints[question], parent.slot).child(parent.node, prefix[end - 1])
+            if child is not None:
+                return _SlotState(parent.slot, child)
+        slot = self._open_slot(prefix[max(0, end - _CONTEXT_TOKENS):end])
+        return _SlotState(slot, 0) if slot is not None else _SlotState()
+
+    def _state(self, question: int, prefix: Tuple[int, ...]) -> _SlotState:
+        # Position 0 is the decoder start token, which never opens a slot.
+        if len(prefix) <= 1:
+            return _SlotState()
+        parent = self._previous.get((question, prefix[:-1]))
+        if parent is not None:
+            return self._advance(question, parent, prefix, len(prefix))
+        # First step seen for this row (e.g. generation started from a forced prefix): replay it.
+        state = _SlotState()
+        for end in range(2, len(prefix) + 1):
+            state = self._advance(question, state, prefix, end)
+        return state
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor) -> torch.FloatTensor:
+        current: Dict[Tuple[int, Tuple[int, ...]], _SlotState] = {}
+        for row in range(input_ids.shape[0]):
+            question = row // self.num_beams
+            constraints = self.constraints[question]
+            key = (question, tuple(input_ids[row].tolist()))
+            state = current.get(key)
+            if state is None:
+                state = current[key] = self._state(*key)
+            if state.slot is None:
+                continue
+            trie = self._trie(constraints, state.slot)
+            if trie.terminal[state.node]:
+                continue  # a complete name may end here or keep extending
+            allowed = set(trie.children[state.node])
+            if state.node == 0:
+                allowed |= constraints.table_escapes if state.slot == "table" else constraints.column_escapes
+            if not allowed:
+                continue
+            mask = torch.full_like(scores[row], float("-inf"))
+            mask[list(allowed)] = 0.0
+            scores[row] = scores[row] + mask
+        self._previous = current
+        return scores
+
+
+class StatementComplete(StoppingCriteria):
+    """Stops a sequence once it emits a stop token or closes the statement with ``;``.
+
+    Each step only looks at the newly generated token of every row; the whole sequence is inspected
+    (one vectorized lookup, for quote balance) only in the rare step where a row emits ``;``.
+
+    Hugging Face beam search ends only once every beam satisfies the criterion (and finished
+    hypotheses already stop at EOS), so in practice this shortens greedy decoding; beam runs
+    still stop at ``max_new_tokens`` or when all beams have closed their statements.
+    """
+
+    def __init__(self, tokenizer: PreTrainedTokenizerBase, stop_tokens: Sequence[str]):
+        self.tokenizer = tokenizer
+        unk = tokenizer.unk_token_id
+        self.stop_ids = {
+            token_id for token_id in tokenizer.convert_tokens_to_ids(list(stop_tokens)) if token_id not in (None, unk)
+        }
+        vocab = tokenizer.get_vocab()
+        self.terminator_ids = {token_id for token, token_id in vocab.items() if token.rstrip().endswith(";")}
+        # Single and double quotes per token id, so a sequence's quote balance is one gather and sum.
+        self._quotes = torch.zeros((max(vocab.values(), default=0) + 1, 2), dtype=torch.long)
+        for token, token_id in vocab.items():
+            if "'" in token or '"' in token:
+                self._quotes[token_id] = torch.tensor([token.count("'"), token.count('"')])
+        self._stop = torch.tensor(sorted(self.stop_ids), dtype=torch.long)
+        self._terminators = torch.tensor(sorted(self.terminator_ids), dtype=torch.long)
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        done = torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+        # Position 0 is the decoder start token (``<pad>`` for T5), which is not a stop.
+        if input_ids.shape[1] < 2:
+            return done
+        last = input_ids[:, -1].cpu()
+        done |= torch.isin(last, self._stop).to(done.device)
+        closing = torch.isin(last, self._terminators).nonzero().flatten()
+        if len(closing):
+            ids = input_ids[closing].cpu()
+            # Ids past the tokenizer vocabulary (padding rows of the output layer) carry no quotes.
+            known = ids < len(self._quotes)
+            quotes = self._quotes[ids.clamp(max=len(self._quotes) - 1)] * known.unsqueeze(-1)
+            balanced = (quotes.sum(dim=1) % 2 == 0).all(dim=1)
+            done[closing.to(done.device)] |= balanced.to(done.device)
+        return done
@@ -1,29 +1,637 @@
 from __future__ import annotations
 
+import json
+import os
+import re
 import sqlite3
-from dataclasses import dataclass
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing, contextmanager
+from dataclasses import dataclass, field
+from itertools import chain
 from pathlib import Path
-from typing import Any, List, Sequence
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
 
-import pandas as pd
 from tabulate import tabulate
 
+from .config import ExecutorConfig
+
+
+_READ_ACTIONS = {
+    sqlite3.SQLITE_SELECT,
+    sqlite3.SQLITE_READ,
+    sqlite3.SQLITE_FUNCTION,
+    getattr(sqlite3, "SQLITE_RECURSIVE", 33),
+}
+
+
+def _read_only_authorizer(action: int, *_: Any) -> int:
+    return sqlite3.SQLITE_OK if action in _READ_ACTIONS else sqlite3.SQLITE_DENY
+
+
+class QueryTimeout(Exception):
+    """Raised when a query exceeds its wall-clock budget."""
+
+
+class QueryCancelled(Exception):
+    """Raised when a running query is interrupted through its cancel event."""
+
+
+class RowBudgetExceeded(Exception):
+    """Raised when a query produces more rows than the configured budget."""
+
+
+class PoolExhausted(Exception):
+    """Raised when no connection (or stream slot) frees up within ``pool_timeout_s``."""
+
 
 @dataclass
 class ExecutionResult:
     columns: Sequence[str]
     rows: List[Sequence[Any]]
+    truncated: bool = False
+    sql: Optional[str] = None
+    params: Sequence[Any] = ()
+    offset: int = 0
+    cache_hit: bool = False
+    _executor: Optional["SQLiteExecutor"] = field(default=None, repr=False, compare=False)
+    _total: Optional[int] = field(default=None, repr=False, compare=False)
 
     def as_table(self) -> str:
         return tabulate(self.rows, headers=self.columns, tablefmt="github")
 
+    def iter_rows(self) -> Iterator[Sequence[Any]]:
+        """Iterate every row of the query, re-reading the cursor beyond the preview."""
+        if (not self.truncated and self.offset == 0) or self._executor is None or self.sql is None:
+            return iter(self.rows)
+        return chain.from_iterable(self._executor.stream(self.sql, self.params))
+
+    def total_count(self) -> int:
+        if self._total is None:
+            if not self.truncated and self.offset == 0:
+                self._total = len(self.rows)
+            elif self._executor is None or self.sql is None:
+                raise RuntimeError("Result is detached from its executor.")
+            else:
+                self._total = self._executor.count(self.sql, self.params)
+        return self._total
+
+    def page(self, page: int, page_size: Optional[int] = None) -> "ExecutionResult":
+        if self._executor is None or self.sql is None:
+            raise RuntimeError("Result is detached from its executor.")
+        return self._executor.fetch_page(self.sql, page, page_size, self.params)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = dict(self.__dict__)
+        state["_executor"] = None
+        return state
+
+
+class ConnectionPool:
+    """Thread-safe pool of tuned, read-only connections to one SQLite database."""
+
+    def __init__(self, db_path: Path, config: Optional[ExecutorConfig] = None):
+        self.db_path = Path(db_path)
+        self.config = config or ExecutorConfig()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(1, self.config.pool_size))
+        self._stream_slots = threading.BoundedSemaphore(max(1, self.config.max_streams))
+        self._streams = 0
+        self._idle: List[Tuple[int, sqlite3.Connection]] = []
+        self._generation = 0
+        self._in_use = 0
+        self._stamp = self._file_stamp()
+        self.snapshot = 0 < self.config.snapshot_max_bytes and self._stamp[1] <= self.config.snapshot_max_bytes
+
+    def _file_stamp(self) -> Tuple[int, int]:
+        stat = os.stat(self.db_path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def data_stamp(self) -> Tuple[int, ...]:
+        """Changes whenever committed data may have: the main file, plus its WAL in WAL mode."""
+        stamp = self._file_stamp()
+        try:
+            wal = os.stat(f"{self.db_path}-wal")
+        except FileNotFoundError:
+            return stamp
+        return stamp + (wal.st_mtime_ns, wal.st_size)
+
+    def _open_file(self) -> sqlite3.Connection:
+        if self.config.read_only:
+            target, uri = self.db_path.resolve().as_uri() + "?mode=ro", True
+        else:
+            target, uri = str(self.db_path), False
+        conn = sqlite3.connect(
+            target,
+            uri=uri,
+            check_same_thread=False,
+            cached_statements=self.config.cached_statements,
+        )
+        conn.execute(f"PRAGMA mmap_size = {int(self.config.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size = -{int(self.config.cache_size_kib)}")
+        return conn
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self.snapshot:
+            return self._open_file()
+        conn = sqlite3.connect(
+            ":memory:", check_same_thread=False, cached_statements=self.config.cached_statements
+        )
+        with closing(self._open_file()) as source:
+            source.backup(conn)
+        if self.config.read_only:
+            conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    def _refresh_snapshot(self) -> None:
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return
+        with self._lock:
+            if stamp == self._stamp:
+                return
+            self._stamp = stamp
+            self._generation += 1
+            stale, self._idle = self._idle, []
+        for _, conn in stale:
+            conn.close()
+
+    def _wait(self, slots: threading.BoundedSemaphore, what: str, setting: str) -> None:
+        if not slots.acquire(timeout=self.config.pool_timeout_s):
+            raise PoolExhausted(
+                f"No free {what} for {self.db_path.name} within {self.config.pool_timeout_s}s; "
+                f"raise ExecutorConfig.{setting} or pool_timeout_s."
+            )
+
+    @contextmanager
+    def dedicated(self) -> Iterator[sqlite3.Connection]:
+        """A fresh connection outside the pool, closed on exit; long-lived streams read through these."""
+        self._wait(self._stream_slots, "stream slot", "max_streams")
+        try:
+            # Straight to the file even in snapshot mode: copying the database per stream would cost more.
+            with closing(self._open_file()) as conn:
+                with self._lock:
+                    self._streams += 1
+                try:
+                    yield conn
+                finally:
+                    with self._lock:
+                        self._streams -= 1
+        finally:
+            self._stream_slots.release()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        self._wait(self._slots, "pooled connection", "pool_size")
+        try:
+            if self.snapshot:
+                self._refresh_snapshot()
+            with self._lock:
+                generation, conn = self._idle.pop() if self._idle else (self._generation, None)
+                self._in_use += 1
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except BaseException:
+                    with self._lock:
+                        self._in_use -= 1
+                    raise
+            try:
+                yield conn
+            finally:
+                if conn.in_transaction:
+                    conn.rollback()
+                with self._lock:
+                    self._in_use -= 1
+                    if generation == self._generation:
+                        self._idle.append((generation, conn))
+                        conn = None
+                if conn is not None:
+                    conn.close()
+        finally:
+            self._slots.release()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": max(1, self.config.pool_size),
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "streams": self._streams,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for _, conn in idle:
+            conn.close()
+
+
+# The ExecutorConfig fields a ConnectionPool is built from; executors agreeing on these share a pool.
+POOL_FIELDS = (
+    "pool_size",
+    "pool_timeout_s",
+    "max_streams",
+    "read_only",
+    "mmap_size",
+    "cache_size_kib",
+    "cached_statements",
+    "snapshot_max_bytes",
+)
+
+_POOLS: Dict[Tuple[Any, ...], ConnectionPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_pool(db_path: Path, config: Optional[ExecutorConfig] = None) -> ConnectionPool:
+    """The shared pool for this database and pool settings (one per distinct combination)."""
+    config = config or ExecutorConfig()
+    key = (str(Path(db_path).resolve()),) + tuple(getattr(config, name) for name in POOL_FIELDS)
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = ConnectionPool(Path(db_path), config)
+            _POOLS[key] = pool
+        return pool
+
+
+_SQL_TOKEN_RE = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")|\s+")
+
+ReadResult = Tuple[List[str], List[Tuple[Any, ...]], bool]
+CacheKey = Tuple[str, str, Tuple[Any, ...], int, Optional[int]]
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapse whitespace outside string literals and drop the trailing semicolon."""
+    text = sql.strip().rstrip(";").strip()
+    return _SQL_TOKEN_RE.sub(lambda match: match.group(1) or " ", text)
+
+
+def _result_bytes(columns: Sequence[str], rows: Sequence[Tuple[Any, ...]]) -> int:
+    size = sys.getsizeof(rows) + sum(sys.getsizeof(column) for column in columns)
+    for row in rows:
+        size += sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+    return size
+
+
+class ResultCache:
+    """LRU of query results under a byte budget; an entry is only served while its database is unchanged.
+
+    ``PRAGMA data_version`` is per connection, so pooled connections cannot share it; the database
+    file stamp (see ``ConnectionPool.data_stamp``) is the validator instead. The stamp is read
+    before the query runs, so a write that lands mid-query makes the entry stale on its next lookup.
+    """
+
+    def __init__(self, max_bytes: int, max_entry_bytes: int):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._entries: "OrderedDict[CacheKey, Tuple[Tuple[int, ...], ReadResult, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.skipped = 0
+        self.evictions = 0
+
+    def get(self, key: CacheKey, stamp: Tuple[int, ...]) -> Optional[ReadResult]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] == stamp:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+                self.bytes -= entry[2]
+                self.stale += 1
+            self.misses += 1
+            return None
+
+    def put(self, key: CacheKey, stamp: Tuple[int, ...], value: ReadResult) -> None:
+        size = _result_bytes(value[0], value[1])
+        if size > self.max_entry_bytes:
+            with self._lock:
+                self.skipped += 1
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[2]
+            self._entries[key] = (stamp, value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes and self._entries:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "skipped": self.skipped,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+        }
+
+
+_RESULT_CACHE: Optional[ResultCache] = None
+
+
+def get_result_cache(config: Optional[ExecutorConfig] = None) -> Optional[ResultCache]:
+    """The process-wide result cache (sized by the first config that asks), or None when disabled."""
+    global _RESULT_CACHE
+    config = config or ExecutorConfig()
+    if config.result_cache_bytes <= 0:
+        return None
+    with _POOLS_LOCK:
+        if _RESULT_CACHE is None:
+            _RESULT_CACHE = ResultCache(config.result_cache_bytes, config.result_cache_max_entry_bytes)
+        return _RESULT_CACHE
+
+
+class QueryLog:
+    """Append-only JSONL log of queries that reached SQLite, one line per execution.
+
+    Each line is written with a single ``O_APPEND`` write, so replica processes can share one file.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self.records = 0
+
+    def record(
+        self, db_path: str, sql: str, params: Sequence[Any], seconds: float, rows: int, error: Optional[str] = None
+    ) -> None:
+        entry = {
+            "ts": time.time(),
+            "db": db_path,
+            "sql": sql,
+            "params": list(params),
+            "seconds": round(seconds, 6),
+            "rows": rows,
+        }
+        if error is not None:
+            entry["error"] = error
+        os.write(self._fd, (json.dumps(entry, default=repr) + "\n").encode("utf-8"))
+        self.records += 1
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+_QUERY_LOGS: Dict[str, QueryLog] = {}
+
+
+def get_query_log(config: Optional[ExecutorConfig] = None) -> Optional[QueryLog]:
+    """The process-wide log for ``config.query_log_path``, or None when logging is off."""
+    if config is None or config.query_log_path is None:
+        return None
+    key = str(Path(config.query_log_path).resolve())
+    with _POOLS_LOCK:
+        log = _QUERY_LOGS.get(key)
+        if log is None:
+            log = _QUERY_LOGS[key] = QueryLog(Path(config.query_log_path))
+        return log
+
 
 class SQLiteExecutor:
-    def __init__(self, db_path: Path):
+    def __init__(self, db_path: Path, config: Optional[ExecutorConfig] = None):
         self.db_path = db_path
+        self.config = config or ExecutorConfig()
+        self.pool = get_pool(db_path, self.config)
+        self.results = get_result_cache(self.config)
+        self.query_log = get_query_log(self.config)
+        self._cache_path = str(Path(db_path).resolve())
+        self._validations: "OrderedDict[Tuple[str, int], Optional[str]]" = OrderedDict()
+        self._validations_lock = threading.Lock()
+
+    @staticmethod
+    def _strip(sql: str) -> str:
+        return sql.strip().rstrip(";").strip()
+
+    @contextmanager
+    def _budget(
+        self, conn: sqlite3.Connection, cancel: Optional[threading.Event], timeout: Optional[float] = None
+    ) -> Iterator[Callable[[], None]]:
+        """Interrupt the statement on ``cancel`` or after ``timeout`` seconds.
+
+        Yields a ``restart`` callable that starts the time budget over; streams call it per chunk
+        so the budget bounds each fetch rather than the stream's lifetime.
+        """
+        timeout = self.config.query_timeout_s if timeout is None else timeout
+        if not timeout and cancel is None:
+            yield lambda: None
+            return
+        deadline = [time.monotonic() + timeout if timeout else None]
+
+        def restart() -> None:
+            if timeout:
+                deadline[0] = time.monotonic() + timeout
+
+        def check() -> int:
+            if cancel is not None and cancel.is_set():
+                return 1
+            return 1 if deadline[0] is not None and time.monotonic() > deadline[0] else 0
+
+        # SQLite calls the handler every N VM steps; a non-zero return interrupts the statement.
+        conn.set_progress_handler(check, self.config.progress_interval)
+        try:
+            yield restart
+        except sqlite3.OperationalError as exc:
+            if "interrupted" not in str(exc):
+                raise
+            if cancel is not None and cancel.is_set():
+                raise QueryCancelled("Query was cancelled.") from exc
+            raise QueryTimeout(f"Query exceeded the {timeout:g}s time budget.") from exc
+        finally:
+            conn.set_progress_handler(None, 0)
+
+    def validate(self, sql: str) -> Optional[str]:
+        """Compile ``sql`` with EXPLAIN under a read-only authorizer; return an error message or None."""
+        with self.pool.connection() as conn:
+            (version,) = conn.execute("PRAGMA schema_version").fetchone()
+            key = (sql, version)
+            with self._validations_lock:
+                if key in self._validations:
+                    self._validations.move_to_end(key)
+                    return self._validations[key]
+            conn.set_authorizer(_read_only_authorizer)
+            try:
+                conn.execute(f"EXPLAIN {self._strip(sql)}").close()
+                error = None
+            except (sqlite3.Error, sqlite3.Warning) as exc:
+                error = "Only read-only SELECT statements are allowed." if "not authorized" in str(exc) else str(exc)
+            finally:
+                conn.set_authorizer(None)
+        with self._validations_lock:
+            self._validations[key] = error
+            while len(self._validations) > self.config.validation_cache_size:
+                self._validations.popitem(last=False)
+        return error
+
+    def _check_rows(self, seen: int) -> None:
+        if self.config.max_rows and seen > self.config.max_rows:
+            raise RowBudgetExceeded(f"Query returned more than {self.config.max_rows} rows.")
+
+    def _read(
+        self,
+        sql: str,
+        params: Sequence[Any],
+        offset: int,
+        limit: Optional[int],
+        cancel: Optional[threading.Event] = None,
+    ) -> Tuple[List[str], List[Tuple[Any, ...]], bool, bool]:
+        """Return (columns, rows, truncated, cache_hit); cache hits never touch SQLite."""
+        cache = self.results
+        key: Optional[CacheKey] = None
+        if cache is not None:
+            key = (self._cache_path, normalize_sql(sql), tuple(params), offset, limit)
+            try:
+                hash(key)
+            except TypeError:  # unhashable parameters: run uncached
+                cache = None
+        if cache is None or key is None:
+            return (*self._fetch(sql, params, offset, limit, cancel), False)
+        stamp = self.pool.data_stamp()
+        cached = cache.get(key, stamp)
+        if cached is not None:
+            columns, rows, truncated = cached
+            return list(columns), list(rows), truncated, True
+        columns, rows, truncated = self._fetch(sql, params, offset, limit, cancel)
+        cache.put(key, stamp, (columns, rows, truncated))
+        # Callers own the returned lists; the cached copy stays untouched.
+        return list(columns), list(rows), truncated, False
+
+    def _fetch(
+        self,
+        sql: str,
+        params: Sequence[Any],
+        offset: int,
+        limit: Optional[int],
+        cancel: Optional[threading.Event] = None,
+    ) -> ReadResult:
+        chunk = max(1, self.config.fetch_chunk_rows)
+        started = time.perf_counter()
+        rows: List[Tuple[Any, ...]] = []
+        error: Optional[str] = None
+        try:
+            with self.pool.connection() as conn, self._budget(conn, cancel):
+                cursor = conn.execute(sql, params)
+                try:
+                    columns = [description[0] for description in cursor.description or ()]
+                    skipped = 0
+                    while skipped < offset:
+                        batch = cursor.fetchmany(min(chunk, offset - skipped))
+                        if not batch:
+                            break
+                        skipped += len(batch)
+                        self._check_rows(skipped)
+                    while limit is None or len(rows) <= limit:
+                        want = chunk if limit is None else min(chunk, limit + 1 - len(rows))
+                        batch = cursor.fetchmany(want)
+                        if not batch:
+                            break
+                        rows.extend(batch)
+                        self._check_rows(skipped + len(rows))
+                finally:
+                    cursor.close()
+        except Exception as exc:
+            error = type(exc).__name__
+            raise
+        finally:
+            # Timeouts are logged too: they are the queries an index would help most.
+            if self.query_log is not None:
+                self.query_log.record(
+                    self._cache_path, sql, params, time.perf_counter() - started, len(rows), error
+                )
+        truncated = limit is not None and len(rows) > limit
+        return columns, rows[:limit] if truncated else rows, truncated
+
+    def execute(
+        self,
+        sql: str,
+        params: Sequence[Any] = (),
+        max_rows: Optional[int] = None,
+        cancel: Optional[threading.Event] = None,
+    ) -> ExecutionResult:
+        """Run ``sql`` and keep at most ``max_rows`` (default: ``preview_rows``) rows in memory."""
+        limit = self.config.preview_rows if max_rows is None else max_rows
+        columns, rows, truncated, hit = self._read(sql, params, 0, limit or None, cancel)
+        return ExecutionResult(
+            columns=columns,
+            rows=rows,
+            truncated=truncated,
+            sql=sql,
+            params=tuple(params),
+            cache_hit=hit,
+            _executor=self,
+        )
+
+    def fetch_page(
+        self, sql: str, page: int, page_size: Optional[int] = None, params: Sequence[Any] = ()
+    ) -> ExecutionResult:
+        size = page_size or self.config.preview_rows
+        offset = (max(1, page) - 1) * size
+        columns, rows, truncated, hit = self._read(sql, params, offset, size)
+        return ExecutionResult(
+            columns=columns,
+            rows=rows,
+            truncated=truncated,
+            sql=sql,
+            params=tuple(params),
+            offset=offset,
+            cache_hit=hit,
+            _executor=self,
+        )
+
+    def stream(
+        self,
+        sql: str,
+        params: Sequence[Any] = (),
+        chunk_rows: Optional[int] = None,
+        cancel: Optional[threading.Event] = None,
+        timeout: Optional[float] = None,
+    ) -> Iterator[List[Tuple[Any, ...]]]:
+        """Yield row chunks straight from the cursor.
+
+        A stream lives as long as its consumer, so it reads through a dedicated connection (at most
+        ``max_streams`` at once) rather than holding one of the pool's. ``timeout`` bounds the work
+        for each chunk, not the whole stream, and ``max_rows`` does not apply: nothing is held in memory.
+        """
+        chunk = chunk_rows or self.config.fetch_chunk_rows
+        with self.pool.dedicated() as conn, self._budget(conn, cancel, timeout) as restart:
+            cursor = conn.execute(sql, params)
+            try:
+                while True:
+                    batch = cursor.fetchmany(chunk)
+                    if not batch:
+                        return
+                    yield batch
+                    restart()
+            finally:
+                cursor.close()
 
-    def execute(self, sql: str) -> ExecutionResult:
-        with sqlite3.connect(self.db_path) as conn:
-            df = pd.read_sql_query(sql, conn)
-        return ExecutionResult(columns=df.columns.tolist(), rows=df.values.tolist())
+    def query_plan(self, sql: str, params: Sequence[Any] = ()) -> List[Tuple[int, int, str]]:
+        """Return ``EXPLAIN QUERY PLAN`` rows as (id, parent, detail)."""
+        with self.pool.connection() as conn:
+            rows = conn.execute(f"EXPLAIN QUERY PLAN {self._strip(sql)}", params).fetchall()
+        return [(int(row[0]), int(row[1]), str(row[-1])) for row in rows]
 
+    def count(self, sql: str, params: Sequence[Any] = ()) -> int:
+        with self.pool.connection() as conn, self._budget(conn, None):
+            (total,) = conn.execute(f"SELECT COUNT(*) FROM ({self._strip(sql)})", params).fetchone()
+        return int(total)
@@ -1,72 +1,301 @@
+from __future__ import annotations
+
+import json
 import re
-from typing import Optional
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Pattern, Sequence, Tuple
 
+from .config import RuleConfig
+from .postprocess import pretty_format
 from .schema import DatabaseSchema
+from .sql_templates import inline_params, placeholder_count
 
+RULE_FILE_SUFFIXES = (".json", ".yaml", ".yml")
+_WORD_RE = re.compile(r"[a-z0-9_]+")
+_CASES = {"asis": str, "lower": str.lower, "upper": str.upper, "title": str.title}
+_TYPES = {"text": str, "int": int, "float": float}
 
-class HeuristicTranslator:
-    """Very small deterministic translator for demo-grade coverage."""
 
-    def _employee_age_department(self, lowered: str, schema: DatabaseSchema) -> Optional[str]:
-        if "employee" not in lowered or "name" not in lowered:
-            return None
-        table = schema.find_table("employees")
-        if not table:
-            return None
+class RuleError(ValueError):
+    """Raised when a rule file is malformed."""
 
-        selections = ["name"]
-        conditions = []
 
-        age_match = re.search(r"(?:older|over|greater) than (\d+)", lowered)
-        if age_match:
-            age_value = age_match.group(1)
-            conditions.append(f"age > {age_value}")
+def _compile(pattern: str, where: str) -> Pattern[str]:
+    try:
+        return re.compile(pattern)
+    except re.error as exc:
+        raise RuleError(f"{where}: invalid pattern {pattern!r}: {exc}") from exc
 
-        dept_match = re.search(r"(?:in|from|within) the ([a-z ]+) department", lowered)
-        if dept_match:
-            department = dept_match.group(1).strip().title()
-            conditions.append(f"department = '{department}'")
-        elif "sales" in lowered:
-            conditions.append("department = 'Sales'")
 
-        where_clause = f" WHERE {' AND '.join(conditions)}" if conditions else ""
-        projection = ", ".join(selections)
-        return f"SELECT {projection} FROM {table.name}{where_clause}"
+def _check_params(specs: Sequence[Any], groups: int, where: str) -> None:
+    for spec in specs:
+        if not isinstance(spec, dict):
+            continue
+        if not 0 <= spec.get("group", 0) <= groups:
+            raise RuleError(f"{where}: parameter group {spec.get('group')} is not in the pattern.")
+        if spec.get("type", "text") not in _TYPES or spec.get("case", "asis") not in _CASES:
+            raise RuleError(f"{where}: unknown parameter type or case in {spec!r}.")
 
-    def _sales_client_division_q3(self, lowered: str, schema: DatabaseSchema) -> Optional[str]:
-        # Trigger for join demo: division + Q3 wording (client wording can vary).
-        if "division" not in lowered:
-            return None
-        if "2024-q3" not in lowered and "q3 2024" not in lowered and "2024 quarter 3" not in lowered and "q3 of 2024" not in lowered:
-            return None
-        # Ensure the required tables exist (department table may be named 'department' or 'departments').
-        dept_table = schema.find_table("departments") or schema.find_table("department")
-        if not (schema.find_table("sales") and schema.find_table("employees") and dept_table):
-            return None
-        return (
-            "SELECT s.client,\n"
-            "       d.division,\n"
-            "       d.name AS department,\n"
-            "       e.name AS employee,\n"
-            "       s.amount\n"
-            "FROM sales AS s\n"
-            "JOIN employees   AS e ON s.employee_id = e.id\n"
-            "JOIN departments AS d ON e.department_id = d.id\n"
-            "WHERE s.quarter = '2024-Q3'"
-        )
 
-    def translate(self, question: str, schema: DatabaseSchema) -> Optional[str]:
-        lowered = question.lower()
+def _bind(specs: Sequence[Any], match: Optional["re.Match[str]"]) -> List[Any]:
+    """Parameter values: literals as written, ``{"group", "type", "case"}`` entries from the match."""
+    values: List[Any] = []
+    for spec in specs:
+        if not isinstance(spec, dict):
+            values.append(spec)
+            continue
+        assert match is not None
+        raw = match.group(spec.get("group", 0)).strip()
+        if spec.get("type", "text") == "text":
+            values.append(_CASES[spec.get("case", "asis")](raw))
+        else:
+            values.append(_TYPES[spec["type"]](raw))
+    return values
+
+
+@dataclass
+class RuleCondition:
+    # A WHERE term added when ``pattern`` matches; only the first matching condition of a ``group`` applies.
+    pattern: Pattern[str]
+    sql: str
+    params: List[Any]
+    group: Optional[str] = None
+
+
+@dataclass
+class Rule:
+    name: str
+    schema: str
+    sql: str
+    # Any of these words must occur in the question; they are the index the rule is found through.
+    keywords: Tuple[str, ...]
+    # Substrings that must all occur in the (lowercased) question.
+    require: Tuple[str, ...] = ()
+    patterns: List[Pattern[str]] = field(default_factory=list)
+    # Every entry must name an existing table; an entry that is a list accepts any of its names.
+    tables: List[Tuple[str, ...]] = field(default_factory=list)
+    params: List[Any] = field(default_factory=list)
+    conditions: List[RuleCondition] = field(default_factory=list)
+    # Full-match pattern a question must fit before the model runs; broad rules use it to only
+    # pre-empt the model on questions they answer completely, and still act as a fallback otherwise.
+    exact: Optional[Pattern[str]] = None
+    hits: int = 0
+    fast_path_hits: int = 0
+    fallback_hits: int = 0
+    failures: int = 0
+    # Pretty-printed SQL per emitted statement, so a hit only inlines the parameters.
+    formatted: Dict[str, str] = field(default_factory=dict, repr=False)
+
+    def applies(self, lowered: str, schema: DatabaseSchema, fast_path: bool) -> bool:
+        if fast_path and self.exact is not None and self.exact.fullmatch(lowered) is None:
+            return False
+        if not all(needle in lowered for needle in self.require):
+            return False
+        if not all(any(schema.find_table(name) for name in names) for names in self.tables):
+            return False
+        return all(pattern.search(lowered) for pattern in self.patterns)
+
+    def emit(self, lowered: str) -> Tuple[str, List[Any]]:
+        params = _bind(self.params, None)
+        terms: List[str] = []
+        used_groups = set()
+        for condition in self.conditions:
+            if condition.group is not None and condition.group in used_groups:
+                continue
+            match = condition.pattern.search(lowered)
+            if match is None:
+                continue
+            terms.append(condition.sql)
+            params.extend(_bind(condition.params, match))
+            if condition.group is not None:
+                used_groups.add(condition.group)
+        sql = f"{self.sql} WHERE {' AND '.join(terms)}" if terms else self.sql
+        return sql, params
+
+    def display(self, sql: str) -> str:
+        formatted = self.formatted.get(sql)
+        if formatted is None:
+            formatted = self.formatted[sql] = pretty_format(sql)
+        return formatted
+
+
+@dataclass
+class RuleMatch:
+    rule: Rule
+    sql: str
+    params: List[Any]
+
+    def render(self) -> str:
+        """The SQL with its parameters inlined, for display only."""
+        return inline_params(self.rule.display(self.sql), self.params)
+
+
+def parse_rule(entry: Dict[str, Any], schema: str, source: str = "<rules>") -> Rule:
+    name = entry.get("name")
+    where = f"{source}: rule {name!r}"
+    if not name or not entry.get("sql"):
+        raise RuleError(f"{where}: every rule needs a name and sql.")
+    keywords = tuple(word.lower() for word in entry.get("keywords", ()))
+    if any(not _WORD_RE.fullmatch(word) for word in keywords):
+        raise RuleError(f"{where}: keywords must be single words.")
+    params = list(entry.get("params", ()))
+    if any(isinstance(spec, dict) for spec in params):
+        raise RuleError(f"{where}: rule-level parameters must be literals; capture values in a condition.")
+    conditions = []
+    for condition in entry.get("conditions", ()):
+        pattern = _compile(condition["pattern"], where)
+        condition_params = list(condition.get("params", ()))
+        _check_params(condition_params, pattern.groups, where)
+        if placeholder_count(condition["sql"]) != len(condition_params):
+            raise RuleError(f"{where}: condition {condition['sql']!r} needs one parameter per '?'.")
+        conditions.append(RuleCondition(pattern, condition["sql"], condition_params, condition.get("group")))
+    if placeholder_count(entry["sql"]) != len(params):
+        raise RuleError(f"{where}: sql needs one parameter per '?'.")
+    tables = [tuple(names) if isinstance(names, list) else (names,) for names in entry.get("tables", ())]
+    return Rule(
+        name=name,
+        schema=schema,
+        sql=entry["sql"].strip(),
+        keywords=keywords,
+        require=tuple(needle.lower() for needle in entry.get("require", ())),
+        patterns=[_compile(pattern, where) for pattern in entry.get("patterns", ())],
+        tables=tables,
+        params=params,
+        conditions=conditions,
+        exact=_compile(entry["exact"], where) if entry.get("exact") else None,
+    )
 
-        # 1) Specific join demo for sales/client/division in 2024-Q3
-        sql = self._sales_client_division_q3(lowered, schema)
-        if sql:
-            return sql
 
-        # 2) Original single-table employees heuristic
-        sql = self._employee_age_department(lowered, schema)
-        if sql:
-            return sql
+class RuleSet:
+    """One schema's rules in file (priority) order, indexed by trigger keyword."""
 
+    def __init__(self, rules: Sequence[Rule]):
+        self.rules = list(rules)
+        self._index: Dict[str, List[int]] = {}
+        # Rules without keywords are checked for every question.
+        self._unindexed: List[int] = []
+        for position, rule in enumerate(self.rules):
+            for keyword in rule.keywords:
+                self._index.setdefault(keyword, []).append(position)
+            if not rule.keywords:
+                self._unindexed.append(position)
+
+    def candidates(self, lowered: str) -> List[Rule]:
+        positions = set(self._unindexed)
+        for word in set(_WORD_RE.findall(lowered)):
+            positions.update(self._index.get(word, ()))
+        return [self.rules[position] for position in sorted(positions)]
+
+
+def load_rules(path: Path, schema: str) -> RuleSet:
+    text = path.read_text(encoding="utf-8")
+    if path.suffix == ".json":
+        document = json.loads(text)
+    else:
+        try:
+            import yaml
+        except ImportError as exc:
+            raise RuleError(f"{path}: YAML rule files need PyYAML (pip install pyyaml).") from exc
+        document = yaml.safe_load(text)
+    entries = document.get("rules", []) if isinstance(document, dict) else document
+    rules = [parse_rule(entry, schema, str(path)) for entry in entries or []]
+    names = [rule.name for rule in rules]
+    if len(set(names)) != len(names):
+        raise RuleError(f"{path}: rule names must be unique.")
+    return RuleSet(rules)
+
+
+class HeuristicTranslator:
+    """Deterministic rule engine answering common question shapes without the model.
+
+    Rules come from ``<rules_dir>/<schema>.json`` (loaded and compiled once per schema) and emit
+    parameterized SQL, so a rule's statement text is stable and SQLite reuses its prepared statement.
+    """
+
+    def __init__(self, config: Optional[RuleConfig] = None):
+        self.config = config or RuleConfig()
+        self._sets: Dict[str, RuleSet] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def fast_path(self) -> bool:
+        return self.config.enabled and self.config.fast_path
+
+    def rule_file(self, schema_name: str) -> Optional[Path]:
+        for suffix in RULE_FILE_SUFFIXES:
+            path = Path(self.config.rules_dir) / f"{schema_name}{suffix}"
+            if path.exists():
+                return path
         return None
 
+    def rules_for(self, schema_name: str) -> RuleSet:
+        rules = self._sets.get(schema_name)
+        if rules is None:
+            with self._lock:
+                rules = self._sets.get(schema_name)
+                if rules is None:
+                    path = self.rule_file(schema_name)
+                    rules = load_rules(path, schema_name) if path is not None else RuleSet([])
+                    self._sets[schema_name] = rules
+        return rules
+
+    def reload(self) -> None:
+        with self._lock:
+            self._sets.clear()
+
+    def match(self, question: str, schema: DatabaseSchema, fast_path: bool = False) -> Optional[RuleMatch]:
+        if not self.config.enabled:
+            return None
+        lowered = re.sub(r"\s+", " ", question.lower()).strip().rstrip("?.! ")
+        for rule in self.rules_for(schema.name).candidates(lowered):
+            if rule.applies(lowered, schema, fast_path):
+                sql, params = rule.emit(lowered)
+                return RuleMatch(rule, sql, params)
+        return None
+
+    def record(self, match: RuleMatch, fast_path: bool, succeeded: bool) -> None:
+        rule = match.rule
+        with self._lock:
+            if not succeeded:
+                rule.failures += 1
+                return
+            rule.hits += 1
+            if fast_path:
+                rule.fast_path_hits += 1
+            else:
+                rule.fallback_hits += 1
+
+    def translate(self, question: str, schema: DatabaseSchema) -> Optional[str]:
+        """The matching rule's SQL with parameters inlined (display/debugging; execution uses ``match``)."""
+        match = self.match(question, schema)
+        return match.render() if match is not None else None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            rules = [rule for rules in self._sets.values() for rule in rules.rules]
+        return {
+            "rules": len(rules),
+            "hits": sum(rule.hits for rule in rules),
+            "fast_path_hits": sum(rule.fast_path_hits for rule in rules),
+            "fallback_hits": sum(rule.fallback_hits for rule in rules),
+            "failures": sum(rule.failures for rule in rules),
+        }
+
+    def report(self) -> List[Dict[str, Any]]:
+        """Every loaded rule with its counters, in priority order per schema."""
+        with self._lock:
+            rules = [rule for rules in self._sets.values() for rule in rules.rules]
+        return [
+            {
+                "name": rule.name,
+                "schema": rule.schema,
+                "keywords": list(rule.keywords),
+                "hits": rule.hits,
+                "fast_path_hits": rule.fast_path_hits,
+                "fallback_hits": rule.fallback_hits,
+                "failures": rule.failures,
+            }
+            for rule in rules
+        ]
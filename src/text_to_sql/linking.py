@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import re
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from .schema import DatabaseSchema
+
+STOPWORDS = {
+    "a", "all", "and", "are", "by", "each", "for", "from", "have", "how", "in", "is", "list", "many",
+    "me", "of", "on", "or", "show", "than", "that", "the", "their", "them", "to", "what", "which",
+    "who", "whose", "with",
+}
+
+KIND_WEIGHTS = {"table": 1.5, "column": 1.0, "value": 0.8}
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def _stem(word: str) -> str:
+    # Light plural folding so "names"/"name" and "employees"/"employee" hit exactly.
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def words(text: str) -> List[str]:
+    return [_stem(word) for word in _WORD_RE.findall(text.lower().replace("_", " "))]
+
+
+def trigrams(phrase: str) -> Set[str]:
+    padded = f" {phrase} "
+    return {padded[idx : idx + 3] for idx in range(len(padded) - 2)}
+
+
+@dataclass
+class IndexEntry:
+    kind: str
+    table: str
+    column: Optional[str]
+    phrase: str
+
+
+class AhoCorasick:
+    """Word-level Aho-Corasick automaton: finds every pattern in one pass over the question."""
+
+    def __init__(self, patterns: Iterable[Tuple[Tuple[str, ...], int]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, int]]] = [[]]
+        for tokens, value in patterns:
+            node = 0
+            for token in tokens:
+                nxt = self._goto[node].get(token)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][token] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].append((value, len(tokens)))
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for token, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                candidate = self._goto[fallback].get(token, 0)
+                self._fail[child] = candidate if candidate != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def search(self, tokens: Sequence[str]) -> List[Tuple[int, int, int]]:
+        """Return (value, start, end) for every match; ``end`` is exclusive."""
+        matches: List[Tuple[int, int, int]] = []
+        node = 0
+        for position, token in enumerate(tokens):
+            while node and token not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(token, 0)
+            for value, length in self._out[node]:
+                matches.append((value, position + 1 - length, position + 1))
+        return matches
+
+
+class SchemaIndex:
+    """Exact (Aho-Corasick) and fuzzy (character trigram) lookup over one schema's names and values."""
+
+    def __init__(self, schema: DatabaseSchema, include_values: bool = True):
+        self.entries: List[IndexEntry] = []
+        for table in schema.tables:
+            self._add("table", table.name, None, table.name)
+            for column in table.columns:
+                self._add("column", table.name, column.name, column.name)
+            if include_values and table.sample_values:
+                for column_name, values in table.sample_values.items():
+                    for value in values:
+                        self._add("value", table.name, column_name, str(value))
+        self.automaton = AhoCorasick(
+            (tuple(entry.phrase.split()), idx) for idx, entry in enumerate(self.entries)
+        )
+        self._grams: Dict[str, List[int]] = defaultdict(list)
+        self._gram_counts: List[int] = []
+        for idx, entry in enumerate(self.entries):
+            grams = trigrams(entry.phrase)
+            self._gram_counts.append(len(grams))
+            for gram in grams:
+                self._grams[gram].append(idx)
+        self.max_words = max((len(entry.phrase.split()) for entry in self.entries), default=1)
+
+    def _add(self, kind: str, table: str, column: Optional[str], text: str) -> None:
+        phrase = " ".join(words(text))
+        if phrase:
+            self.entries.append(IndexEntry(kind=kind, table=table, column=column, phrase=phrase))
+
+    def fuzzy(self, phrase: str, threshold: float) -> List[Tuple[int, float]]:
+        grams = trigrams(phrase)
+        shared: Dict[int, int] = defaultdict(int)
+        for gram in grams:
+            for idx in self._grams.get(gram, ()):
+                shared[idx] += 1
+        hits = []
+        for idx, overlap in shared.items():
+            score = 2.0 * overlap / (len(grams) + self._gram_counts[idx])
+            if score >= threshold:
+                hits.append((idx, score))
+        return hits
+
+
+@dataclass
+class LinkResult:
+    columns: List[Tuple[str, str]] = field(default_factory=list)
+    table_scores: Dict[str, float] = field(default_factory=dict)
+
+    def ranked_tables(self) -> List[str]:
+        return sorted(self.table_scores, key=lambda name: -self.table_scores[name])
+
+
+class SchemaLinker:
+    def __init__(self, fuzzy_threshold: float = 0.7, include_values: bool = True):
+        self.fuzzy_threshold = fuzzy_threshold
+        self.include_values = include_values
+        self._indexes: Dict[str, SchemaIndex] = {}
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(words(text))
+
+    def index(self, schema: DatabaseSchema) -> SchemaIndex:
+        index = self._indexes.get(schema.name)
+        if index is None:
+            index = SchemaIndex(schema, include_values=self.include_values)
+            self._indexes[schema.name] = index
+        return index
+
+    def link(self, question: str, schema: DatabaseSchema) -> LinkResult:
+        index = self.index(schema)
+        tokens = words(question)
+        scores: Dict[int, float] = {}
+        covered: Set[int] = set()
+        for idx, start, end in index.automaton.search(tokens):
+            scores[idx] = 1.0
+            covered.update(range(start, end))
+
+        # Fuzzy pass only over question spans the exact pass did not explain.
+        for size in range(1, min(index.max_words, 3) + 1):
+            for start in range(len(tokens) - size + 1):
+                span = tokens[start : start + size]
+                if covered.intersection(range(start, start + size)):
+                    continue
+                if size == 1 and (span[0] in STOPWORDS or len(span[0]) < 3):
+                    continue
+                for idx, score in index.fuzzy(" ".join(span), self.fuzzy_threshold):
+                    if score > scores.get(idx, 0.0):
+                        scores[idx] = score
+
+        result = LinkResult()
+        column_scores: Dict[Tuple[str, str], float] = {}
+        for idx, score in scores.items():
+            entry = index.entries[idx]
+            weighted = score * KIND_WEIGHTS[entry.kind]
+            result.table_scores[entry.table] = result.table_scores.get(entry.table, 0.0) + weighted
+            if entry.column is not None:
+                key = (entry.table, entry.column)
+                column_scores[key] = max(column_scores.get(key, 0.0), weighted)
+        result.columns = sorted(column_scores, key=lambda key: -column_scores[key])
+        return result
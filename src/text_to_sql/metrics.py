@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+import threading
+from bisect import bisect_left
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+from .config import MetricsConfig
+from .executor import get_result_cache
+from .timing import STAGES
+
+if TYPE_CHECKING:
+    from .pipeline import NL2SQLPipeline, PipelineOutput
+    from .replicas import ReplicaPool
+    from .scheduler import MicroBatchScheduler
+
+CANDIDATE_BUCKETS = [0, 1, 2, 3, 4, 6, 8, 12]
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float]):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = sorted(buckets)
+        self._series: Dict[Labels, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = ([0] * (len(self.buckets) + 1), [0.0])
+            self._series[labels] = series
+        counts, total = series
+        counts[bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(labels, ('le', _format_value(bound)))} {cumulative}")
+            cumulative += counts[-1]
+            lines.append(f"{self.name}_bucket{_format_labels(labels, ('le', '+Inf'))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total[0])}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels = (), amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+def _family(kind: str, name: str, help_text: str, samples: Sequence[Tuple[Labels, float]]) -> List[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    lines.extend(f"{name}{_format_labels(labels)} {_format_value(value)}" for labels, value in samples)
+    return lines
+
+
+def _gauge(name: str, help_text: str, samples: Sequence[Tuple[Labels, float]]) -> List[str]:
+    return _family("gauge", name, help_text, samples)
+
+
+def _counter(name: str, help_text: str, samples: Sequence[Tuple[Labels, float]]) -> List[str]:
+    """A monotonic total kept by another component (scheduler, rules, caches), read at scrape time."""
+    return _family("counter", name, help_text, samples)
+
+
+class PipelineMetrics:
+    """Aggregates ``PipelineOutput`` timings and outcomes and renders them in Prometheus text format."""
+
+    def __init__(self, config: Optional[MetricsConfig] = None):
+        self.config = config or MetricsConfig()
+        self._lock = threading.Lock()
+        buckets = self.config.latency_buckets
+        self.requests = Counter("nl2sql_requests_total", "Answered requests by answer path.")
+        self.model_ranks = Counter("nl2sql_model_answer_rank_total", "Model answers by candidate rank.")
+        self.failures = Counter("nl2sql_failures_total", "Unanswered requests by failure reason.")
+        self.cache_hits = Counter("nl2sql_generation_cache_hits_total", "Requests served from the generation cache.")
+        self.result_cache_hits = Counter(
+            "nl2sql_result_cache_hits_total", "Requests whose rows came from the execution result cache."
+        )
+        self.decode_tiers = Counter("nl2sql_decode_tier_total", "Requests by adaptive decoding tier.")
+        self.latency = Histogram("nl2sql_request_duration_seconds", "End-to-end pipeline latency.", buckets)
+        self.stages = Histogram("nl2sql_stage_duration_seconds", "Pipeline latency per stage.", buckets)
+        self.candidates = Histogram(
+            "nl2sql_candidates_tried", "Candidates rejected or executed per request.", CANDIDATE_BUCKETS
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.config.enabled
+
+    def observe(self, output: "PipelineOutput") -> None:
+        if not self.config.enabled:
+            return
+        with self._lock:
+            self.requests.inc((("path", output.answer_path),))
+            if output.answer_rank is not None:
+                self.model_ranks.inc((("rank", str(output.answer_rank)),))
+            if output.failure_reason and output.result is None:
+                self.failures.inc((("reason", output.failure_reason),))
+            if output.cache_hit:
+                self.cache_hits.inc()
+            if output.result_cache_hit:
+                self.result_cache_hits.inc()
+            if output.decode_tier:
+                self.decode_tiers.inc((("tier", output.decode_tier),))
+            self.candidates.observe(output.candidates_tried)
+            if "total" in output.timings:
+                self.latency.observe(output.timings["total"])
+            for stage in STAGES:
+                if stage in output.timings:
+                    self.stages.observe(output.timings[stage], (("stage", stage),))
+
+    def render(self, gauges: Sequence[List[str]] = ()) -> str:
+        with self._lock:
+            families = [
+                self.requests.render(),
+                self.model_ranks.render(),
+                self.failures.render(),
+                self.cache_hits.render(),
+                self.result_cache_hits.render(),
+                self.decode_tiers.render(),
+                self.latency.render(),
+                self.stages.render(),
+                self.candidates.render(),
+            ]
+        lines: List[str] = []
+        for family in [*families, *gauges]:
+            lines.extend(family)
+        return "\n".join(lines) + "\n"
+
+
+def collect_gauges(
+    pipeline: Optional["NL2SQLPipeline"],
+    scheduler: Optional["MicroBatchScheduler"] = None,
+    replicas: Optional["ReplicaPool"] = None,
+) -> List[List[str]]:
+    """Scrape-time metric families for the scheduler queue, replicas, caches, rules and connection pools.
+
+    Levels (queue depth, entries, hit rates) are gauges; totals that only grow are ``_total`` counters.
+    """
+    gauges: List[List[str]] = []
+    if scheduler is not None:
+        stats: Dict[str, Any] = scheduler.stats()
+        gauges.append(_gauge("nl2sql_scheduler_queue_depth", "Requests waiting for a batch.", [((), stats["queue_depth"])]))
+        gauges.append(_gauge("nl2sql_scheduler_in_flight", "Requests in the running batch.", [((), stats["in_flight"])]))
+        gauges.append(_counter("nl2sql_scheduler_batches_total", "Batches run since start.", [((), stats["batches"])]))
+        gauges.append(
+            _gauge("nl2sql_scheduler_avg_batch_size", "Mean requests per batch.", [((), stats["avg_batch_size"])])
+        )
+    if replicas is not None:
+        workers = replicas.stats()["replicas"]
+        gauges.append(
+            _gauge(
+                "nl2sql_replica_load",
+                "Requests dispatched to a replica and not yet answered.",
+                [((("replica", str(worker["index"])),), worker["load"]) for worker in workers],
+            )
+        )
+        gauges.append(
+            _gauge(
+                "nl2sql_replica_up",
+                "Whether the replica process is serving.",
+                [((("replica", str(worker["index"])),), int(worker["alive"])) for worker in workers],
+            )
+        )
+        gauges.append(
+            _gauge(
+                "nl2sql_replica_restarts",
+                "Times the replica process was respawned after dying.",
+                [((("replica", str(worker["index"])),), worker["restarts"]) for worker in workers],
+            )
+        )
+    if pipeline is None:
+        return gauges
+    if pipeline.cache is not None:
+        cache = pipeline.cache.stats()
+        gauges.append(
+            _gauge("nl2sql_generation_cache_entries", "Entries in the in-memory generation cache.", [((), cache["memory_entries"])])
+        )
+        gauges.append(_gauge("nl2sql_generation_cache_hit_rate", "Generation cache hit rate.", [((), cache["hit_rate"])]))
+    if pipeline.templates is not None:
+        templates = pipeline.templates.stats()
+        gauges.append(_gauge("nl2sql_templates", "Learned SQL templates.", [((), templates["templates"])]))
+        gauges.append(_gauge("nl2sql_template_hit_rate", "Questions answered from a template.", [((), templates["hit_rate"])]))
+        gauges.append(_counter("nl2sql_templates_learned_total", "Templates learned.", [((), templates["learned"])]))
+        gauges.append(_counter("nl2sql_templates_evicted_total", "Templates evicted.", [((), templates["evicted"])]))
+    rules = pipeline.heuristic.report()
+    if rules:
+        for key, help_text in (
+            ("hits", "Questions answered by a hand-written rule."),
+            ("failures", "Rule matches whose SQL failed to execute."),
+        ):
+            samples = [((("rule", rule["name"]), ("schema", rule["schema"])), rule[key]) for rule in rules]
+            gauges.append(_counter(f"nl2sql_rule_{key}_total", help_text, samples))
+    results = get_result_cache(pipeline.config.executor)
+    if results is not None:
+        result_stats = results.stats()
+        for key, help_text in (
+            ("entries", "Entries in the execution result cache."),
+            ("bytes", "Estimated bytes held by the execution result cache."),
+            ("hit_rate", "Execution result cache hit rate."),
+        ):
+            gauges.append(_gauge(f"nl2sql_result_cache_{key}", help_text, [((), result_stats[key])]))
+        for key, help_text in (
+            ("stale", "Result cache entries dropped because their database changed."),
+            ("evictions", "Result cache entries evicted for space."),
+        ):
+            gauges.append(_counter(f"nl2sql_result_cache_{key}_total", help_text, [((), result_stats[key])]))
+    pools = list(pipeline.executor_stats().items())
+    if pools:
+        for key, help_text in (
+            ("size", "Connection pool capacity."),
+            ("in_use", "Connections checked out."),
+            ("idle", "Idle pooled connections."),
+            ("streams", "Result streams open on dedicated connections."),
+        ):
+            samples = [((("schema", name),), stats[key]) for name, stats in pools]
+            gauges.append(_gauge(f"nl2sql_pool_{key}", help_text, samples))
+    return gauges
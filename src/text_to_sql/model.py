@@ -1,59 +1,218 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import List
+import hashlib
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
 
 import torch
-from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+from transformers import AutoTokenizer, LogitsProcessorList, StoppingCriteriaList
+from transformers.modeling_outputs import BaseModelOutput
 
+from .backends import InferenceBackend, create_backend
 from .config import PipelineConfig
+from .constraints import ConstraintCompiler, SchemaConstrainedLogits, StatementComplete
 from .preprocess import Preprocessor, PreprocessorOutput
 from .schema import DatabaseSchema
+from .timing import timed
 
 
 @dataclass
 class SQLCandidate:
     sql: str
     score: float
-    metadata: PreprocessorOutput
+    metadata: Optional[PreprocessorOutput] = None
+
+
+@dataclass
+class EncodedPrompt:
+    """A preprocessed prompt plus its (unpadded) encoder states, reusable across decoding passes."""
+
+    pre_out: PreprocessorOutput
+    schema: Optional[DatabaseSchema] = None
+    encoder_hidden: Optional[torch.Tensor] = None
 
 
 class TextToSQLModel:
-    def __init__(self, config: PipelineConfig):
+    def __init__(
+        self,
+        config: PipelineConfig,
+        load_weights: bool = True,
+        tokenizer: Optional[Any] = None,
+        backend: Optional[InferenceBackend] = None,
+    ):
         self.config = config
-        self.tokenizer = AutoTokenizer.from_pretrained(config.model.model_name)
-        self.model = AutoModelForSeq2SeqLM.from_pretrained(config.model.model_name)
-        self.device = torch.device(config.device or ("cuda" if torch.cuda.is_available() else "cpu"))
-        self.model.to(self.device)
+        self.tokenizer = tokenizer or AutoTokenizer.from_pretrained(config.model.model_name)
+        default_device = "cuda" if torch.cuda.is_available() and config.model.backend == "torch" else "cpu"
+        self.device = torch.device(config.device or default_device)
+        self.backend: InferenceBackend = backend or create_backend(config, self.device)
+        if load_weights:
+            self.load_weights()
         self.preprocessor = Preprocessor(
             tokenizer=self.tokenizer,
             schema_config=config.schema,
             include_relations=config.include_relations_in_prompt,
             max_length=config.model.max_input_tokens,
         )
+        self.constraints = ConstraintCompiler(self.tokenizer)
+        self._stopping = StatementComplete(self.tokenizer, config.stop_tokens)
+
+    @property
+    def model(self):
+        return self.backend.model
+
+    def load_weights(self) -> None:
+        self.backend.load()
+
+    def _checkpoint_dirs(self, commit: Optional[str]) -> List[Path]:
+        """Directories holding the checkpoint files: local paths, or the hub cache snapshot in use."""
+        dirs = [Path(self.config.model.model_name)]
+        if self.config.model.onnx_path:
+            onnx_path = Path(self.config.model.onnx_path)
+            dirs.append(onnx_path if onnx_path.is_dir() else onnx_path.parent)
+        if not dirs[0].is_dir():
+            try:
+                from huggingface_hub import try_to_load_from_cache
+            except ImportError:
+                return dirs
+            cached = try_to_load_from_cache(self.config.model.model_name, "config.json", revision=commit)
+            if isinstance(cached, str):
+                dirs.append(Path(cached).parent)
+        return dirs
+
+    def fingerprint(self) -> str:
+        commit = getattr(getattr(self.model, "config", None), "_commit_hash", None)
+        parts = [self.config.model.model_name, str(commit or ""), self.backend.describe()]
+        for checkpoint_dir in self._checkpoint_dirs(commit):
+            if not checkpoint_dir.is_dir():
+                continue
+            # A re-saved or re-downloaded weight or config file changes the fingerprint.
+            for path in sorted(checkpoint_dir.iterdir()):
+                if path.suffix in {".bin", ".safetensors", ".json", ".model", ".onnx"}:
+                    stat = path.stat()
+                    parts.append(f"{path.name}:{stat.st_size}:{stat.st_mtime_ns}")
+        return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
 
-    def _prepare_inputs(self, pre_out: PreprocessorOutput) -> dict:
-        encoded = {k: v.to(self.device) for k, v in pre_out.encoded_inputs.items()}
+    def decoding_signature(self) -> Dict[str, Any]:
+        return {
+            "model": asdict(self.config.model),
+            "schema": {key: str(value) for key, value in asdict(self.config.schema).items()},
+            "top_k": self.config.top_k,
+            "include_relations": self.config.include_relations_in_prompt,
+            "stop_tokens": list(self.config.stop_tokens),
+            "constrained": [self.config.constrained_decoding, self.config.constrain_columns],
+        }
+
+    def _prepare_inputs(self, pre_outs: Sequence[PreprocessorOutput]) -> dict:
+        lengths = [pre_out.encoded_inputs["input_ids"].shape[-1] for pre_out in pre_outs]
+        input_ids = torch.full((len(pre_outs), max(lengths)), self.tokenizer.pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(pre_outs), max(lengths)), dtype=torch.long)
+        for row, (pre_out, length) in enumerate(zip(pre_outs, lengths)):
+            input_ids[row, :length] = pre_out.encoded_inputs["input_ids"][0]
+            attention_mask[row, :length] = pre_out.encoded_inputs["attention_mask"][0]
+        return {"input_ids": input_ids.to(self.device), "attention_mask": attention_mask.to(self.device)}
+
+    def _buckets(self, pre_outs: Sequence[PreprocessorOutput]) -> List[List[int]]:
+        # Sorting by prompt length keeps a few long Spider schemas from padding out short prompts.
+        order = list(range(len(pre_outs)))
+        if self.config.model.length_bucketing:
+            order.sort(key=lambda idx: pre_outs[idx].encoded_inputs["input_ids"].shape[-1])
+        size = max(1, self.config.model.batch_size)
+        return [order[start : start + size] for start in range(0, len(order), size)]
+
+    def _preprocess(self, questions: Sequence[str], schemas: Sequence[DatabaseSchema]) -> List[PreprocessorOutput]:
+        if len(questions) != len(schemas):
+            raise ValueError("generate_batch expects one schema per question.")
+        return [
+            self.preprocessor.build_model_input(question, schema)
+            for question, schema in zip(questions, schemas)
+        ]
+
+    def _sequence_scores(self, generation: Any) -> List[float]:
+        if getattr(generation, "sequences_scores", None) is not None:
+            return generation.sequences_scores.tolist()
+        # Greedy search has no beam scores: use the mean token log-probability instead.
+        steps = len(generation.scores)
+        log_probs = torch.stack(generation.scores, dim=1).log_softmax(dim=-1)
+        tokens = generation.sequences[:, -steps:]
+        chosen = log_probs.gather(-1, tokens.unsqueeze(-1)).squeeze(-1)
+        valid = (tokens != self.tokenizer.pad_token_id).to(chosen.dtype)
+        totals = (chosen.masked_fill(valid == 0, 0.0)).sum(dim=-1) / valid.sum(dim=-1).clamp(min=1)
+        return totals.tolist()
+
+    def encode_batch(self, questions: Sequence[str], schemas: Sequence[DatabaseSchema]) -> List[EncodedPrompt]:
+        pre_outs = self._preprocess(questions, schemas)
+        encoded = [EncodedPrompt(pre_out=pre_out, schema=schema) for pre_out, schema in zip(pre_outs, schemas)]
+        for bucket in self._buckets(pre_outs):
+            inputs = self._prepare_inputs([pre_outs[idx] for idx in bucket])
+            with timed("generation"):
+                hidden = self.backend.encode(**inputs)
+            if hidden is None:
+                break
+            for offset, idx in enumerate(bucket):
+                length = pre_outs[idx].encoded_inputs["input_ids"].shape[-1]
+                encoded[idx].encoder_hidden = hidden[offset, :length]
         return encoded
 
-    def generate(self, question: str, schema: DatabaseSchema) -> List[SQLCandidate]:
-        pre_out = self.preprocessor.build_model_input(question, schema)
-        inputs = self._prepare_inputs(pre_out)
-        generation = self.model.generate(
-            **inputs,
-            max_new_tokens=self.config.model.max_output_tokens,
-            num_beams=self.config.model.num_beams,
-            early_stopping=True,
-            num_return_sequences=self.config.top_k,
-            return_dict_in_generate=True,
-            output_scores=True,
-            temperature=self.config.model.temperature,
+    def decode_batch(
+        self,
+        encoded: Sequence[EncodedPrompt],
+        num_beams: Optional[int] = None,
+        num_return_sequences: Optional[int] = None,
+    ) -> List[List[SQLCandidate]]:
+        num_beams = num_beams or self.config.model.num_beams
+        per_question = min(num_return_sequences or self.config.top_k, num_beams)
+        pre_outs = [item.pre_out for item in encoded]
+        results: List[List[SQLCandidate]] = [[] for _ in pre_outs]
+        for bucket in self._buckets(pre_outs):
+            group = [encoded[idx] for idx in bucket]
+            inputs = self._prepare_inputs([item.pre_out for item in group])
+            if all(item.encoder_hidden is not None for item in group):
+                hidden = group[0].encoder_hidden
+                padded = hidden.new_zeros((len(group), inputs["input_ids"].shape[-1], hidden.shape[-1]))
+                for row, item in enumerate(group):
+                    padded[row, : item.encoder_hidden.shape[0]] = item.encoder_hidden
+                inputs["encoder_outputs"] = BaseModelOutput(last_hidden_state=padded)
+            if self.config.constrained_decoding and all(item.schema is not None for item in group):
+                inputs["logits_processor"] = LogitsProcessorList(
+                    [
+                        SchemaConstrainedLogits(
+                            self.tokenizer,
+                            [self.constraints.for_schema(item.schema) for item in group],
+                            num_beams=num_beams,
+                            constrain_columns=self.config.constrain_columns,
+                        )
+                    ]
+                )
+            with timed("generation"):
+                generation = self.backend.generate(
+                    **inputs,
+                    max_new_tokens=self.config.model.max_output_tokens,
+                    num_beams=num_beams,
+                    early_stopping=num_beams > 1,
+                    num_return_sequences=per_question,
+                    return_dict_in_generate=True,
+                    output_scores=True,
+                    temperature=self.config.model.temperature,
+                    stopping_criteria=StoppingCriteriaList([self._stopping]),
+                )
+                decoded = self.tokenizer.batch_decode(generation.sequences, skip_special_tokens=True)
+                scores = self._sequence_scores(generation)
+            for offset, idx in enumerate(bucket):
+                rows = range(offset * per_question, (offset + 1) * per_question)
+                results[idx] = [
+                    SQLCandidate(sql=decoded[row].strip(), score=scores[row], metadata=pre_outs[idx])
+                    for row in rows
+                ]
+        return results
+
+    def generate_batch(
+        self, questions: Sequence[str], schemas: Sequence[DatabaseSchema]
+    ) -> List[List[SQLCandidate]]:
+        pre_outs = self._preprocess(questions, schemas)
+        return self.decode_batch(
+            [EncodedPrompt(pre_out=pre_out, schema=schema) for pre_out, schema in zip(pre_outs, schemas)]
         )
-        sequences = generation.sequences
-        scores = generation.sequences_scores
-        candidates: List[SQLCandidate] = []
-        for seq, score in zip(sequences, scores):
-            decoded = self.tokenizer.decode(seq, skip_special_tokens=True)
-            candidates.append(SQLCandidate(sql=decoded.strip(), score=score.item(), metadata=pre_out))
-        return candidates
 
+    def generate(self, question: str, schema: DatabaseSchema) -> List[SQLCandidate]:
+        return self.generate_batch([question], [schema])[0]
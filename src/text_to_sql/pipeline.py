@@ -1,77 +1,509 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import List, Optional
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
 
 from rich import box
 from rich.console import Console
 from rich.table import Table
 
+from .cache import GenerationCache
 from .config import PipelineConfig
-from .executor import ExecutionResult, SQLiteExecutor
-from .fallbacks import HeuristicTranslator
-from .model import SQLCandidate, TextToSQLModel
+from .executor import ExecutionResult, QueryTimeout, RowBudgetExceeded, SQLiteExecutor
+from .fallbacks import HeuristicTranslator, RuleMatch
+from .model import EncodedPrompt, SQLCandidate, TextToSQLModel
 from .postprocess import pretty_format, sanitize_sql, validate_sql
-from .schema import DatabaseSchema, load_schema
+from .profiling import RequestProfiler
+from .schema import DatabaseSchema, SchemaCatalog, schema_digest
+from .sql_templates import TemplateStore
+from .timing import StageTimer, probing, timed
 
 console = Console()
 
+FAILURE_VALIDATION = "validation"
+FAILURE_EXECUTION = "execution"
+FAILURE_TIMEOUT = "timeout"
+FAILURE_ROW_BUDGET = "row_budget"
+
+ANSWER_MODEL = "model"
+ANSWER_HEURISTIC = "heuristic"
+ANSWER_RULE = "rule"
+ANSWER_TEMPLATE = "template"
+ANSWER_FAILURE = "failure"
+
 
 @dataclass
 class PipelineOutput:
     sql: str
     result: Optional[ExecutionResult]
     validation_error: Optional[str] = None
+    cache_hit: bool = False
+    # The rows came from the executor's result cache (SQLite was not touched).
+    result_cache_hit: bool = False
+    failure_reason: Optional[str] = None
+    decode_tier: Optional[str] = None
+    # "model" (see answer_rank), "rule" (before the model) or "heuristic" (after it failed; see rule_name),
+    # "template" (see template_id) or "failure".
+    answer_path: str = ANSWER_FAILURE
+    answer_rank: Optional[int] = None
+    candidates_tried: int = 0
+    # Seconds per stage plus "total"; batch-wide stages (generation) report the whole batch.
+    timings: Dict[str, float] = field(default_factory=dict)
+    request_id: Optional[str] = None
+    profile_path: Optional[str] = None
+    template_id: Optional[str] = None
+    rule_name: Optional[str] = None
 
 
 class NL2SQLPipeline:
-    def __init__(self, config: PipelineConfig):
+    def __init__(
+        self,
+        config: PipelineConfig,
+        catalog: Optional[SchemaCatalog] = None,
+        load_weights: bool = True,
+        model: Optional[TextToSQLModel] = None,
+    ):
         self.config = config
-        self.schemas = load_schema(config.schema.schema_path)
-        self.model = TextToSQLModel(config)
-        self.heuristic = HeuristicTranslator()
+        self.catalog = catalog or SchemaCatalog(config.schema.schema_path, binary_cache=config.schema.binary_cache)
+        self.model = model or TextToSQLModel(config, load_weights=load_weights)
+        # Prompt fragments and linker indexes are compiled as each schema is first materialized.
+        self.catalog.on_load(self.model.preprocessor.compile_schema)
+        if config.constrained_decoding:
+            self.catalog.on_load(self.model.constraints.for_schema)
+        # Generation-cache keys use each schema's digest as materialized, not the catalog file's at startup.
+        self._schema_digests: Dict[str, str] = {}
+        self.catalog.on_load(self._record_schema_digest)
+        self.heuristic = HeuristicTranslator(config.rules)
+        self.profiler = RequestProfiler(config.profiling)
+        self.cache = GenerationCache(config.cache) if config.cache.enabled else None
+        self.templates = TemplateStore(config.templates) if config.templates.enabled else None
+        self._model_digest: Optional[str] = None
+        self._decoding = self.model.decoding_signature()
+        if config.adaptive_decoding:
+            # Adaptive runs cache the tier that answered, so they must not share entries with full-beam runs.
+            self._decoding["tiers"] = self.decoding_tiers()
+        self._executors: Dict[str, SQLiteExecutor] = {}
+        self.tier_counts: Dict[str, int] = {}
+        self._tier_lock = threading.Lock()
+        self._execution_pool = ThreadPoolExecutor(
+            max_workers=max(1, config.execution_workers), thread_name_prefix="nl2sql-exec"
+        )
 
     def _find_schema(self, name: Optional[str] = None) -> DatabaseSchema:
-        if name:
-            for schema in self.schemas:
-                if schema.name.lower() == name.lower():
-                    return schema
-            raise ValueError(f"Schema {name} not found.")
-        return self.schemas[0]
-
-    def run(self, question: str, schema_name: Optional[str] = None) -> PipelineOutput:
-        schema = self._find_schema(schema_name)
-        candidates = self.model.generate(question, schema)
-        for candidate in candidates:
-            cleaned = sanitize_sql(candidate.sql)
-            validation_error = validate_sql(cleaned, schema)
-            if validation_error:
-                continue
-            executor = SQLiteExecutor(schema.path)
+        return self.catalog.get(name)
+
+    def load_weights(self) -> None:
+        self.model.load_weights()
+        # The fingerprint includes the loaded checkpoint's revision; recompute it on next use.
+        self._model_digest = None
+
+    def preload_schemas(self) -> None:
+        """Materialize every schema so prompt fragments and linker indexes are compiled up front."""
+        for _ in self.catalog:
+            pass
+
+    def warm_up(
+        self,
+        runs: Optional[int] = None,
+        question: Optional[str] = None,
+        schema_names: Optional[Sequence[Optional[str]]] = None,
+    ) -> None:
+        """Run throwaway generations so kernels and allocators are warm before traffic.
+
+        Covers ``schema_names`` when given, else the first ``warmup_max_schemas`` catalog schemas.
+        """
+        runs = self.config.serving.warmup_runs if runs is None else runs
+        question = question or self.config.serving.warmup_question
+        if schema_names is None:
+            limit = self.config.serving.warmup_max_schemas
+            schema_names = self.catalog.names()[:limit] if limit > 0 else self.catalog.names()
+        for name in schema_names:
+            schema = self.catalog.get(name)
+            for _ in range(runs):
+                self.model.generate(question, schema)
+
+    def executor_for(self, schema: DatabaseSchema) -> SQLiteExecutor:
+        executor = self._executors.get(schema.name)
+        if executor is None:
+            executor = SQLiteExecutor(schema.path, self.config.executor)
+            self._executors[schema.name] = executor
+        return executor
+
+    def executor_stats(self) -> Dict[str, Dict[str, int]]:
+        """Connection-pool stats per schema with an open executor."""
+        return {name: executor.pool.stats() for name, executor in list(self._executors.items())}
+
+    def _record_schema_digest(self, schema: DatabaseSchema) -> str:
+        digest = self._schema_digests[schema.name] = schema_digest(schema)
+        return digest
+
+    def _cache_key(self, question: str, schema: DatabaseSchema) -> str:
+        if self._model_digest is None:
+            self._model_digest = self.model.fingerprint()
+        digest = self._schema_digests.get(schema.name) or self._record_schema_digest(schema)
+        return GenerationCache.make_key(question, schema.name, digest, self._model_digest, self._decoding)
+
+    def _lookup(
+        self, questions: Sequence[str], schemas: Sequence[DatabaseSchema]
+    ) -> Tuple[List[Optional[str]], List[Optional[List[SQLCandidate]]]]:
+        if self.cache is None:
+            return [None] * len(questions), [None] * len(questions)
+        keys: List[Optional[str]] = [self._cache_key(question, schema) for question, schema in zip(questions, schemas)]
+        results: List[Optional[List[SQLCandidate]]] = []
+        for key in keys:
+            cached = self.cache.get(key)
+            results.append([SQLCandidate(sql=sql, score=score) for sql, score in cached] if cached is not None else None)
+        return keys, results
+
+    def _store(self, key: Optional[str], candidates: List[SQLCandidate]) -> None:
+        if self.cache is not None and key is not None:
+            self.cache.put(key, [(candidate.sql, candidate.score) for candidate in candidates])
+
+    def _generate(
+        self, questions: Sequence[str], schemas: Sequence[DatabaseSchema]
+    ) -> Tuple[List[List[SQLCandidate]], List[bool]]:
+        keys, results = self._lookup(questions, schemas)
+        hits = [result is not None for result in results]
+        misses = [idx for idx, result in enumerate(results) if result is None]
+        if misses:
+            generated = self.model.generate_batch([questions[idx] for idx in misses], [schemas[idx] for idx in misses])
+            for idx, candidates in zip(misses, generated):
+                results[idx] = candidates
+                self._store(keys[idx], candidates)
+        return [result or [] for result in results], hits
+
+    def decoding_tiers(self) -> List[int]:
+        full = self.config.model.num_beams
+        return sorted({beams for beams in self.config.decoding_tiers if 0 < beams < full}) + [full]
+
+    @staticmethod
+    def tier_name(beams: int) -> str:
+        return "greedy" if beams == 1 else f"beam{beams}"
+
+    def _count_tier(self, tier: str) -> None:
+        with self._tier_lock:
+            self.tier_counts[tier] = self.tier_counts.get(tier, 0) + 1
+
+    def tier_stats(self) -> Dict[str, int]:
+        with self._tier_lock:
+            return dict(self.tier_counts)
+
+    def _timer(self) -> Optional[StageTimer]:
+        return StageTimer() if self.config.metrics.enabled else None
+
+    @staticmethod
+    def _timing(timer: Optional[StageTimer]):
+        return timer.activate() if timer is not None else nullcontext()
+
+    @staticmethod
+    def _finish(
+        output: PipelineOutput, shared: Optional[StageTimer], own: Optional[StageTimer], started: float
+    ) -> None:
+        if own is None:
+            return
+        timings = shared.as_dict() if shared is not None else {}
+        for stage, seconds in own.totals.items():
+            timings[stage] = timings.get(stage, 0.0) + seconds
+        timings["total"] = time.perf_counter() - started
+        output.timings = timings
+
+    def _run_adaptive(
+        self, questions: Sequence[str], schemas: Sequence[DatabaseSchema]
+    ) -> List[PipelineOutput]:
+        started = time.perf_counter()
+        shared = self._timer()
+        timers = [self._timer() for _ in questions]
+        with self._timing(shared):
+            keys, cached = self._lookup(questions, schemas)
+        outputs: List[Optional[PipelineOutput]] = [None] * len(questions)
+        for idx, candidates in enumerate(cached):
+            if candidates is not None:
+                with self._timing(timers[idx]):
+                    output = self._resolve(questions[idx], schemas[idx], candidates)
+                output.cache_hit = True
+                output.decode_tier = "cache"
+                self._count_tier("cache")
+                self._finish(output, shared, timers[idx], started)
+                outputs[idx] = output
+
+        pending = [idx for idx, output in enumerate(outputs) if output is None]
+        encoded: Dict[int, EncodedPrompt] = {}
+        tried = [0] * len(questions)
+        if pending:
+            # Encode once; every tier decodes from the same encoder states.
+            with self._timing(shared):
+                prompts = self.model.encode_batch(
+                    [questions[idx] for idx in pending], [schemas[idx] for idx in pending]
+                )
+            encoded = dict(zip(pending, prompts))
+        tiers = self.decoding_tiers()
+        for position, beams in enumerate(tiers):
+            if not pending:
+                break
+            last = position == len(tiers) - 1
+            tier = self.tier_name(beams)
+            with self._timing(shared):
+                decoded = self.model.decode_batch([encoded[idx] for idx in pending], num_beams=beams)
+            still_pending = []
+            for idx, candidates in zip(pending, decoded):
+                with self._timing(timers[idx]):
+                    output = self._resolve(questions[idx], schemas[idx], candidates, fallback=last)
+                tried[idx] += output.candidates_tried
+                if output.result is None and not last:
+                    still_pending.append(idx)
+                    continue
+                output.decode_tier = tier
+                output.candidates_tried = tried[idx]
+                self._count_tier(tier if output.answer_path == ANSWER_MODEL else output.answer_path)
+                self._store(keys[idx], candidates)
+                self._finish(output, shared, timers[idx], started)
+                outputs[idx] = output
+            pending = still_pending
+        return [output for output in outputs if output is not None]
+
+    def _execute_candidates(
+        self, schema: DatabaseSchema, sqls: List[str]
+    ) -> Tuple[Optional[int], Optional[ExecutionResult], List[Exception]]:
+        executor = self.executor_for(schema)
+        errors: List[Exception] = []
+        if len(sqls) <= 1 or self.config.execution_workers <= 1:
+            for rank, sql in enumerate(sqls):
+                try:
+                    return rank, executor.execute(sql), errors
+                except Exception as exc:
+                    errors.append(exc)
+                    self._report_failure(exc)
+            return None, None, errors
+
+        cancels = [threading.Event() for _ in sqls]
+        futures = [
+            self._execution_pool.submit(executor.execute, sql, cancel=cancel) for sql, cancel in zip(sqls, cancels)
+        ]
+        try:
+            # Wait in score order so the best-ranked success wins, then interrupt the rest.
+            for rank, future in enumerate(futures):
+                try:
+                    return rank, future.result(), errors
+                except Exception as exc:
+                    errors.append(exc)
+                    self._report_failure(exc)
+            return None, None, errors
+        finally:
+            for future, cancel in zip(futures, cancels):
+                cancel.set()
+                future.cancel()
+
+    def _validate(self, sql: str, schema: DatabaseSchema) -> Optional[str]:
+        if self.config.validation_mode == "engine":
             try:
-                result = executor.execute(cleaned)
-                return PipelineOutput(sql=pretty_format(cleaned), result=result)
+                return self.executor_for(schema).validate(sql)
             except Exception as exc:
-                if self.config.verbose:
-                    console.print(f"[yellow]Execution failure for candidate SQL:[/yellow] {exc}")
-                continue
+                return str(exc)
+        return validate_sql(sql, schema)
+
+    def _report_failure(self, exc: Exception) -> None:
+        if self.config.verbose:
+            console.print(f"[yellow]Execution failure for candidate SQL:[/yellow] {exc}")
+
+    @staticmethod
+    def _failure_reason(valid_count: int, errors: List[Exception]) -> str:
+        if any(isinstance(exc, QueryTimeout) for exc in errors):
+            return FAILURE_TIMEOUT
+        if any(isinstance(exc, RowBudgetExceeded) for exc in errors):
+            return FAILURE_ROW_BUDGET
+        return FAILURE_EXECUTION if valid_count else FAILURE_VALIDATION
+
+    def _resolve(
+        self, question: str, schema: DatabaseSchema, candidates: List[SQLCandidate], fallback: bool = True
+    ) -> PipelineOutput:
+        # Sanitized SQL -> index of the first candidate (beam rank) that produced it.
+        unique: Dict[str, int] = {}
+        for index, candidate in enumerate(candidates):
+            unique.setdefault(sanitize_sql(candidate.sql), index)
+        with timed("validation"):
+            valid = [sql for sql in unique if not self._validate(sql, schema)]
+        rejected = len(unique) - len(valid)
+        with timed("execution"):
+            position, result, errors = self._execute_candidates(schema, valid)
+        if result is not None and position is not None:
+            rank = unique[valid[position]]
+            # Every distinct candidate ranked at or above the winner was either rejected or executed.
+            tried = sum(1 for index in unique.values() if index <= rank)
+            return PipelineOutput(
+                sql=pretty_format(result.sql or ""),
+                result=result,
+                answer_path=ANSWER_MODEL,
+                answer_rank=rank,
+                candidates_tried=tried,
+                result_cache_hit=result.cache_hit,
+            )
+        reason = self._failure_reason(len(valid), errors)
+
         # if none succeeded, surface first error
-        fallback_sql = self.heuristic.translate(question, schema)
-        if fallback_sql:
-            executor = SQLiteExecutor(schema.path)
-            try:
-                result = executor.execute(fallback_sql)
-                return PipelineOutput(sql=pretty_format(fallback_sql), result=result)
-            except Exception:
-                pass
+        with timed("fallback"):
+            match = self.heuristic.match(question, schema) if fallback else None
+            if match is not None:
+                result = self._execute_rule(match, schema, fast_path=False)
+                if result is not None:
+                    return PipelineOutput(
+                        sql=match.render(),
+                        result=result,
+                        answer_path=ANSWER_HEURISTIC,
+                        candidates_tried=rejected + len(errors),
+                        result_cache_hit=result.cache_hit,
+                        rule_name=match.rule.name,
+                    )
 
         first = candidates[0] if candidates else None
+        timed_out = sum(isinstance(exc, QueryTimeout) for exc in errors)
+        message = "All candidate SQLs failed validation or execution."
+        if timed_out:
+            message += f" {timed_out} candidate(s) exceeded the query time budget."
         return PipelineOutput(
             sql=first.sql if first else "",
             result=None,
-            validation_error="All candidate SQLs failed validation or execution.",
+            validation_error=message,
+            failure_reason=reason,
+            candidates_tried=rejected + len(errors),
         )
 
+    def run(
+        self,
+        question: str,
+        schema_name: Optional[str] = None,
+        profile: Optional[bool] = None,
+        request_id: Optional[str] = None,
+    ) -> PipelineOutput:
+        """Answer one question; ``profile`` forces (True) or skips (False) profiling, None samples."""
+        if not self.profiler.should_profile(profile):
+            output = self.run_batch([question], [schema_name])[0]
+            output.request_id = request_id
+            return output
+        with self.profiler.session(request_id) as session:
+            if session is None:
+                output = self.run_batch([question], [schema_name])[0]
+                output.request_id = request_id
+                return output
+            with probing(session):
+                output = self.run_batch([question], [schema_name])[0]
+            schema = self._find_schema(schema_name)
+            session.finish(output, question, schema.name, self.executor_for(schema))
+        output.request_id = request_id
+        output.profile_path = str(session.directory)
+        return output
+
+    def run_batch(
+        self, questions: Sequence[str], schema_names: Optional[Sequence[Optional[str]]] = None
+    ) -> List[PipelineOutput]:
+        if schema_names is None:
+            schema_names = [None] * len(questions)
+        if len(schema_names) != len(questions):
+            raise ValueError("run_batch expects one schema name per question.")
+        schemas = [self._find_schema(name) for name in schema_names]
+        if self.templates is None and not self.heuristic.fast_path:
+            return self._run_models(questions, schemas)
+        started = time.perf_counter()
+        outputs = [self._answer_without_model(question, schema, started) for question, schema in zip(questions, schemas)]
+        pending = [idx for idx, output in enumerate(outputs) if output is None]
+        if pending:
+            answered = self._run_models([questions[idx] for idx in pending], [schemas[idx] for idx in pending])
+            for idx, output in zip(pending, answered):
+                learnable = output.answer_path == ANSWER_MODEL and output.result is not None and output.result.sql
+                if self.templates is not None and learnable:
+                    self.templates.learn(questions[idx], schemas[idx].name, output.result.sql)
+                outputs[idx] = output
+        return [output for output in outputs if output is not None]
+
+    def _answer_without_model(self, question: str, schema: DatabaseSchema, started: float) -> Optional[PipelineOutput]:
+        """Zero-inference paths in order: hand-written rules, then learned templates."""
+        output = self._answer_from_rule(question, schema, started) if self.heuristic.fast_path else None
+        if output is None and self.templates is not None:
+            output = self._answer_from_template(question, schema, started)
+        return output
+
+    def _execute_rule(self, match: RuleMatch, schema: DatabaseSchema, fast_path: bool) -> Optional[ExecutionResult]:
+        try:
+            result = self.executor_for(schema).execute(match.sql, match.params)
+        except Exception as exc:
+            self._report_failure(exc)
+            self.heuristic.record(match, fast_path, succeeded=False)
+            return None
+        self.heuristic.record(match, fast_path, succeeded=True)
+        return result
+
+    def _answer_from_rule(self, question: str, schema: DatabaseSchema, started: float) -> Optional[PipelineOutput]:
+        timer = self._timer()
+        with self._timing(timer):
+            with timed("rules"):
+                match = self.heuristic.match(question, schema, fast_path=True)
+            if match is None:
+                return None
+            with timed("execution"):
+                result = self._execute_rule(match, schema, fast_path=True)
+            if result is None:
+                return None
+        output = PipelineOutput(
+            sql=match.render(),
+            result=result,
+            answer_path=ANSWER_RULE,
+            candidates_tried=1,
+            result_cache_hit=result.cache_hit,
+            rule_name=match.rule.name,
+        )
+        self._finish(output, None, timer, started)
+        return output
+
+    def _answer_from_template(self, question: str, schema: DatabaseSchema, started: float) -> Optional[PipelineOutput]:
+        """Answer from a learned template with parameterized execution, or None to fall through to the model."""
+        assert self.templates is not None
+        timer = self._timer()
+        with self._timing(timer):
+            with timed("template"):
+                match = self.templates.match(question, schema.name)
+            if match is None:
+                return None
+            template, params = match
+            try:
+                with timed("execution"):
+                    result = self.executor_for(schema).execute(template.sql, params)
+            except Exception as exc:
+                self._report_failure(exc)
+                self.templates.record_failure(template)
+                return None
+        if template.display_sql is None:
+            template.display_sql = pretty_format(template.sql)
+        output = PipelineOutput(
+            sql=template.render(params),
+            result=result,
+            answer_path=ANSWER_TEMPLATE,
+            candidates_tried=1,
+            result_cache_hit=result.cache_hit,
+            template_id=template.template_id,
+        )
+        self._finish(output, None, timer, started)
+        return output
+
+    def _run_models(self, questions: Sequence[str], schemas: Sequence[DatabaseSchema]) -> List[PipelineOutput]:
+        if self.config.adaptive_decoding:
+            return self._run_adaptive(questions, schemas)
+        started = time.perf_counter()
+        shared = self._timer()
+        with self._timing(shared):
+            batched, hits = self._generate(questions, schemas)
+        outputs = []
+        for question, schema, candidates, hit in zip(questions, schemas, batched, hits):
+            timer = self._timer()
+            with self._timing(timer):
+                output = self._resolve(question, schema, candidates)
+            output.cache_hit = hit
+            self._finish(output, shared, timer, started)
+            outputs.append(output)
+        return outputs
+
     def render(self, output: PipelineOutput) -> None:
         console.rule("[bold green]NL -> SQL Result")
         console.print("[bold cyan]SQL[/bold cyan]")
@@ -85,4 +517,8 @@ class NL2SQLPipeline:
             for row in output.result.rows:
                 table.add_row(*[str(value) for value in row])
             console.print(table)
+            if output.result.truncated:
+                console.print(
+                    f"[dim]Showing first {len(output.result.rows)} of {output.result.total_count()} rows.[/dim]"
+                )
 
@@ -1,13 +1,15 @@
 from dataclasses import dataclass
-from typing import Dict, List, Tuple, TYPE_CHECKING, Set
+from typing import Dict, List, Sequence, Tuple, TYPE_CHECKING
 
 if TYPE_CHECKING:
     import torch
 
-from transformers import PreTrainedTokenizerBase
+from transformers import BatchEncoding, PreTrainedTokenizerBase
 
 from .config import SchemaConfig
+from .linking import SchemaLinker
 from .schema import DatabaseSchema, Table
+from .timing import timed
 
 
 @dataclass
@@ -19,23 +21,15 @@ class PreprocessorOutput:
     aggregations: List[str]
 
 
-class SchemaLinker:
-    def __init__(self, fuzzy_threshold: float = 0.7):
-        self.fuzzy_threshold = fuzzy_threshold
-
-    @staticmethod
-    def normalize(text: str) -> str:
-        return text.lower().replace("_", " ")
+@dataclass
+class CompiledSchemaPrompt:
+    """Serialized schema fragments and their token ids, built once per schema."""
 
-    def link(self, question: str, tables: List[Table]) -> List[Tuple[str, str]]:
-        matches: List[Tuple[str, str]] = []
-        normalized_question = self.normalize(question)
-        for table in tables:
-            for column in table.columns:
-                alias = self.normalize(column.name)
-                if alias in normalized_question:
-                    matches.append((table.name, column.name))
-        return matches
+    table_fragments: Dict[str, str]
+    table_ids: Dict[str, List[int]]
+    separator_ids: List[int]
+    relation_section: str
+    relation_ids: List[int]
 
 
 class SchemaSerializer:
@@ -56,7 +50,7 @@ class SchemaSerializer:
                 snippet += f" [samples: {', '.join(samples)}]"
         return f"{table.name}({snippet})"
 
-    def serialize(self, schema: DatabaseSchema, linked_tables: Set[str]) -> str:
+    def order_tables(self, schema: DatabaseSchema, linked_tables: Sequence[str]) -> List[Table]:
         prioritized = []
         seen = set()
         for tbl_name in linked_tables:
@@ -68,13 +62,18 @@ class SchemaSerializer:
             if table.name not in seen:
                 prioritized.append(table)
                 seen.add(table.name)
-        tables = prioritized[: self.config.max_tables]
-        table_section = " | ".join(self._serialize_table(table) for table in tables)
-        relation_section = ""
+        return prioritized[: self.config.max_tables]
+
+    def relation_section(self, schema: DatabaseSchema) -> str:
         if self.include_relations and schema.foreign_keys:
             relations = schema.relation_strings()[: self.config.max_tables]
-            relation_section = " || relations: " + "; ".join(relations)
-        return table_section + relation_section
+            return " || relations: " + "; ".join(relations)
+        return ""
+
+    def serialize(self, schema: DatabaseSchema, linked_tables: Sequence[str]) -> str:
+        tables = self.order_tables(schema, linked_tables)
+        table_section = " | ".join(self._serialize_table(table) for table in tables)
+        return table_section + self.relation_section(schema)
 
 
 class Preprocessor:
@@ -101,6 +100,8 @@ class Preprocessor:
         self.max_length = max_length
         self.linker = SchemaLinker()
         self.serializer = SchemaSerializer(schema_config, include_relations=include_relations)
+        self._compiled: Dict[str, CompiledSchemaPrompt] = {}
+        self._agg_ids: Dict[Tuple[str, ...], List[int]] = {}
 
     def _aggregation_hints(self, question: str) -> List[str]:
         lowered = question.lower()
@@ -110,24 +111,70 @@ class Preprocessor:
                 hints.append(sql_op)
         return hints
 
-    def build_model_input(self, question: str, schema: DatabaseSchema) -> PreprocessorOutput:
-        linked = self.linker.link(question, schema.tables)
-        linked_table_names = {table for table, _ in linked}
-        schema_prompt = self.serializer.serialize(schema, linked_table_names)
-        agg_hints = self._aggregation_hints(question)
-        agg_fragment = f" || agg_hints: {', '.join(agg_hints)}" if agg_hints else ""
-        prompt = f"translate to SQL: {question} || schema: {schema_prompt}{agg_fragment}"
-        encoded = self.tokenizer(
-            prompt,
-            truncation=True,
-            max_length=self.max_length,
-            return_tensors="pt",
+    def _token_ids(self, text: str) -> List[int]:
+        return self.tokenizer(text, add_special_tokens=False)["input_ids"]
+
+    def compile_schema(self, schema: DatabaseSchema) -> CompiledSchemaPrompt:
+        # Fragments are tokenized on whitespace boundaries, so joining their ids
+        # matches tokenizing the joined prompt string.
+        fragments = {table.name: self.serializer._serialize_table(table) for table in schema.tables}
+        names = list(fragments)
+        encoded = self.tokenizer([fragments[name] for name in names], add_special_tokens=False)["input_ids"] if names else []
+        relation_section = self.serializer.relation_section(schema)
+        compiled = CompiledSchemaPrompt(
+            table_fragments=fragments,
+            table_ids=dict(zip(names, encoded)),
+            separator_ids=self._token_ids("|"),
+            relation_section=relation_section,
+            relation_ids=self._token_ids(relation_section.strip()) if relation_section else [],
         )
+        self._compiled[schema.name] = compiled
+        self.linker.index(schema)
+        return compiled
+
+    def _compiled_for(self, schema: DatabaseSchema) -> CompiledSchemaPrompt:
+        compiled = self._compiled.get(schema.name)
+        if compiled is None:
+            compiled = self.compile_schema(schema)
+        return compiled
+
+    def _agg_fragment_ids(self, agg_hints: List[str]) -> List[int]:
+        key = tuple(agg_hints)
+        ids = self._agg_ids.get(key)
+        if ids is None:
+            ids = self._token_ids(f"|| agg_hints: {', '.join(agg_hints)}") if agg_hints else []
+            self._agg_ids[key] = ids
+        return ids
+
+    def build_model_input(self, question: str, schema: DatabaseSchema) -> PreprocessorOutput:
+        compiled = self._compiled_for(schema)
+        with timed("linking"):
+            link = self.linker.link(question, schema)
+        with timed("serialization"):
+            tables = self.serializer.order_tables(schema, link.ranked_tables())
+            schema_prompt = " | ".join(compiled.table_fragments[table.name] for table in tables) + compiled.relation_section
+            agg_hints = self._aggregation_hints(question)
+            agg_fragment = f" || agg_hints: {', '.join(agg_hints)}" if agg_hints else ""
+            prompt = f"translate to SQL: {question} || schema: {schema_prompt}{agg_fragment}"
+
+        with timed("tokenization"):
+            input_ids = self._token_ids(f"translate to SQL: {question} || schema:")
+            for position, table in enumerate(tables):
+                if position:
+                    input_ids.extend(compiled.separator_ids)
+                input_ids.extend(compiled.table_ids[table.name])
+            input_ids.extend(compiled.relation_ids)
+            input_ids.extend(self._agg_fragment_ids(agg_hints))
+            input_ids = input_ids[: self.max_length - 1]
+            input_ids.append(self.tokenizer.eos_token_id)
+            encoded = BatchEncoding(
+                {"input_ids": [input_ids], "attention_mask": [[1] * len(input_ids)]},
+                tensor_type="pt",
+            )
         return PreprocessorOutput(
             prompt=prompt,
-            linked_columns=linked,
+            linked_columns=link.columns,
             encoded_inputs=encoded,
             schema_prompt=schema_prompt,
             aggregations=agg_hints,
         )
-
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import contextlib
+import cProfile
+import io
+import json
+import pstats
+import random
+import threading
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional
+
+from .config import ProfilingConfig
+
+if TYPE_CHECKING:
+    from .executor import SQLiteExecutor
+    from .pipeline import PipelineOutput
+
+PREPROCESSING_STAGES = ("linking", "serialization", "tokenization")
+ALLOCATION_STAGES = PREPROCESSING_STAGES + ("execution",)
+# Keep the profiler's own bookkeeping out of the allocation diffs.
+_SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, contextlib.__file__),
+]
+
+
+class ProfileSession:
+    """Collects the traces for one request and writes them under ``<output_dir>/<profile_id>/``.
+
+    The profile id is always generated here; nothing a client sends ends up in a path.
+
+    - generation: cProfile stats (``generation.prof`` + ``generation.txt``) or a torch.profiler chrome trace
+    - preprocessing/execution: tracemalloc snapshot diffs (``allocations.txt``)
+    - the executed SQL: ``EXPLAIN QUERY PLAN`` (``query_plan.txt``)
+    """
+
+    def __init__(self, config: ProfilingConfig, request_id: Optional[str] = None):
+        self.config = config
+        self.request_id = request_id
+        self.profile_id = uuid.uuid4().hex
+        self.directory = Path(config.output_dir) / self.profile_id
+        self._cprofile: Optional[cProfile.Profile] = None
+        self._torch_traces = 0
+        self._allocations: Dict[str, List[str]] = {}
+        self._started_tracemalloc = False
+
+    def __enter__(self) -> "ProfileSession":
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.config.tracemalloc_frames)
+            self._started_tracemalloc = True
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        if name == "generation":
+            with self._profile_generation():
+                yield
+        elif name in ALLOCATION_STAGES:
+            with self._trace_allocations(name):
+                yield
+        else:
+            yield
+
+    @contextmanager
+    def _profile_generation(self) -> Iterator[None]:
+        if self.config.generation_profiler == "torch":
+            from torch.profiler import ProfilerActivity, profile
+
+            import torch
+
+            activities = [ProfilerActivity.CPU]
+            if torch.cuda.is_available():
+                activities.append(ProfilerActivity.CUDA)
+            with profile(activities=activities, record_shapes=True) as prof:
+                yield
+            prof.export_chrome_trace(str(self.directory / f"generation.{self._torch_traces}.trace.json"))
+            self._torch_traces += 1
+            return
+        if self._cprofile is None:
+            self._cprofile = cProfile.Profile()
+        # One Profile accumulates every generation pass (encode, each decoding tier).
+        self._cprofile.enable()
+        try:
+            yield
+        finally:
+            self._cprofile.disable()
+
+    @contextmanager
+    def _trace_allocations(self, name: str) -> Iterator[None]:
+        before = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+        try:
+            yield
+        finally:
+            after = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+            top = after.compare_to(before, "lineno")[: self.config.top_allocations]
+            self._allocations.setdefault(name, []).extend(str(stat) for stat in top)
+
+    def _write_generation(self) -> None:
+        if self._cprofile is None:
+            return
+        self._cprofile.dump_stats(str(self.directory / "generation.prof"))
+        summary = io.StringIO()
+        pstats.Stats(self._cprofile, stream=summary).sort_stats("cumulative").print_stats(40)
+        (self.directory / "generation.txt").write_text(summary.getvalue())
+
+    def _write_allocations(self) -> None:
+        if not self._allocations:
+            return
+        lines: List[str] = []
+        for stage in ALLOCATION_STAGES:
+            if stage not in self._allocations:
+                continue
+            group = "preprocessing" if stage in PREPROCESSING_STAGES else "execution"
+            lines.append(f"## {group}: {stage}")
+            lines.extend(self._allocations[stage])
+            lines.append("")
+        (self.directory / "allocations.txt").write_text("\n".join(lines))
+
+    def _write_query_plan(self, executor: Optional["SQLiteExecutor"], sql: Optional[str], params: Any) -> None:
+        if executor is None or not sql:
+            return
+        try:
+            plan = executor.query_plan(sql, params or ())
+        except Exception as exc:
+            text = f"EXPLAIN QUERY PLAN failed: {exc}\n"
+        else:
+            depth: Dict[int, int] = {0: -1}
+            lines = []
+            for node_id, parent, detail in plan:
+                depth[node_id] = depth.get(parent, -1) + 1
+                lines.append("  " * depth[node_id] + detail)
+            text = sql.strip() + "\n\n" + "\n".join(lines) + "\n"
+        (self.directory / "query_plan.txt").write_text(text)
+
+    def finish(
+        self,
+        output: "PipelineOutput",
+        question: str,
+        schema_name: Optional[str],
+        executor: Optional["SQLiteExecutor"],
+    ) -> None:
+        self._write_generation()
+        self._write_allocations()
+        result = output.result
+        self._write_query_plan(executor, result.sql if result else None, result.params if result else ())
+        summary = {
+            "profile_id": self.profile_id,
+            "request_id": self.request_id,
+            "question": question,
+            "schema": schema_name,
+            "sql": output.sql,
+            "answer_path": output.answer_path,
+            "answer_rank": output.answer_rank,
+            "candidates_tried": output.candidates_tried,
+            "failure_reason": output.failure_reason,
+            "timings": output.timings,
+        }
+        (self.directory / "summary.json").write_text(json.dumps(summary, indent=2))
+
+
+class RequestProfiler:
+    """Decides which requests to profile and hands out one session at a time."""
+
+    def __init__(self, config: Optional[ProfilingConfig] = None):
+        self.config = config or ProfilingConfig()
+        # tracemalloc and cProfile are process-wide: overlapping sessions would mix their traces.
+        self._busy = threading.Lock()
+
+    def should_profile(self, requested: Optional[bool] = None) -> bool:
+        if requested is not None:
+            return requested
+        if self.config.enabled:
+            return True
+        return self.config.sample_rate > 0 and random.random() < self.config.sample_rate
+
+    @contextmanager
+    def session(self, request_id: Optional[str] = None) -> Iterator[Optional[ProfileSession]]:
+        """Yield a session, or None when another request is already being profiled.
+
+        ``request_id`` is only recorded in ``summary.json``; the output directory name is generated.
+        """
+        if not self._busy.acquire(blocking=False):
+            yield None
+            return
+        try:
+            with ProfileSession(self.config, request_id) as session:
+                yield session
+        finally:
+            self._busy.release()
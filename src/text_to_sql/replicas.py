@@ -0,0 +1,473 @@
+from __future__ import annotations
+
+import copy
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from multiprocessing.connection import Connection
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .config import PipelineConfig
+from .executor import SQLiteExecutor
+from .profiling import RequestProfiler
+from .schema import SchemaCatalog
+from .workload import WORKLOAD
+
+if TYPE_CHECKING:
+    from .pipeline import PipelineOutput
+
+def usable_cores() -> List[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def default_threads(count: int) -> int:
+    return max(1, len(usable_cores()) // max(1, count))
+
+
+def plan_cores(count: int, threads: Optional[int] = None, cores: Optional[Sequence[int]] = None) -> List[List[int]]:
+    """Split the usable cores into ``count`` disjoint subsets (wrapping round when oversubscribed)."""
+    cores = list(cores or usable_cores())
+    per_replica = threads or max(1, len(cores) // max(1, count))
+    return [
+        sorted({cores[(index * per_replica + offset) % len(cores)] for offset in range(per_replica)})
+        for index in range(count)
+    ]
+
+
+def _replica_main(config: PipelineConfig, cores: List[int], threads: int, pin: bool, conn: Connection) -> None:
+    # Before torch is imported, so OpenMP/MKL size their pools to the replica, not the host.
+    for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[variable] = str(threads)
+    if pin and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    import torch
+
+    from .pipeline import NL2SQLPipeline
+
+    torch.set_num_threads(threads)
+    try:
+        pipeline = NL2SQLPipeline(config)
+        if config.serving.preload_schemas:
+            pipeline.preload_schemas()
+        pipeline.warm_up()
+    except Exception as exc:
+        conn.send(("error", f"{type(exc).__name__}: {exc}"))
+        return
+    conn.send(("ready", os.getpid()))
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        kind, args = message
+        try:
+            if kind == "run_batch":
+                conn.send(("ok", pipeline.run_batch(*args)))
+            elif kind == "run":
+                conn.send(("ok", pipeline.run(*args)))
+            elif kind == "tier_stats":
+                conn.send(("ok", pipeline.tier_stats()))
+            elif kind == "template_report":
+                store = pipeline.templates
+                conn.send(("ok", None if store is None else (store.stats(), store.report())))
+            elif kind == "evict_template":
+                conn.send(("ok", pipeline.templates is not None and pipeline.templates.evict(*args)))
+            elif kind == "rule_report":
+                conn.send(("ok", (pipeline.heuristic.stats(), pipeline.heuristic.report())))
+            else:
+                conn.send(("error", f"unknown replica command {kind!r}"))
+        except Exception as exc:
+            conn.send(("error", f"{type(exc).__name__}: {exc}"))
+
+
+class ReplicaError(RuntimeError):
+    """Raised when a replica process fails a request or dies."""
+
+
+@dataclass
+class _Replica:
+    index: int
+    cores: List[int]
+    threads: int
+    process: Optional[multiprocessing.process.BaseProcess] = None
+    conn: Optional[Connection] = None
+    pid: Optional[int] = None
+    alive: bool = False
+    # Requests dispatched to this replica and not yet answered.
+    load: int = 0
+    requests: int = 0
+    restarts: int = 0
+    respawning: bool = False
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def call(self, kind: str, args: Tuple[Any, ...]) -> Any:
+        assert self.conn is not None
+        with self.lock:
+            if not self.alive:
+                raise ReplicaError(f"Replica {self.index} is not running.")
+            try:
+                self.conn.send((kind, args))
+                status, payload = self.conn.recv()
+            except (EOFError, OSError) as exc:
+                self.alive = False
+                raise ReplicaError(f"Replica {self.index} exited.") from exc
+        if status != "ok":
+            raise ReplicaError(f"Replica {self.index}: {payload}")
+        return payload
+
+
+class ReplicaPool:
+    """N pipeline replicas in separate processes, each pinned to its own cores, fed least-loaded first.
+
+    It answers ``run``/``run_batch`` like an ``NL2SQLPipeline``, so ``MicroBatchScheduler`` can drive
+    it with one batch in flight per replica. Results come back detached from the replica's
+    connections and are re-bound to executors in this process, so paging still works. A replica
+    whose process dies is respawned in the background (``ReplicaConfig.respawn``); the request it
+    was serving fails and the others go to the remaining replicas meanwhile.
+    """
+
+    def __init__(
+        self,
+        config: PipelineConfig,
+        catalog: Optional[SchemaCatalog] = None,
+        count: Optional[int] = None,
+        threads: Optional[int] = None,
+    ):
+        self.config = config
+        self.catalog = catalog or SchemaCatalog(config.schema.schema_path, binary_cache=config.schema.binary_cache)
+        self.profiler = RequestProfiler(config.profiling)
+        count = count or config.replicas.count
+        threads = threads or config.replicas.threads_per_replica or default_threads(count)
+        self._replicas = [_Replica(index, cores, threads) for index, cores in enumerate(plan_cores(count, threads))]
+        self._lock = threading.Lock()
+        self._executors: Dict[str, SQLiteExecutor] = {}
+        self._ready = threading.Event()
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.startup_s: Optional[float] = None
+
+    @property
+    def size(self) -> int:
+        return len(self._replicas)
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def _spawn(self, replica: _Replica) -> None:
+        context = multiprocessing.get_context("spawn")
+        parent, child = context.Pipe()
+        config = copy.deepcopy(self.config)
+        config.verbose = False
+        process = context.Process(
+            target=_replica_main,
+            args=(config, replica.cores, replica.threads, self.config.replicas.pin_cores, child),
+            name=f"nl2sql-replica-{replica.index}",
+            daemon=True,
+        )
+        process.start()
+        child.close()
+        replica.process, replica.conn = process, parent
+
+    def _await_ready(self, replica: _Replica) -> None:
+        assert replica.conn is not None
+        if not replica.conn.poll(self.config.replicas.start_timeout_s):
+            raise ReplicaError(f"Replica {replica.index} did not start within {self.config.replicas.start_timeout_s}s.")
+        status, payload = replica.conn.recv()
+        if status != "ready":
+            raise ReplicaError(f"Replica {replica.index} failed to start: {payload}")
+        replica.pid, replica.alive = payload, True
+
+    def launch(self) -> "ReplicaPool":
+        """Start every replica (loading in parallel) and block until all have warmed up."""
+        self.started_at = time.perf_counter()
+        try:
+            for replica in self._replicas:
+                self._spawn(replica)
+            for replica in self._replicas:
+                self._await_ready(replica)
+        except Exception as exc:
+            self.error = f"{type(exc).__name__}: {exc}"
+            self.close()
+            raise
+        self.startup_s = time.perf_counter() - self.started_at
+        self._ready.set()
+        return self
+
+    def start(self, on_ready: Optional[Callable[["ReplicaPool"], None]] = None) -> threading.Thread:
+        """Start the replicas on a background thread, like ``StagedStartup.start``."""
+
+        def boot() -> None:
+            self.launch()
+            if on_ready is not None:
+                on_ready(self)
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=boot, name="nl2sql-replicas", daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def _stop(self, replica: _Replica) -> None:
+        if replica.conn is not None:
+            try:
+                replica.conn.send(None)
+            except (OSError, ValueError):
+                pass
+            replica.conn.close()
+        if replica.process is not None:
+            replica.process.join(timeout=5)
+            if replica.process.is_alive():
+                replica.process.terminate()
+        replica.alive = False
+
+    def close(self) -> None:
+        self._closed = True
+        for replica in self._replicas:
+            self._stop(replica)
+        self._ready.clear()
+
+    def _respawn(self, replica: _Replica) -> None:
+        """Replace a dead replica's process on a background thread (at most one attempt at a time)."""
+        with self._lock:
+            if replica.respawning or self._closed or not self.config.replicas.respawn:
+                return
+            replica.respawning = True
+
+        def restart() -> None:
+            try:
+                with replica.lock:
+                    self._stop(replica)
+                self._spawn(replica)
+                self._await_ready(replica)
+                replica.restarts += 1
+            except Exception as exc:
+                self.error = f"{type(exc).__name__}: {exc}"
+                self._stop(replica)
+            finally:
+                replica.respawning = False
+
+        threading.Thread(target=restart, name=f"nl2sql-replica-{replica.index}-respawn", daemon=True).start()
+
+    def _acquire(self, weight: int) -> _Replica:
+        for replica in self._replicas:
+            if replica.alive and replica.process is not None and not replica.process.is_alive():
+                replica.alive = False
+                self._respawn(replica)
+        with self._lock:
+            alive = [replica for replica in self._replicas if replica.alive]
+            if not alive:
+                raise ReplicaError("No replica is running.")
+            replica = min(alive, key=lambda candidate: (candidate.load, candidate.requests))
+            replica.load += weight
+            replica.requests += weight
+            return replica
+
+    def _release(self, replica: _Replica, weight: int) -> None:
+        with self._lock:
+            replica.load -= weight
+
+    def _call(self, replica: _Replica, kind: str, args: Tuple[Any, ...]) -> Any:
+        try:
+            return replica.call(kind, args)
+        except ReplicaError:
+            if not replica.alive:
+                self._respawn(replica)
+            raise
+
+    def _dispatch(self, kind: str, args: Tuple[Any, ...], weight: int) -> Any:
+        replica = self._acquire(weight)
+        try:
+            return self._call(replica, kind, args)
+        finally:
+            self._release(replica, weight)
+
+    def _broadcast(self, kind: str, args: Tuple[Any, ...] = ()) -> List[Any]:
+        """Ask every running replica; one that dies meanwhile is skipped (and respawned)."""
+        answers = []
+        for replica in self._replicas:
+            if not replica.alive:
+                continue
+            try:
+                answers.append(self._call(replica, kind, args))
+            except ReplicaError:
+                if replica.alive:
+                    raise
+        return answers
+
+    def executor_for(self, schema_name: Optional[str]) -> SQLiteExecutor:
+        schema = self.catalog.get(schema_name)
+        executor = self._executors.get(schema.name)
+        if executor is None:
+            executor = SQLiteExecutor(schema.path, self.config.executor)
+            self._executors[schema.name] = executor
+        return executor
+
+    def _rebind(self, output: "PipelineOutput", schema_name: Optional[str]) -> "PipelineOutput":
+        if output.result is not None:
+            output.result._executor = self.executor_for(schema_name)
+        return output
+
+    def run_batch(
+        self, questions: Sequence[str], schema_names: Optional[Sequence[Optional[str]]] = None
+    ) -> List["PipelineOutput"]:
+        if schema_names is None:
+            schema_names = [None] * len(questions)
+        outputs = self._dispatch("run_batch", (list(questions), list(schema_names)), len(questions))
+        return [self._rebind(output, name) for output, name in zip(outputs, schema_names)]
+
+    def run(
+        self,
+        question: str,
+        schema_name: Optional[str] = None,
+        profile: Optional[bool] = None,
+        request_id: Optional[str] = None,
+    ) -> "PipelineOutput":
+        output = self._dispatch("run", (question, schema_name, profile, request_id), 1)
+        return self._rebind(output, schema_name)
+
+    def tier_stats(self) -> Dict[str, int]:
+        totals: Dict[str, int] = {}
+        for stats in self._broadcast("tier_stats"):
+            for tier, count in stats.items():
+                totals[tier] = totals.get(tier, 0) + count
+        return totals
+
+    @staticmethod
+    def _merge(reports: Sequence[List[Dict[str, Any]]], key: Callable[[Dict[str, Any]], Any]) -> List[Dict[str, Any]]:
+        """One entry per key across replicas, with the integer counters summed."""
+        merged: Dict[Any, Dict[str, Any]] = {}
+        for report in reports:
+            for entry in report:
+                existing = merged.get(key(entry))
+                if existing is None:
+                    merged[key(entry)] = dict(entry)
+                    continue
+                for name, value in entry.items():
+                    if isinstance(value, int) and not isinstance(value, bool):
+                        existing[name] += value
+        return list(merged.values())
+
+    def template_report(self) -> Optional[Tuple[Dict[str, float], List[Dict[str, Any]]]]:
+        """Template stats and report summed over the replicas (each learns its own store), or None when off."""
+        answers = [answer for answer in self._broadcast("template_report") if answer is not None]
+        if not answers:
+            return None
+        counters = ("lookups", "attempts", "hits", "learned", "evicted")
+        stats = {name: sum(answer[0][name] for answer in answers) for name in counters}
+        templates = self._merge([answer[1] for answer in answers], key=lambda entry: entry["id"])
+        templates.sort(key=lambda entry: entry["hits"], reverse=True)
+        stats["templates"] = len(templates)
+        stats["hit_rate"] = stats["hits"] / stats["lookups"] if stats["lookups"] else 0.0
+        return stats, templates
+
+    def evict_template(self, template_id: str) -> bool:
+        return any(self._broadcast("evict_template", (template_id,)))
+
+    def rule_report(self) -> Optional[Tuple[Dict[str, int], List[Dict[str, Any]]]]:
+        """Rule counters summed over the replicas (which all load the same rules), or None before any runs."""
+        answers = self._broadcast("rule_report")
+        if not answers:
+            return None
+        rules = self._merge([answer[1] for answer in answers], key=lambda entry: (entry["schema"], entry["name"]))
+        stats = {name: sum(answer[0][name] for answer in answers) for name in answers[0][0] if name != "rules"}
+        stats["rules"] = len(rules)
+        return stats, rules
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            replicas = [
+                {
+                    "index": replica.index,
+                    "pid": replica.pid,
+                    "alive": replica.alive,
+                    "cores": replica.cores,
+                    "threads": replica.threads,
+                    "load": replica.load,
+                    "requests": replica.requests,
+                    "restarts": replica.restarts,
+                }
+                for replica in self._replicas
+            ]
+        return {
+            "ready": self.ready,
+            "error": self.error,
+            "startup_s": round(self.startup_s, 4) if self.startup_s is not None else None,
+            "replicas": replicas,
+        }
+
+
+def candidate_splits(config: PipelineConfig, cores: Optional[int] = None) -> List[Tuple[int, int]]:
+    """(replicas, threads per replica) pairs that use every core: 1xN, 2x(N/2), 4x(N/4), ..."""
+    cores = cores or len(usable_cores())
+    splits = []
+    count = 1
+    while count <= min(cores, config.replicas.calibration_max_replicas):
+        splits.append((count, cores // count))
+        count *= 2
+    return splits
+
+
+def calibrate(
+    config: PipelineConfig,
+    splits: Optional[Sequence[Tuple[int, int]]] = None,
+    catalog: Optional[SchemaCatalog] = None,
+) -> Tuple[Tuple[int, int], List[Dict[str, Any]]]:
+    """Time each split on a fixed workload and return the fastest plus every measurement.
+
+    The workload cycles through the shared ``WORKLOAD`` questions (the warm-up question for catalogs without
+    those schemas) up to ``calibration_requests`` questions, sent as ``max_batch_size`` batches with
+    one batch in flight per replica (as the scheduler does). Caches, templates and the rule fast
+    path are off, so every request reaches the model.
+    """
+    catalog = catalog or SchemaCatalog(config.schema.schema_path, binary_cache=config.schema.binary_cache)
+    config = replace(
+        config,
+        cache=replace(config.cache, enabled=False),
+        executor=replace(config.executor, result_cache_bytes=0),
+        templates=replace(config.templates, enabled=False),
+        rules=replace(config.rules, fast_path=False),
+    )
+    names = set(catalog.names())
+    workload = [(name, question) for name, question, _ in WORKLOAD if name in names]
+    workload = workload or [(name, config.serving.warmup_question) for name in sorted(names)]
+    jobs = [workload[index % len(workload)] for index in range(config.replicas.calibration_requests)]
+    size = max(1, config.serving.max_batch_size)
+    batches = [jobs[start : start + size] for start in range(0, len(jobs), size)]
+    results: List[Dict[str, Any]] = []
+    for count, threads in splits or candidate_splits(config):
+        pool = ReplicaPool(config, catalog, count=count, threads=threads)
+        try:
+            pool.launch()
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=count) as runner:
+                list(
+                    runner.map(
+                        lambda batch: pool.run_batch([question for _, question in batch], [name for name, _ in batch]),
+                        batches,
+                    )
+                )
+            wall = time.perf_counter() - start
+        finally:
+            pool.close()
+        results.append(
+            {
+                "replicas": count,
+                "threads": threads,
+                "throughput_rps": len(jobs) / wall if wall else 0.0,
+                "startup_s": pool.startup_s,
+            }
+        )
+    best = max(results, key=lambda result: result["throughput_rps"])
+    return (best["replicas"], best["threads"]), results
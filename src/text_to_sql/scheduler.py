@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List, Optional, Set
+
+from .config import ServingConfig
+
+if TYPE_CHECKING:
+    from .pipeline import NL2SQLPipeline, PipelineOutput
+
+
+@dataclass
+class _PendingRequest:
+    question: str
+    schema_name: Optional[str]
+    future: "asyncio.Future[PipelineOutput]"
+    profile: Optional[bool] = None
+    request_id: Optional[str] = None
+
+
+class MicroBatchScheduler:
+    """Collects concurrent requests into micro-batches for one shared pipeline.
+
+    ``workers`` batches may run at once; it is 1 for an in-process pipeline and the replica count
+    for a ``ReplicaPool``.
+    """
+
+    def __init__(
+        self,
+        pipeline: Optional["NL2SQLPipeline"],
+        config: Optional[ServingConfig] = None,
+        workers: int = 1,
+    ):
+        if pipeline is None and config is None:
+            raise ValueError("MicroBatchScheduler needs a pipeline or a ServingConfig.")
+        self.pipeline = pipeline
+        self.config = config or pipeline.config.serving
+        self.workers = max(1, workers)
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._running: Set["asyncio.Task[None]"] = set()
+        # Inference threads: batches run off the event loop, at most ``workers`` at a time.
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="nl2sql-batch")
+        self._in_flight = 0
+        self._batches = 0
+        self._requests = 0
+
+    def attach(self, pipeline: "NL2SQLPipeline", workers: Optional[int] = None) -> None:
+        """Bind the pipeline once it has finished loading (see ``StagedStartup``)."""
+        self.pipeline = pipeline
+        if workers is not None and workers > self.workers:
+            # Only before traffic (nothing is submitted until a pipeline is attached), so the swap is safe.
+            extra, self.workers = workers - self.workers, workers
+            previous, self._executor = self._executor, ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="nl2sql-batch"
+            )
+            previous.shutdown(wait=False)
+            if self._loop is not None and self._slots is not None:
+                for _ in range(extra):
+                    self._loop.call_soon_threadsafe(self._slots.release)
+
+    @property
+    def ready(self) -> bool:
+        return self.pipeline is not None
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "queue_depth": self.queue_depth,
+            "in_flight": self._in_flight,
+            "batches": self._batches,
+            "requests": self._requests,
+            "avg_batch_size": self._requests / self._batches if self._batches else 0.0,
+            "max_batch_size": self.config.max_batch_size,
+            "max_wait_ms": self.config.max_wait_ms,
+            "workers": self.workers,
+        }
+
+    async def start(self) -> None:
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.workers)
+            self._loop = asyncio.get_running_loop()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        for task in list(self._running):
+            task.cancel()
+        self._executor.shutdown(wait=False)
+
+    async def submit(
+        self,
+        question: str,
+        schema_name: Optional[str] = None,
+        profile: Optional[bool] = None,
+        request_id: Optional[str] = None,
+    ) -> "PipelineOutput":
+        if self._queue is None:
+            raise RuntimeError("Scheduler has not been started.")
+        if self.pipeline is None:
+            raise RuntimeError("Pipeline is still loading.")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_PendingRequest(question, schema_name, future, profile, request_id))
+        return await future
+
+    async def _collect(self) -> List[_PendingRequest]:
+        assert self._queue is not None
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.config.max_wait_ms / 1000.0
+        while len(batch) < self.config.max_batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return [request for request in batch if not request.future.cancelled()]
+
+    def _run_batch(self, batch: List[_PendingRequest]) -> List[object]:
+        assert self.pipeline is not None
+        profiled = [self.pipeline.profiler.should_profile(request.profile) for request in batch]
+        plain = [request for request, flag in zip(batch, profiled) if not flag]
+        plain_outcomes = iter(self._run_plain(plain) if plain else [])
+        outcomes: List[object] = []
+        for request, flag in zip(batch, profiled):
+            if not flag:
+                outcomes.append(next(plain_outcomes))
+                continue
+            # Profiled requests run alone so their traces only cover their own work.
+            try:
+                outcomes.append(
+                    self.pipeline.run(request.question, request.schema_name, profile=True, request_id=request.request_id)
+                )
+            except Exception as exc:
+                outcomes.append(exc)
+        return outcomes
+
+    def _run_plain(self, batch: List[_PendingRequest]) -> List[object]:
+        assert self.pipeline is not None
+        questions = [request.question for request in batch]
+        schema_names = [request.schema_name for request in batch]
+        try:
+            outcomes: List[object] = list(self.pipeline.run_batch(questions, schema_names))
+        except Exception as exc:
+            if len(batch) == 1:
+                return [exc]
+            # Isolate the failing request(s) instead of failing the whole batch.
+            outcomes = []
+            for request in batch:
+                try:
+                    outcomes.append(self.pipeline.run(request.question, request.schema_name, profile=False))
+                except Exception as error:
+                    outcomes.append(error)
+        for request, outcome in zip(batch, outcomes):
+            if not isinstance(outcome, BaseException):
+                outcome.request_id = request.request_id  # type: ignore[attr-defined]
+        return outcomes
+
+    async def _execute(self, batch: List[_PendingRequest]) -> None:
+        loop = asyncio.get_running_loop()
+        self._in_flight += len(batch)
+        try:
+            outcomes = await loop.run_in_executor(self._executor, self._run_batch, batch)
+        except Exception as exc:
+            outcomes = [exc] * len(batch)
+        finally:
+            self._in_flight -= len(batch)
+            assert self._slots is not None
+            self._slots.release()
+        self._batches += 1
+        self._requests += len(batch)
+        for request, outcome in zip(batch, outcomes):
+            if request.future.done():
+                continue
+            if isinstance(outcome, BaseException):
+                request.future.set_exception(outcome)
+            else:
+                request.future.set_result(outcome)
+
+    async def _run(self) -> None:
+        assert self._slots is not None
+        while True:
+            # Wait for a free worker before collecting, so requests keep batching while all are busy.
+            await self._slots.acquire()
+            batch = await self._collect()
+            if not batch:
+                self._slots.release()
+                continue
+            task = asyncio.create_task(self._execute(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
@@ -1,17 +1,27 @@
+import hashlib
 import json
-from dataclasses import dataclass
+import marshal
+import os
+import struct
+import sys
+import threading
+from dataclasses import asdict, dataclass
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
 
+CACHE_SUFFIX = ".catalog"
+_CACHE_VERSION = 1
+_HEADER = struct.Struct("<Q")
 
-@dataclass
+
+@dataclass(slots=True)
 class Column:
     name: str
     type: str
     description: Optional[str] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class Table:
     name: str
     columns: List[Column]
@@ -23,7 +33,7 @@ class Table:
         return [col.name for col in self.columns]
 
 
-@dataclass
+@dataclass(slots=True)
 class ForeignKey:
     source_table: str
     source_column: str
@@ -51,35 +61,197 @@ class DatabaseSchema:
         ]
 
 
-def load_schema(schema_path: Path) -> List[DatabaseSchema]:
-    with schema_path.open("r", encoding="utf-8") as handle:
-        payload = json.load(handle)
-    dbs: List[DatabaseSchema] = []
-    for db in payload["databases"]:
-        tables = []
-        for tbl in db["tables"]:
-            columns = [
-                Column(name=col["name"], type=col["type"], description=col.get("description"))
-                for col in tbl["columns"]
-            ]
-            tables.append(
-                Table(
-                    name=tbl["name"],
-                    description=tbl.get("description"),
-                    columns=columns,
-                    primary_key=tbl.get("primary_key"),
-                    sample_values=tbl.get("sample_values"),
-                )
-            )
-        fks = [
-            ForeignKey(
-                source_table=fk["source_table"],
-                source_column=fk["source_column"],
-                target_table=fk["target_table"],
-                target_column=fk["target_column"],
-            )
-            for fk in db.get("foreign_keys", [])
+def _build_schema(db: Dict[str, Any]) -> DatabaseSchema:
+    intern = sys.intern
+    tables = []
+    for tbl in db["tables"]:
+        columns = [
+            Column(name=intern(col["name"]), type=intern(col["type"]), description=col.get("description"))
+            for col in tbl["columns"]
         ]
-        dbs.append(DatabaseSchema(name=db["name"], path=Path(db["path"]), tables=tables, foreign_keys=fks))
-    return dbs
+        tables.append(
+            Table(
+                name=intern(tbl["name"]),
+                description=tbl.get("description"),
+                columns=columns,
+                primary_key=tbl.get("primary_key"),
+                sample_values=tbl.get("sample_values"),
+            )
+        )
+    fks = [
+        ForeignKey(
+            source_table=intern(fk["source_table"]),
+            source_column=intern(fk["source_column"]),
+            target_table=intern(fk["target_table"]),
+            target_column=intern(fk["target_column"]),
+        )
+        for fk in db.get("foreign_keys", [])
+    ]
+    return DatabaseSchema(name=db["name"], path=Path(db["path"]), tables=tables, foreign_keys=fks)
+
+
+class SchemaCatalog:
+    """Name-indexed schema collection that builds ``DatabaseSchema`` objects on first use.
+
+    A marshal-encoded cache is written next to the JSON file (``<schema>.json.catalog``) so later
+    starts read only a small header; each database is decoded from its own byte range on demand.
+    The cache is reused while the JSON's mtime/size (or, failing that, its SHA-1) match. The cache
+    file stays open until every schema is decoded, so a concurrent rewrite (another process's
+    ``os.replace``) cannot shift the byte ranges under this catalog.
+    """
+
+    def __init__(self, schema_path: Path, binary_cache: bool = True):
+        self.schema_path = Path(schema_path)
+        self.cache_path = self.schema_path.with_name(self.schema_path.name + CACHE_SUFFIX)
+        self._lock = threading.Lock()
+        self._schemas: Dict[str, DatabaseSchema] = {}
+        self._raw: Dict[str, Dict[str, Any]] = {}
+        self._offsets: Dict[str, Tuple[int, int]] = {}
+        self._listeners: List[Callable[[DatabaseSchema], None]] = []
+        self._names: List[str] = []
+        self._cache_handle: Optional[BinaryIO] = None
+        self.digest = ""
+        if not (binary_cache and self._read_cache_header()):
+            self._read_json(write_cache=binary_cache)
+
+    def _stamp(self) -> Tuple[int, int]:
+        stat = os.stat(self.schema_path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read_cache_header(self) -> bool:
+        try:
+            handle = self.cache_path.open("rb")
+        except OSError:
+            return False
+        try:
+            (length,) = _HEADER.unpack(handle.read(_HEADER.size))
+            header = marshal.loads(handle.read(length))
+            valid = header.get("version") == _CACHE_VERSION and header.get("python") == sys.version_info[:2]
+            if valid and tuple(header["stamp"]) != self._stamp():
+                valid = hashlib.sha1(self.schema_path.read_bytes()).hexdigest() == header["digest"]
+        except (OSError, EOFError, ValueError, TypeError, KeyError, struct.error):
+            valid = False
+        if not valid:
+            handle.close()
+            return False
+        self._cache_handle = handle
+        self.digest = header["digest"]
+        self._names = list(header["names"])
+        base = _HEADER.size + length
+        self._offsets = {key: (base + offset, size) for key, (offset, size) in header["offsets"].items()}
+        return True
+
+    def _read_json(self, write_cache: bool) -> None:
+        payload = self.schema_path.read_bytes()
+        self.digest = hashlib.sha1(payload).hexdigest()
+        databases = json.loads(payload.decode("utf-8"))["databases"]
+        self._names = [db["name"] for db in databases]
+        self._raw = {db["name"].lower(): db for db in databases}
+        if write_cache:
+            try:
+                self._write_cache(databases)
+            except OSError:
+                pass
+
+    def _write_cache(self, databases: List[Dict[str, Any]]) -> None:
+        blobs = [marshal.dumps(db) for db in databases]
+        offsets: Dict[str, Tuple[int, int]] = {}
+        position = 0
+        for db, blob in zip(databases, blobs):
+            offsets[db["name"].lower()] = (position, len(blob))
+            position += len(blob)
+        header = marshal.dumps(
+            {
+                "version": _CACHE_VERSION,
+                "python": sys.version_info[:2],
+                "stamp": self._stamp(),
+                "digest": self.digest,
+                "names": self._names,
+                "offsets": offsets,
+            }
+        )
+        tmp_path = self.cache_path.with_name(self.cache_path.name + f".{os.getpid()}.tmp")
+        with tmp_path.open("wb") as handle:
+            handle.write(_HEADER.pack(len(header)))
+            handle.write(header)
+            for blob in blobs:
+                handle.write(blob)
+        os.replace(tmp_path, self.cache_path)
 
+    def _known(self, key: str) -> bool:
+        return key in self._schemas or key in self._raw or key in self._offsets
+
+    def _load_raw(self, key: str) -> Dict[str, Any]:
+        raw = self._raw.get(key)
+        if raw is not None:
+            return raw
+        # Called under ``self._lock``: the shared handle's position is not thread-safe.
+        assert self._cache_handle is not None
+        offset, size = self._offsets[key]
+        self._cache_handle.seek(offset)
+        return marshal.loads(self._cache_handle.read(size))
+
+    def close(self) -> None:
+        """Release the cache file (done automatically once every schema is decoded)."""
+        with self._lock:
+            self._close_cache()
+
+    def _close_cache(self) -> None:
+        if self._cache_handle is not None:
+            self._cache_handle.close()
+            self._cache_handle = None
+
+    def names(self) -> List[str]:
+        return list(self._names)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, name: object) -> bool:
+        return isinstance(name, str) and self._known(name.lower())
+
+    def __iter__(self) -> Iterator[DatabaseSchema]:
+        for name in self._names:
+            yield self.get(name)
+
+    def on_load(self, callback: Callable[[DatabaseSchema], None]) -> None:
+        """Register ``callback`` for every schema as it is materialized (and for those already loaded)."""
+        with self._lock:
+            self._listeners.append(callback)
+            loaded = list(self._schemas.values())
+        for schema in loaded:
+            callback(schema)
+
+    def loaded(self) -> List[DatabaseSchema]:
+        return list(self._schemas.values())
+
+    def get(self, name: Optional[str] = None) -> DatabaseSchema:
+        if not self._names:
+            raise ValueError(f"No schemas defined in {self.schema_path}.")
+        key = (name or self._names[0]).lower()
+        schema = self._schemas.get(key)
+        if schema is not None:
+            return schema
+        with self._lock:
+            schema = self._schemas.get(key)
+            if schema is None:
+                if not self._known(key):
+                    raise ValueError(f"Schema {name} not found.")
+                schema = _build_schema(self._load_raw(key))
+                for callback in self._listeners:
+                    callback(schema)
+                self._schemas[key] = schema
+                self._raw.pop(key, None)
+                if len(self._schemas) == len(self._names):
+                    self._close_cache()
+        return schema
+
+
+def schema_digest(schema: DatabaseSchema) -> str:
+    """SHA-1 of one materialized schema's tables, columns and foreign keys."""
+    payload = json.dumps(asdict(schema), sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def load_schema(schema_path: Path) -> List[DatabaseSchema]:
+    return list(SchemaCatalog(schema_path, binary_cache=False))
@@ -0,0 +1,311 @@
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Pattern, Sequence, Tuple
+
+from .config import TemplateConfig
+
+# SQL string literals and bare numbers; double quotes are identifiers in SQLite and stay as they are.
+_SQL_LITERAL_RE = re.compile(r"'((?:[^']|'')*)'|(?<![\w.])(\d+(?:\.\d+)?)(?![\w.])")
+_PLACEHOLDER_RE = re.compile(r"'(?:[^']|'')*'|\?")
+_NUMBER_SLOT = r"(\d+(?:\.\d+)?)"
+_TEXT_SLOT = r"([\w'\-]+(?: [\w'\-]+)*?)"
+_CONNECTIVES = {"and", "or", "not", "but", "nor"}
+_SLOT_RE = re.compile(r"\{\d+\}")
+
+# (first word, last word) a question must have to fit a template; None where a slot can supply it.
+Anchors = Tuple[Optional[str], Optional[str]]
+
+
+def normalize_question_text(question: str) -> str:
+    return re.sub(r"\s+", " ", question.strip()).rstrip("?.! ")
+
+
+def placeholder_count(sql: str) -> int:
+    return sum(match.group(0) == "?" for match in _PLACEHOLDER_RE.finditer(sql))
+
+
+def inline_params(sql: str, params: Sequence[Any]) -> str:
+    """``sql`` with each ``?`` (outside string literals) replaced by its parameter, for display only."""
+    values = iter(params)
+
+    def literal(match: "re.Match[str]") -> str:
+        if match.group(0) != "?":
+            return match.group(0)
+        value = next(values)
+        return str(value) if isinstance(value, (int, float)) else "'" + str(value).replace("'", "''") + "'"
+
+    return _PLACEHOLDER_RE.sub(literal, sql)
+
+
+def _case_transform(span: str, value: str) -> Optional[str]:
+    for name, transform in (("asis", str), ("lower", str.lower), ("upper", str.upper), ("title", str.title)):
+        if transform(span) == value:
+            return name
+    return None
+
+
+def _apply_case(name: str, value: str) -> str:
+    return {"asis": value, "lower": value.lower(), "upper": value.upper(), "title": value.title()}[name]
+
+
+@dataclass
+class TemplateSlot:
+    # "number" (int/float parameter) or "text" (string parameter with a case transform).
+    kind: str
+    transform: str = "asis"
+    is_float: bool = False
+
+
+@dataclass
+class SQLTemplate:
+    template_id: str
+    schema: str
+    skeleton: str
+    sql: str
+    slots: List[TemplateSlot]
+    # Slot index for each ``?`` in ``sql``, in order.
+    placeholders: List[int]
+    pattern: Pattern[str] = field(repr=False)
+    max_text_words: int = 3
+    hits: int = 0
+    failures: int = 0
+    created_at: float = field(default_factory=time.time)
+    last_used: Optional[float] = None
+    # ``sql`` pretty-printed once, so rendering a hit only inlines the parameters.
+    display_sql: Optional[str] = field(default=None, repr=False)
+
+    def bind(self, question: str) -> Optional[List[Any]]:
+        """Fill the slots from ``question``; None when it does not fit the skeleton."""
+        match = self.pattern.fullmatch(normalize_question_text(question))
+        if match is None:
+            return None
+        values: List[Any] = []
+        for slot, raw in zip(self.slots, match.groups()):
+            if slot.kind == "number":
+                values.append(float(raw) if slot.is_float or "." in raw else int(raw))
+                continue
+            words = raw.split()
+            # A text slot is one short value; "sales or hr" is a different question shape.
+            if len(words) > self.max_text_words or any(word.lower() in _CONNECTIVES for word in words):
+                return None
+            values.append(_apply_case(slot.transform, raw))
+        return [values[index] for index in self.placeholders]
+
+    def render(self, params: Sequence[Any]) -> str:
+        """The SQL (``display_sql`` when set) with its parameters inlined, for display only."""
+        return inline_params(self.display_sql or self.sql, params)
+
+
+def extract_template(
+    question: str, sql: str, schema: str, max_text_words: int = 3
+) -> Optional[SQLTemplate]:
+    """Abstract the literals shared by ``question`` and ``sql`` into slots.
+
+    Only values that occur exactly once in the question become slots; everything else stays fixed
+    text, so a template never generalizes beyond what the question and SQL provably share.
+    """
+    text = normalize_question_text(question)
+    spans: List[Tuple[int, int, TemplateSlot]] = []
+    slot_for_value: Dict[Tuple[str, str], int] = {}
+    placeholders: List[int] = []
+    pieces: List[str] = []
+    cursor = 0
+    for literal in _SQL_LITERAL_RE.finditer(sql):
+        string_value, number = literal.group(1), literal.group(2)
+        if string_value is not None:
+            value = string_value.replace("''", "'")
+            found = list(re.finditer(rf"(?<!\w){re.escape(value)}(?!\w)", text, re.IGNORECASE)) if value else []
+            kind = "text"
+        else:
+            value = number
+            found = list(re.finditer(rf"(?<![\w.]){re.escape(value)}(?![\w.])", text))
+            kind = "number"
+        key = (kind, value.lower())
+        if key not in slot_for_value:
+            if len(found) != 1 or any(start < found[0].end() and found[0].start() < end for start, end, _ in spans):
+                continue
+            span = found[0]
+            if kind == "text":
+                transform = _case_transform(span.group(0), value)
+                if transform is None or len(value.split()) > max_text_words:
+                    continue
+                slot = TemplateSlot("text", transform)
+            else:
+                slot = TemplateSlot("number", is_float="." in value)
+            slot_for_value[key] = len(spans)
+            spans.append((span.start(), span.end(), slot))
+        pieces.append(sql[cursor : literal.start()])
+        pieces.append("?")
+        cursor = literal.end()
+        placeholders.append(slot_for_value[key])
+    if not spans:
+        return None
+    pieces.append(sql[cursor:])
+
+    # Slots are numbered by position in the question so the pattern's groups come out in order.
+    order = sorted(range(len(spans)), key=lambda index: spans[index][0])
+    renumber = {old: new for new, old in enumerate(order)}
+    slots = [spans[old][2] for old in order]
+    skeleton_parts: List[str] = []
+    pattern_parts: List[str] = []
+    position = 0
+    for new, old in enumerate(order):
+        start, end, slot = spans[old]
+        skeleton_parts.append(text[position:start].lower() + "{" + str(new) + "}")
+        pattern_parts.append(re.escape(text[position:start]) + (_NUMBER_SLOT if slot.kind == "number" else _TEXT_SLOT))
+        position = end
+    skeleton_parts.append(text[position:].lower())
+    pattern_parts.append(re.escape(text[position:]))
+    skeleton = "".join(skeleton_parts)
+    template_id = hashlib.sha1(f"{schema}\0{skeleton}".encode("utf-8")).hexdigest()[:12]
+    return SQLTemplate(
+        template_id=template_id,
+        schema=schema,
+        skeleton=skeleton,
+        sql="".join(pieces),
+        slots=slots,
+        placeholders=[renumber[index] for index in placeholders],
+        pattern=re.compile("".join(pattern_parts), re.IGNORECASE),
+        max_text_words=max_text_words,
+    )
+
+
+def skeleton_anchors(skeleton: str) -> Anchors:
+    """The skeleton's fixed first and last words, when the text around the slots pins them down."""
+    pieces = _SLOT_RE.split(skeleton)
+    prefix, suffix = pieces[0], pieces[-1]
+    # A word touching a slot ("{0}s") is only partly fixed, so it cannot be an anchor.
+    first = prefix.split(" ", 1)[0] if " " in prefix else None
+    last = suffix.rsplit(" ", 1)[1] if " " in suffix else None
+    return first or None, last or None
+
+
+def question_anchors(question: str) -> List[Anchors]:
+    """Index keys under which templates that may fit ``question`` are filed, most specific first."""
+    words = normalize_question_text(question).lower().split(" ")
+    first, last = words[0], words[-1]
+    return [(first, last), (first, None), (None, last), (None, None)]
+
+
+class TemplateStore:
+    """Learned (question skeleton -> parameterized SQL) templates, evicted LRU-first.
+
+    Templates are filed per schema under their skeleton's fixed first/last words, so a lookup only
+    tries the patterns of templates whose fixed text can line up with the question.
+    """
+
+    def __init__(self, config: Optional[TemplateConfig] = None):
+        self.config = config or TemplateConfig()
+        self._lru: "OrderedDict[str, SQLTemplate]" = OrderedDict()
+        self._by_schema: Dict[str, Dict[Anchors, Dict[str, SQLTemplate]]] = {}
+        self._lock = threading.Lock()
+        self.lookups = 0
+        # Templates whose pattern was tried against a question; the anchor index keeps this close to lookups.
+        self.attempts = 0
+        self.hits = 0
+        self.learned = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    def match(self, question: str, schema: str) -> Optional[Tuple[SQLTemplate, List[Any]]]:
+        with self._lock:
+            self.lookups += 1
+            index = self._by_schema.get(schema)
+            if not index:
+                return None
+            candidates = [
+                template for anchors in question_anchors(question) for template in index.get(anchors, {}).values()
+            ]
+            for template in candidates:
+                self.attempts += 1
+                params = template.bind(question)
+                if params is None:
+                    continue
+                self._lru.move_to_end(template.template_id)
+                template.hits += 1
+                template.last_used = time.time()
+                self.hits += 1
+                return template, params
+        return None
+
+    def learn(self, question: str, schema: str, sql: str) -> Optional[SQLTemplate]:
+        """Store a template for a question the model answered successfully (no-op if nothing generalizes)."""
+        template = extract_template(question, sql, schema, self.config.max_text_slot_words)
+        if template is None:
+            return None
+        with self._lock:
+            existing = self._lru.get(template.template_id)
+            if existing is not None:
+                return existing
+            self._lru[template.template_id] = template
+            index = self._by_schema.setdefault(schema, {})
+            index.setdefault(skeleton_anchors(template.skeleton), {})[template.template_id] = template
+            self.learned += 1
+            while len(self._lru) > self.config.max_templates:
+                self._drop(next(iter(self._lru)))
+        return template
+
+    def _drop(self, template_id: str) -> bool:
+        template = self._lru.pop(template_id, None)
+        if template is None:
+            return False
+        index = self._by_schema[template.schema]
+        anchors = skeleton_anchors(template.skeleton)
+        index[anchors].pop(template_id, None)
+        if not index[anchors]:
+            del index[anchors]
+        self.evicted += 1
+        return True
+
+    def record_failure(self, template: SQLTemplate) -> bool:
+        """Count a failed execution; returns True when the template was evicted."""
+        with self._lock:
+            template.failures += 1
+            if template.failures < self.config.max_failures:
+                return False
+            return self._drop(template.template_id)
+
+    def evict(self, template_id: str) -> bool:
+        with self._lock:
+            return self._drop(template_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._lru.clear()
+            self._by_schema.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "templates": len(self._lru),
+                "lookups": self.lookups,
+                "attempts": self.attempts,
+                "hits": self.hits,
+                "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+                "learned": self.learned,
+                "evicted": self.evicted,
+            }
+
+    def report(self) -> List[Dict[str, Any]]:
+        """Every template with its usage, most-used first."""
+        with self._lock:
+            templates = list(self._lru.values())
+        return [
+            {
+                "id": template.template_id,
+                "schema": template.schema,
+                "skeleton": template.skeleton,
+                "sql": template.sql,
+                "hits": template.hits,
+                "failures": template.failures,
+            }
+            for template in sorted(templates, key=lambda template: template.hits, reverse=True)
+        ]
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+from .config import PipelineConfig
+from .schema import SchemaCatalog
+
+if TYPE_CHECKING:
+    from .pipeline import NL2SQLPipeline
+
+
+@dataclass
+class StartupReport:
+    stages: Dict[str, float] = field(default_factory=dict)
+    started_at: float = field(default_factory=time.perf_counter)
+    total_s: Optional[float] = None
+    ready: bool = False
+    error: Optional[str] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "error": self.error,
+            "stages_s": {name: round(seconds, 4) for name, seconds in self.stages.items()},
+            "total_s": round(self.total_s, 4) if self.total_s is not None else None,
+        }
+
+    def render(self) -> str:
+        lines = ["Startup profile"]
+        for name, seconds in self.stages.items():
+            lines.append(f"  {name:<10} {seconds:8.3f}s")
+        if self.total_s is not None:
+            lines.append(f"  {'total':<10} {self.total_s:8.3f}s (wall clock; weights and schemas overlap)")
+        if self.error:
+            lines.append(f"  error: {self.error}")
+        return "\n".join(lines)
+
+
+class StagedStartup:
+    """Brings an ``NL2SQLPipeline`` up in stages so a server can bind its port first.
+
+    The schema catalog is read synchronously (it is cheap and lists the available databases);
+    torch/transformers are imported, weights load while schemas and prompt caches compile on a
+    second thread, and a configurable warm-up pass runs before ``ready`` is set. Only servers
+    (``serving.preload_schemas``) compile every schema; otherwise just ``schema_names`` are resolved.
+    """
+
+    def __init__(
+        self, config: PipelineConfig, on_ready: Optional[Callable[["NL2SQLPipeline"], None]] = None
+    ):
+        self.config = config
+        self.on_ready = on_ready
+        self.report = StartupReport()
+        with self._stage("catalog"):
+            self.catalog = SchemaCatalog(config.schema.schema_path, binary_cache=config.schema.binary_cache)
+        self.pipeline: Optional["NL2SQLPipeline"] = None
+        self._ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @contextmanager
+    def _stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.report.stages[name] = time.perf_counter() - start
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def start(self) -> threading.Thread:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name="nl2sql-startup", daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def run(self, schema_names: Optional[Sequence[Optional[str]]] = None) -> Optional["NL2SQLPipeline"]:
+        try:
+            with self._stage("import"):
+                from .pipeline import NL2SQLPipeline
+            with self._stage("tokenizer"):
+                pipeline = NL2SQLPipeline(self.config, catalog=self.catalog, load_weights=False)
+
+            errors: List[BaseException] = []
+
+            def load_schemas() -> None:
+                try:
+                    with self._stage("schemas"):
+                        if self.config.serving.preload_schemas:
+                            pipeline.preload_schemas()
+                        else:
+                            for name in schema_names or ():
+                                pipeline.catalog.get(name)
+                except BaseException as exc:  # surfaced after join
+                    errors.append(exc)
+
+            loader = threading.Thread(target=load_schemas, name="nl2sql-schemas", daemon=True)
+            loader.start()
+            with self._stage("weights"):
+                pipeline.load_weights()
+            loader.join()
+            if errors:
+                raise errors[0]
+            if self.config.serving.warmup_runs > 0:
+                with self._stage("warmup"):
+                    pipeline.warm_up(schema_names=schema_names)
+            self.pipeline = pipeline
+            self.report.total_s = time.perf_counter() - self.report.started_at
+            self.report.ready = True
+            if self.on_ready is not None:
+                self.on_ready(pipeline)
+            self._ready.set()
+            return pipeline
+        except Exception as exc:
+            self.report.total_s = time.perf_counter() - self.report.started_at
+            self.report.error = f"{type(exc).__name__}: {exc}"
+            raise
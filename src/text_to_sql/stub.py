@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Union
+
+import torch
+
+from .backends import InferenceBackend
+from .cache import normalize_question
+from .config import PipelineConfig
+
+_QUESTION_RE = re.compile(r"translate to SQL:\s*(.*?)\s*\|\|\s*schema:\s*(\w+)?", re.DOTALL)
+
+
+class StubTokenizer:
+    """Whitespace tokenizer with a vocabulary that grows on demand; ids decode back to the same words."""
+
+    pad_token = "<pad>"
+    eos_token = "</s>"
+    unk_token = "<unk>"
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._ids: Dict[str, int] = {}
+        self._words: List[str] = []
+        for token in (self.pad_token, self.eos_token, self.unk_token):
+            self._id(token)
+        self.pad_token_id, self.eos_token_id, self.unk_token_id = 0, 1, 2
+        self.all_special_ids = [0, 1, 2]
+
+    def _id(self, word: str) -> int:
+        token_id = self._ids.get(word)
+        if token_id is None:
+            with self._lock:
+                token_id = self._ids.get(word)
+                if token_id is None:
+                    token_id = len(self._words)
+                    self._words.append(word)
+                    self._ids[word] = token_id
+        return token_id
+
+    def encode(self, text: str) -> List[int]:
+        return [self._id(word) for word in text.split()]
+
+    def __call__(self, text: Union[str, Sequence[str]], add_special_tokens: bool = True, **_: Any) -> Dict[str, Any]:
+        if isinstance(text, str):
+            ids = self.encode(text)
+            return {"input_ids": ids + [self.eos_token_id] if add_special_tokens else ids}
+        return {"input_ids": [self(item, add_special_tokens)["input_ids"] for item in text]}
+
+    def get_vocab(self) -> Dict[str, int]:
+        return dict(self._ids)
+
+    def convert_tokens_to_ids(self, tokens: Sequence[str]) -> List[int]:
+        return [self._ids.get(token, self.unk_token_id) for token in tokens]
+
+    def decode(self, ids: Sequence[int], skip_special_tokens: bool = False) -> str:
+        if isinstance(ids, torch.Tensor):
+            ids = ids.tolist()
+        special = set(self.all_special_ids) if skip_special_tokens else set()
+        return " ".join(self._words[token_id] for token_id in ids if token_id not in special)
+
+    def batch_decode(self, sequences: Sequence[Sequence[int]], skip_special_tokens: bool = False) -> List[str]:
+        return [self.decode(ids, skip_special_tokens) for ids in sequences]
+
+    def save_pretrained(self, *_: Any) -> None:
+        pass
+
+
+class StubBackend(InferenceBackend):
+    """Answers from a question -> ranked SQL table and sleeps to mimic decoder cost.
+
+    Unknown questions get ``SELECT * FROM <first table in the prompt>``, so linking still steers the result.
+    Simulated latency per ``generate`` call is ``prefill_ms`` per prompt plus ``step_ms`` per output
+    token, scaled up by 15% for every extra beam.
+    """
+
+    name = "stub"
+
+    def __init__(
+        self,
+        config: PipelineConfig,
+        tokenizer: StubTokenizer,
+        answers: Optional[Mapping[str, Sequence[str]]] = None,
+        prefill_ms: float = 2.0,
+        step_ms: float = 0.5,
+    ):
+        super().__init__(config, torch.device("cpu"))
+        self.tokenizer = tokenizer
+        self.answers = {normalize_question(question): list(sqls) for question, sqls in (answers or {}).items()}
+        self.prefill_ms = prefill_ms
+        self.step_ms = step_ms
+
+    def load(self) -> None:
+        self.model = self
+
+    def _candidates(self, prompt: str) -> List[str]:
+        match = _QUESTION_RE.search(prompt)
+        question, first_table = (match.group(1), match.group(2)) if match else (prompt, None)
+        sqls = self.answers.get(normalize_question(question))
+        if sqls:
+            return sqls
+        return [f"SELECT * FROM {first_table} LIMIT 10"] if first_table else ["SELECT 1"]
+
+    def generate(
+        self,
+        input_ids: torch.Tensor,
+        attention_mask: Optional[torch.Tensor] = None,
+        num_beams: int = 1,
+        num_return_sequences: int = 1,
+        **_: Any,
+    ) -> Any:
+        rows: List[List[int]] = []
+        scores: List[float] = []
+        for prompt_ids in input_ids.tolist():
+            sqls = self._candidates(self.tokenizer.decode(prompt_ids, skip_special_tokens=True))
+            for rank in range(num_return_sequences):
+                sql = sqls[min(rank, len(sqls) - 1)]
+                rows.append([self.tokenizer.pad_token_id] + self.tokenizer.encode(sql) + [self.tokenizer.eos_token_id])
+                scores.append(-0.1 * (rank + 1))
+        steps = max(len(row) for row in rows) if rows else 0
+        cost_ms = self.prefill_ms * input_ids.shape[0] + self.step_ms * steps * (1 + 0.15 * (num_beams - 1))
+        time.sleep(cost_ms / 1000.0)
+        sequences = torch.full((len(rows), steps), self.tokenizer.pad_token_id, dtype=torch.long)
+        for row, ids in enumerate(rows):
+            sequences[row, : len(ids)] = torch.tensor(ids, dtype=torch.long)
+        return SimpleNamespace(sequences=sequences, sequences_scores=torch.tensor(scores))
+
+    def encode(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> Optional[torch.Tensor]:
+        return None
+
+    def describe(self) -> str:
+        return f"{self.name}:{len(self.answers)}"
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from typing import ContextManager, Dict, Iterator, Optional, Protocol, Sequence
+
+STAGES = (
+    "rules",
+    "template",
+    "linking",
+    "serialization",
+    "tokenization",
+    "generation",
+    "validation",
+    "execution",
+    "fallback",
+)
+
+_ACTIVE: ContextVar[Optional["StageTimer"]] = ContextVar("nl2sql_stage_timer", default=None)
+_PROBE: ContextVar[Optional["StageProbe"]] = ContextVar("nl2sql_stage_probe", default=None)
+
+
+class StageProbe(Protocol):
+    """Anything that wants to wrap pipeline stages (e.g. a profiler); see ``probing``."""
+
+    def stage(self, name: str) -> ContextManager[None]:
+        ...
+
+
+class StageTimer:
+    """Accumulates wall-clock seconds per pipeline stage for the requests run while it is active."""
+
+    def __init__(self) -> None:
+        self.totals: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.totals[name] = self.totals.get(name, 0.0) + time.perf_counter() - start
+
+    @contextmanager
+    def activate(self) -> Iterator["StageTimer"]:
+        token = _ACTIVE.set(self)
+        try:
+            yield self
+        finally:
+            _ACTIVE.reset(token)
+
+    def as_dict(self) -> Dict[str, float]:
+        return dict(self.totals)
+
+
+def current_timer() -> Optional[StageTimer]:
+    return _ACTIVE.get()
+
+
+@contextmanager
+def probing(probe: StageProbe) -> Iterator[StageProbe]:
+    token = _PROBE.set(probe)
+    try:
+        yield probe
+    finally:
+        _PROBE.reset(token)
+
+
+@contextmanager
+def timed(name: str) -> Iterator[None]:
+    """Time ``name`` on the active timer (and probe); a no-op when nothing is being measured."""
+    timer = _ACTIVE.get()
+    probe = _PROBE.get()
+    if probe is None:
+        if timer is None:
+            yield
+            return
+        with timer.stage(name):
+            yield
+        return
+    with ExitStack() as stack:
+        stack.enter_context(probe.stage(name))
+        if timer is not None:
+            stack.enter_context(timer.stage(name))
+        yield
+
+
+def percentiles(values: Sequence[float]) -> Dict[str, float]:
+    """Nearest-rank p50/p95/p99 plus mean and count, as the benchmark and evaluation reports print them."""
+    if not values:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "mean": 0.0, "count": 0}
+    ordered = sorted(values)
+
+    def rank(q: float) -> float:
+        return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered) + 0.5)) - 1))]
+
+    return {
+        "p50": rank(0.50),
+        "p95": rank(0.95),
+        "p99": rank(0.99),
+        "mean": sum(ordered) / len(ordered),
+        "count": len(ordered),
+    }
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from typing import List, Tuple
+
+# Mixed question shapes over the bundled schemas, shared by the benchmark, replica calibration and the
+# ONNX equivalence check. Entries are (schema, question, ranked SQL the stub model returns). A few lists lead with a broken candidate
+# so validation and multi-candidate execution are exercised; the HR/division questions hit the rule engine.
+WORKLOAD: List[Tuple[str, str, List[str]]] = [
+    ("company", "How many employees are there?", ["SELECT COUNT(*) FROM employees"]),
+    (
+        "company",
+        "List the names of employees who are older than 30 and work in the Sales department.",
+        ["SELECT name FROM employee WHERE age > 30", "SELECT name FROM employees WHERE age > 30 AND department = 'Sales'"],
+    ),
+    (
+        "company",
+        "What is the total budget of projects per department?",
+        [
+            "SELECT d.name, SUM(p.budget) FROM projects AS p JOIN departments AS d ON p.department_id = d.id "
+            "GROUP BY d.name"
+        ],
+    ),
+    (
+        "company",
+        "Which client deals closed in 2024-Q3 and what division handled them?",
+        ["SELECT client, division FROM sales WHERE quarter = '2024-Q3'"],
+    ),
+    ("company", "What is the average salary per role?", ["SELECT role, AVG(salary) FROM employees GROUP BY role"]),
+    ("university", "Which students are majoring in Computer Science?", ["SELECT name FROM students WHERE major = 'Computer Science'"]),
+    ("university", "How many credits does each course have?", ["SELECT title, credits FROM courses"]),
+    (
+        "university",
+        "List the grades of Alice Kim.",
+        [
+            "SELECT c.title, e.grade FROM enrollments AS e JOIN students AS s ON e.student_id = s.id "
+            "JOIN courses AS c ON e.course_id = c.id WHERE s.name = 'Alice Kim'"
+        ],
+    ),
+    ("university", "How many students are in each year?", ["SELECT year, COUNT(*) FROM students GROUP BY year"]),
+    ("retail", "Which orders are still processing?", ["SELECT id, customer FROM orders WHERE status = 'processing'"]),
+    (
+        "retail",
+        "What is the average price of products per category?",
+        ["SELECT category, AVG(cost) FROM products GROUP BY category", "SELECT category, AVG(price) FROM products GROUP BY category"],
+    ),
+    (
+        "retail",
+        "How many items were sold for each product?",
+        [
+            "SELECT p.name, SUM(i.quantity) FROM order_items AS i JOIN products AS p ON i.product_id = p.id "
+            "GROUP BY p.name"
+        ],
+    ),
+    ("retail", "What is the most expensive product?", ["SELECT name, price FROM products ORDER BY price DESC LIMIT 1"]),
+]
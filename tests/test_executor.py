@@ -0,0 +1,55 @@
+import sqlite3
+import threading
+from contextlib import closing
+
+import pytest
+
+from src.text_to_sql.config import ExecutorConfig
+from src.text_to_sql.executor import PoolExhausted, QueryCancelled, QueryTimeout, SQLiteExecutor
+
+ENDLESS = "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n) SELECT COUNT(*) FROM n"
+
+
+def _create(path):
+    with closing(sqlite3.connect(path)) as conn:
+        conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.execute("INSERT INTO items (name) VALUES ('first')")
+        conn.commit()
+    return path
+
+
+def test_runaway_query_times_out(tmp_path):
+    executor = SQLiteExecutor(_create(tmp_path / "exec.db"), ExecutorConfig(query_timeout_s=0.2))
+    with pytest.raises(QueryTimeout):
+        executor.execute(ENDLESS)
+    # The progress handler is removed afterwards, so the pooled connection keeps working.
+    assert executor.execute("SELECT name FROM items").rows == [("first",)]
+
+
+def test_cancel_event_interrupts_query(tmp_path):
+    executor = SQLiteExecutor(_create(tmp_path / "exec.db"), ExecutorConfig(query_timeout_s=None))
+    cancel = threading.Event()
+    timer = threading.Timer(0.1, cancel.set)
+    timer.start()
+    try:
+        with pytest.raises(QueryCancelled):
+            executor.execute(ENDLESS, cancel=cancel)
+    finally:
+        timer.cancel()
+
+
+def test_validation_rejects_writes(tmp_path):
+    executor = SQLiteExecutor(_create(tmp_path / "exec.db"), ExecutorConfig(query_timeout_s=None))
+    assert executor.validate("SELECT name FROM items") is None
+    for sql in ("DELETE FROM items", "INSERT INTO items (name) VALUES ('x')", "DROP TABLE items"):
+        assert executor.validate(sql) == "Only read-only SELECT statements are allowed."
+    assert executor.execute("SELECT COUNT(*) FROM items").rows == [(1,)]
+
+
+def test_pool_exhausted_after_timeout(tmp_path):
+    config = ExecutorConfig(pool_size=1, pool_timeout_s=0.05, query_timeout_s=None)
+    executor = SQLiteExecutor(_create(tmp_path / "exec.db"), config)
+    with executor.pool.connection():
+        with pytest.raises(PoolExhausted):
+            executor.execute("SELECT name FROM items")
+    assert executor.execute("SELECT name FROM items").rows == [("first",)]
@@ -0,0 +1,62 @@
+import sqlite3
+from contextlib import closing
+
+from src.text_to_sql.config import ExecutorConfig
+from src.text_to_sql.executor import SQLiteExecutor
+
+QUERY = "SELECT name FROM items ORDER BY id"
+
+
+def _create(path, wal=False):
+    with closing(sqlite3.connect(path)) as conn:
+        if wal:
+            conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.execute("INSERT INTO items (name) VALUES ('first')")
+        conn.commit()
+
+
+def _executor(path):
+    return SQLiteExecutor(path, ExecutorConfig(query_timeout_s=None))
+
+
+def test_repeat_query_hits_cache(tmp_path):
+    path = tmp_path / "cache.db"
+    _create(path)
+    executor = _executor(path)
+    assert not executor.execute(QUERY).cache_hit
+    result = executor.execute("  SELECT name FROM items   ORDER BY id ;")
+    assert result.cache_hit
+    assert result.rows == [("first",)]
+
+
+def test_write_to_database_file_invalidates(tmp_path):
+    path = tmp_path / "cache.db"
+    _create(path)
+    executor = _executor(path)
+    executor.execute(QUERY)
+    with closing(sqlite3.connect(path)) as conn:
+        conn.execute("INSERT INTO items (name) VALUES ('second')")
+        conn.commit()
+    result = executor.execute(QUERY)
+    assert not result.cache_hit
+    assert result.rows == [("first",), ("second",)]
+
+
+def test_write_to_wal_invalidates(tmp_path):
+    path = tmp_path / "cache.db"
+    _create(path, wal=True)
+    # Holding a writer open keeps SQLite from checkpointing the WAL back into the main file,
+    # so only the -wal file changes.
+    with closing(sqlite3.connect(path)) as writer:
+        writer.execute("PRAGMA wal_autocheckpoint = 0")
+        executor = _executor(path)
+        executor.execute(QUERY)
+        main_stamp = executor.pool._file_stamp()
+        writer.execute("INSERT INTO items (name) VALUES ('second')")
+        writer.commit()
+        assert executor.pool._file_stamp() == main_stamp
+        result = executor.execute(QUERY)
+        assert not result.cache_hit
+        assert result.rows == [("first",), ("second",)]
+        assert executor.execute(QUERY).cache_hit
@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from conftest import ROOT
+from src.text_to_sql.config import ExecutorConfig, RuleConfig
+from src.text_to_sql.executor import SQLiteExecutor
+from src.text_to_sql.fallbacks import HeuristicTranslator, RuleError, load_rules, parse_rule
+from src.text_to_sql.schema import load_schema
+
+
+@pytest.fixture
+def company(monkeypatch):
+    # Schema paths in sample_schema.json are relative to the repository root.
+    monkeypatch.chdir(ROOT)
+    schema = next(schema for schema in load_schema(ROOT / "data" / "sample_schema.json") if schema.name == "company")
+    return schema, SQLiteExecutor(schema.path, ExecutorConfig(result_cache_bytes=0))
+
+
+@pytest.fixture
+def translator():
+    return HeuristicTranslator(RuleConfig(rules_dir=ROOT / "data" / "rules"))
+
+
+@pytest.mark.parametrize(
+    "entry, message",
+    [
+        ({"name": "no_sql"}, "needs a name and sql"),
+        ({"name": "phrase", "sql": "SELECT 1", "keywords": ["two words"]}, "single words"),
+        ({"name": "bad_regex", "sql": "SELECT 1", "patterns": ["("]}, "invalid pattern"),
+        ({"name": "count", "sql": "SELECT 1 WHERE 1 = ?"}, "one parameter per '?'"),
+        ({"name": "captured", "sql": "SELECT ?", "params": [{"group": 1}]}, "must be literals"),
+        (
+            {
+                "name": "group",
+                "sql": "SELECT 1",
+                "conditions": [{"pattern": "over (\\d+)", "sql": "x > ?", "params": [{"group": 2}]}],
+            },
+            "group 2 is not in the pattern",
+        ),
+        (
+            {
+                "name": "type",
+                "sql": "SELECT 1",
+                "conditions": [{"pattern": "over (\\d+)", "sql": "x > ?", "params": [{"group": 1, "type": "date"}]}],
+            },
+            "unknown parameter type",
+        ),
+    ],
+)
+def test_parse_rule_rejects_malformed_entries(entry, message):
+    with pytest.raises(RuleError, match=message):
+        parse_rule(entry, "company")
+
+
+def test_load_rules_rejects_duplicate_names(tmp_path):
+    path = tmp_path / "company.json"
+    path.write_text(json.dumps({"rules": [{"name": "twice", "sql": "SELECT 1"}] * 2}), encoding="utf-8")
+    with pytest.raises(RuleError, match="unique"):
+        load_rules(path, "company")
+
+
+def test_fast_path_rule_answers_exact_question(company, translator):
+    schema, executor = company
+    match = translator.match(
+        "List the names of employees older than 30 in the Sales department?", schema, fast_path=True
+    )
+    assert match is not None and match.rule.name == "employee_age_department"
+    assert match.sql == "SELECT name FROM employees WHERE age > ? AND department = ?"
+    assert match.params == [30, "Sales"]
+    rows = executor.execute(match.sql, params=match.params).rows
+    assert sorted(rows) == [("Ava Thompson",), ("Ethan Patel",), ("Olivia Green",), ("Sophia Nguyen",)]
+
+
+def test_broad_rule_only_answers_as_fallback(company, translator):
+    schema, executor = company
+    question = "Which employee names belong to the sales team, sorted by hire date?"
+    assert translator.match(question, schema, fast_path=True) is None
+    match = translator.match(question, schema)
+    assert match is not None and match.rule.name == "employee_age_department"
+    assert match.params == ["Sales"]
+    assert len(executor.execute(match.sql, params=match.params).rows) == 4
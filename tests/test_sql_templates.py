@@ -0,0 +1,73 @@
+from src.text_to_sql.config import TemplateConfig
+from src.text_to_sql.sql_templates import TemplateStore, extract_template, question_anchors, skeleton_anchors
+
+QUESTION = "List the names of employees older than 30 in the Sales department"
+SQL = "SELECT name FROM employees WHERE age > 30 AND department = 'Sales'"
+
+
+def test_extract_template_slots_shared_literals():
+    template = extract_template(QUESTION, SQL, "company")
+    assert template is not None
+    assert template.sql == "SELECT name FROM employees WHERE age > ? AND department = ?"
+    assert template.skeleton == "list the names of employees older than {0} in the {1} department"
+    assert [slot.kind for slot in template.slots] == ["number", "text"]
+    assert template.slots[1].transform == "asis"
+
+
+def test_extract_template_needs_a_shared_literal():
+    assert extract_template("How many employees are there?", "SELECT COUNT(*) FROM employees", "company") is None
+    # 40 never appears in the question, so nothing can be abstracted.
+    assert extract_template("Who is the oldest employee?", "SELECT name FROM employees WHERE age > 40", "company") is None
+
+
+def test_bind_rejects_compound_text_slot():
+    template = extract_template(QUESTION, SQL, "company")
+    assert template.bind("List the names of employees older than 30 in the Sales or HR department") is None
+    too_long = "List the names of employees older than 30 in the very long made up name department"
+    assert template.bind(too_long) is None
+
+
+def test_match_binds_params_in_sql_order():
+    store = TemplateStore(TemplateConfig(enabled=True))
+    # The number comes after the text in this question but before it in the SQL.
+    learned = store.learn(
+        "Which Engineering employees are older than 40?",
+        "company",
+        "SELECT name FROM employees WHERE age > 40 AND department = 'Engineering'",
+    )
+    assert learned is not None
+    match = store.match("which hr employees are older than 25.5", "company")
+    assert match is not None
+    template, params = match
+    assert template is learned
+    assert params == [25.5, "hr"]
+    assert store.match("Which HR employees are older than 25?", "university") is None
+    assert store.match("Which HR employees are younger than 25?", "company") is None
+    assert store.stats()["hits"] == 1
+
+
+def test_anchors_only_pin_whole_fixed_words():
+    assert skeleton_anchors("which {0} employees are older than {1}") == ("which", None)
+    assert skeleton_anchors("{0} employees in {1} department") == (None, "department")
+    # "{0}s" leaves the last word partly to the slot.
+    assert skeleton_anchors("list all {0}s") == ("list", None)
+    assert question_anchors("Which HR employees are older than 25?")[0] == ("which", "25")
+
+
+def test_match_only_tries_templates_sharing_anchors():
+    store = TemplateStore(TemplateConfig(enabled=True))
+    for department in ("Sales", "HR", "Finance"):
+        sql = f"SELECT name FROM employees WHERE department = '{department}'"
+        store.learn(f"Show {department} employees", "company", sql)
+    store.learn(QUESTION, "company", SQL)
+    assert len(store) == 2
+    match = store.match("Show Legal employees", "company")
+    assert match is not None and match[1] == ["Legal"]
+    assert match[0].skeleton == "show {0} employees"
+    # Only the "show ... employees" template shares the question's anchors, so it is the one tried.
+    assert store.stats()["attempts"] == 1
+    assert store.match("Who manages the Legal department?", "company") is None
+    assert store.stats()["attempts"] == 1
+    template = match[0]
+    assert store.evict(template.template_id)
+    assert store.match("Show Legal employees", "company") is None